@@ -1,13 +1,57 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from . import search
 from .models import User, Department, EmployeeDetail, BiometricTemplate
+from apps.core.admin import LargeCollectionAdminMixin
+from apps.core.cache import get_reference_list, get_reference_map
+
+def user_prefix_ids(term):
+    """
+    Ids of the users whose name, username, email or employee ID words
+    start with the words of ``term``, in any case and with accents
+    ignored, from the search index (apps.accounts.search).
+    """
+    return search.match(term, limit=None, active_only=False)
+
+def annotate_departments(objects):
+    departments = get_reference_map('department')
+    for obj in objects:
+        department = departments.get(obj.department_id)
+        obj.department_name = department.name if department else None
+
+def annotate_users(objects, *fields):
+    user_ids = {getattr(obj, field) for obj in objects for field in fields} - {None}
+    names = {
+        user_id: f"{username} - {f'{first_name} {last_name}'.strip()}"
+        for user_id, username, first_name, last_name in User.objects.filter(
+            id__in=user_ids
+        ).values_list('id', 'username', 'first_name', 'last_name')
+    } if user_ids else {}
+    for obj in objects:
+        for field in fields:
+            setattr(obj, f'{field}_display', names.get(getattr(obj, field)))
+
+class UserPrefixSearchMixin:
+    """
+    Replaces the admin's icontains search with user_prefix_ids(), on the
+    model itself or, via ``user_search_field``, on a user_id reference.
+    """
+    user_search_field = None
+    search_help_text = 'Prefix match on username, employee ID, email or name, in any case'
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        field = self.user_search_field or 'id'
+        return queryset.filter(**{f'{field}__in': user_prefix_ids(search_term)}), False
 
 class DepartmentFilter(admin.SimpleListFilter):
     title = 'department'
     parameter_name = 'department_id'
 
     def lookups(self, request, model_admin):
-        departments = Department.objects.all()
+        departments = get_reference_list('department')
         return [(str(dept.id), dept.name) for dept in departments]
 
     def queryset(self, request, queryset):
@@ -16,10 +60,10 @@ class DepartmentFilter(admin.SimpleListFilter):
         return queryset
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(UserPrefixSearchMixin, LargeCollectionAdminMixin, BaseUserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'user_type', 'get_department', 'status')
     list_filter = ('user_type', 'status', DepartmentFilter, 'is_staff')
-    search_fields = ('username', 'email', 'first_name', 'last_name', 'employee_id')
+    search_fields = ('username', 'employee_id', 'email', 'last_name', 'first_name')
     ordering = ('username',)
     
     fieldsets = (
@@ -31,12 +75,12 @@ class UserAdmin(BaseUserAdmin):
     )
     readonly_fields = ('created_at', 'last_login')
 
+    def annotate_page(self, objects):
+        annotate_departments(objects)
+
     def get_department(self, obj):
         if obj.department_id:
-            try:
-                return Department.objects.get(id=obj.department_id).name
-            except Department.DoesNotExist:
-                return None
+            return getattr(obj, 'department_name', None)
         return '-'
     get_department.short_description = 'Department'
 
@@ -45,5 +89,40 @@ class DepartmentAdmin(admin.ModelAdmin):
     list_display = ('name', 'description')
     search_fields = ('name',)
 
-admin.site.register(EmployeeDetail)
-admin.site.register(BiometricTemplate)
\ No newline at end of file
+@admin.register(EmployeeDetail)
+class EmployeeDetailAdmin(UserPrefixSearchMixin, LargeCollectionAdminMixin, admin.ModelAdmin):
+    list_display = ('get_user', 'get_department', 'get_manager', 'contract_start_date', 'contract_end_date')
+    list_filter = (DepartmentFilter,)
+    search_fields = ('user_id',)
+    user_search_field = 'user_id'
+
+    def annotate_page(self, objects):
+        annotate_departments(objects)
+        annotate_users(objects, 'user_id', 'manager_id')
+
+    def get_user(self, obj):
+        return getattr(obj, 'user_id_display', obj.user_id)
+    get_user.short_description = 'Employee'
+
+    def get_department(self, obj):
+        return getattr(obj, 'department_name', None) or '-'
+    get_department.short_description = 'Department'
+
+    def get_manager(self, obj):
+        return getattr(obj, 'manager_id_display', obj.manager_id) or '-'
+    get_manager.short_description = 'Manager'
+
+@admin.register(BiometricTemplate)
+class BiometricTemplateAdmin(UserPrefixSearchMixin, LargeCollectionAdminMixin, admin.ModelAdmin):
+    list_display = ('get_user', 'biometric_type', 'quality_score', 'enrolled_at', 'last_used')
+    list_filter = ('biometric_type',)
+    search_fields = ('user_id',)
+    user_search_field = 'user_id'
+    exclude = ('template_data',)
+
+    def annotate_page(self, objects):
+        annotate_users(objects, 'user_id')
+
+    def get_user(self, obj):
+        return getattr(obj, 'user_id_display', obj.user_id)
+    get_user.short_description = 'Employee'
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from apps.core.instrumentation import record_cache_access
+
+USER_PROJECTION = (
+    'id', 'username', 'first_name', 'last_name', 'user_type', 'status',
+    'department_id', 'is_staff', 'is_superuser',
+)
+
+
+def _cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get_user_projection(user_id):
+    """
+    Return the slim user projection from cache, loading it on a miss.
+    Returns None when the user does not exist.
+    """
+    from .models import User
+
+    key = _cache_key(user_id)
+    projection = cache.get(key)
+    record_cache_access('auth_user', projection is not None)
+    if projection is None:
+        projection = User.objects.filter(id=user_id).values(*USER_PROJECTION).first()
+        if projection is None:
+            return None
+        cache.set(key, projection, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60))
+    return projection
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+class CachedUser:
+    """
+    Stand-in for request.user built from the cached projection.
+
+    Any attribute outside the projection loads the full User once, so code
+    that needs e.g. ``email`` or serializes the user keeps working.
+    """
+    is_authenticated = True
+    is_anonymous = False
+    # AbstractBaseUser.is_active; User has no such column
+    is_active = True
+
+    def __init__(self, projection):
+        self.__dict__.update(projection)
+        self.pk = projection['id']
+
+    @property
+    def full_user(self):
+        if '_full_user' not in self.__dict__:
+            from .models import User
+            self.__dict__['_full_user'] = User.objects.get(id=self.id)
+        return self.__dict__['_full_user']
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.full_user, name)
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return f"{self.username} - {self.get_full_name()}"
+
+    def get_full_name(self):
+        return f"{self.first_name} {self.last_name}".strip()
+
+    def get_short_name(self):
+        return self.first_name
+
+    def has_perm(self, perm, obj=None):
+        return self.is_superuser
+
+    def has_module_perms(self, app_label):
+        return self.is_superuser
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves request.user from a short-TTL cache of
+    a slim user projection instead of reading the users collection.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        projection = get_user_projection(user_id)
+        if projection is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        return CachedUser(projection)
@@ -0,0 +1,157 @@
+"""
+Reporting hierarchy as a closure table.
+
+ReportingLine holds a row for every (manager, report) pair at any depth
+of the EmployeeDetail.manager_id tree, so "everyone under me" is one
+indexed query on ``ancestor_id`` however deep the tree is. Saving an
+EmployeeDetail whose manager changed re-parents the employee's whole
+subtree incrementally: one read of the subtree, one of the new
+manager's ancestors, one delete and one insert. Bulk writes that skip
+signals (the employee importer, seed data) call rebuild() instead, as
+does ``manage.py rebuild_reporting_lines``.
+"""
+import logging
+from rest_framework.exceptions import ValidationError
+from apps.core.mongo import Repository
+from .models import EmployeeDetail, ReportingLine
+
+logger = logging.getLogger(__name__)
+
+TEAM_SCOPE = 'team'
+
+
+class ReportingLineRepository(Repository):
+    model = ReportingLine
+
+    def _ids(self, query, column):
+        field = self.fields[column]
+        return [field.to_python(document[column]) for document in self.collection.find(query, {column: 1, '_id': 0})]
+
+    def subordinate_ids(self, manager_id, include_self=False):
+        """
+        Everyone reporting to ``manager_id`` directly or indirectly.
+        """
+        query = {'ancestor_id': self.prep('ancestor_id', manager_id)}
+        if not include_self:
+            query['depth'] = {'$gte': 1}
+        return self._ids(query, 'descendant_id')
+
+    def manager_of(self, user_id):
+        line = self.collection.find_one(
+            {'descendant_id': self.prep('descendant_id', user_id), 'depth': 1}, {'ancestor_id': 1, '_id': 0}
+        )
+        return self.fields['ancestor_id'].to_python(line['ancestor_id']) if line else None
+
+    def has_node(self, user_id):
+        return self.exists({'descendant_id': self.prep('descendant_id', user_id), 'depth': 0})
+
+    def lines_to(self, user_id):
+        """
+        ``[(ancestor_id, depth)]`` of ``user_id``, itself included at 0.
+        """
+        return [
+            (line.ancestor_id, line.depth)
+            for line in self.find({'descendant_id': self.prep('descendant_id', user_id)}, ('ancestor_id', 'depth'))
+        ]
+
+    def lines_from(self, user_id):
+        """
+        ``[(descendant_id, depth)]`` under ``user_id``, itself included at 0.
+        """
+        return [
+            (line.descendant_id, line.depth)
+            for line in self.find({'ancestor_id': self.prep('ancestor_id', user_id)}, ('descendant_id', 'depth'))
+        ]
+
+
+reporting_lines = ReportingLineRepository()
+
+
+def set_manager(user_id, manager_id):
+    """
+    Move ``user_id`` and everyone under them below ``manager_id`` (None
+    makes them a root). Raises ValueError when ``manager_id`` is in the
+    subtree, which would make a cycle.
+    """
+    subtree = reporting_lines.lines_from(user_id)
+    if not subtree:
+        subtree = [(user_id, 0)]
+        reporting_lines.insert(ReportingLine(ancestor_id=user_id, descendant_id=user_id, depth=0))
+    members = {descendant_id for descendant_id, _ in subtree}
+    if manager_id in members:
+        raise ValueError(f'{manager_id} reports to {user_id}')
+
+    # Drop every line from outside the subtree into it
+    reporting_lines.collection.delete_many({
+        'descendant_id': {'$in': [reporting_lines.prep('descendant_id', pk) for pk in members]},
+        'ancestor_id': {'$nin': [reporting_lines.prep('ancestor_id', pk) for pk in members]},
+    })
+    if manager_id is None:
+        return
+
+    ancestors = reporting_lines.lines_to(manager_id)
+    if not ancestors:
+        ancestors = [(manager_id, 0)]
+        reporting_lines.insert(ReportingLine(ancestor_id=manager_id, descendant_id=manager_id, depth=0))
+    reporting_lines.insert_many([
+        ReportingLine(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=above + 1 + below)
+        for ancestor_id, above in ancestors
+        for descendant_id, below in subtree
+    ])
+
+
+def sync_employee(user_id, manager_id):
+    """
+    Bring the closure in line with one employee's manager_id after a save.
+    """
+    if reporting_lines.has_node(user_id) and reporting_lines.manager_of(user_id) == manager_id:
+        return
+    try:
+        set_manager(user_id, manager_id)
+    except ValueError as e:
+        logger.warning('user=%s manager=%s event=reporting_cycle error="%s"', user_id, manager_id, e)
+
+
+def build_lines(parents):
+    """
+    Closure rows for ``{user_id: manager_id}``; a cycle stops the walk
+    where it repeats.
+    """
+    nodes = set(parents) | {manager_id for manager_id in parents.values() if manager_id}
+    lines = []
+    for user_id in nodes:
+        lines.append(ReportingLine(ancestor_id=user_id, descendant_id=user_id, depth=0))
+        seen = {user_id}
+        manager_id = parents.get(user_id)
+        depth = 1
+        while manager_id and manager_id not in seen:
+            lines.append(ReportingLine(ancestor_id=manager_id, descendant_id=user_id, depth=depth))
+            seen.add(manager_id)
+            manager_id = parents.get(manager_id)
+            depth += 1
+    return lines
+
+
+def rebuild(chunk_size=5000):
+    """
+    Recreate the whole closure from EmployeeDetail. Returns the number of
+    rows written.
+    """
+    lines = build_lines(dict(EmployeeDetail.objects.values_list('user_id', 'manager_id')))
+    reporting_lines.collection.delete_many({})
+    for i in range(0, len(lines), chunk_size):
+        reporting_lines.insert_many(lines[i:i + chunk_size])
+    return len(lines)
+
+
+def requested_team(request):
+    """
+    For ``?scope=team``, the ids of everyone under the requesting user;
+    None when no scope was asked for.
+    """
+    scope = request.query_params.get('scope')
+    if not scope:
+        return None
+    if scope != TEAM_SCOPE:
+        raise ValidationError({'scope': f'Expected "{TEAM_SCOPE}"'})
+    return reporting_lines.subordinate_ids(request.user.id)
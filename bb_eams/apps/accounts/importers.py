@@ -0,0 +1,232 @@
+"""
+Bulk employee import from CSV or JSONL streams.
+
+Rows are validated and de-duplicated a chunk at a time: uniqueness of
+username, email and employee_id is checked with one ``__in`` lookup per
+field per chunk, passwords are hashed across a process pool, and users
+plus their EmployeeDetail rows are written with ``bulk_create``. Rows
+without a password get an unusable one and an invite token instead. A
+dry run stops after validation and the uniqueness checks: it hashes no
+passwords and issues no invites.
+"""
+import csv
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework import serializers
+from . import hierarchy, search
+from .models import User, EmployeeDetail
+
+DEFAULT_CHUNK_SIZE = 500
+UNIQUE_FIELDS = ('username', 'email', 'employee_id')
+DETAIL_FIELDS = (
+    'manager_id', 'emergency_contact_name', 'emergency_contact_phone',
+    'emergency_contact_relation', 'contract_start_date', 'contract_end_date',
+    'probation_end_date',
+)
+
+
+class EmployeeImportRowSerializer(serializers.Serializer):
+    """
+    Validates one import row. Uniqueness is checked in bulk by the importer,
+    so unlike UserCreateSerializer this issues no queries per row.
+    """
+    username = serializers.CharField(max_length=150)
+    email = serializers.EmailField()
+    first_name = serializers.CharField(max_length=100)
+    last_name = serializers.CharField(max_length=100)
+    password = serializers.CharField(required=False, allow_blank=True)
+    user_type = serializers.ChoiceField(choices=User.USER_TYPES, default='employee')
+    employee_id = serializers.CharField(max_length=50, required=False, allow_null=True)
+    department_id = serializers.UUIDField(required=False, allow_null=True)
+    position = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    employment_type = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    hire_date = serializers.DateField(required=False, allow_null=True)
+    phone_number = serializers.CharField(max_length=20, required=False, allow_blank=True)
+
+    # EmployeeDetail
+    manager_id = serializers.UUIDField(required=False, allow_null=True)
+    emergency_contact_name = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    emergency_contact_phone = serializers.CharField(max_length=20, required=False, allow_blank=True)
+    emergency_contact_relation = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    contract_start_date = serializers.DateField(required=False, allow_null=True)
+    contract_end_date = serializers.DateField(required=False, allow_null=True)
+    probation_end_date = serializers.DateField(required=False, allow_null=True)
+
+
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def read_rows(stream, fmt='csv'):
+    """
+    Yield (line_number, row) pairs from a text or binary stream.
+    Empty CSV cells are dropped so optional fields fall back to defaults.
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+    elif fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {
+                key.strip(): value.strip()
+                for key, value in row.items()
+                if key and value and value.strip()
+            }
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _init_worker():
+    # Forked workers inherit the configured app registry; spawned ones
+    # (macOS, Windows) have to populate it before hashing.
+    django.setup()
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _existing_values(field, values):
+    if not values:
+        return set()
+    lookup = {f'{field}__in': list(values)}
+    return set(User.objects.filter(**lookup).values_list(field, flat=True))
+
+
+class EmployeeImporter:
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, dry_run=False):
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.dry_run = dry_run
+        self.seen = {field: set() for field in UNIQUE_FIELDS}
+        self.result = {'created': 0, 'failed': 0, 'errors': [], 'invites': []}
+
+    def run(self, rows):
+        if self.dry_run:
+            for chunk in _chunks(rows, self.chunk_size):
+                self.result['created'] += len(self.check_unique(self.validate(chunk)))
+            return self.result
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            for chunk in _chunks(rows, self.chunk_size):
+                self.import_chunk(chunk, pool)
+        if self.result['created']:
+            # bulk_create skips the EmployeeDetail signals; new employees
+            # may report to each other, so rebuild rather than patch
+            hierarchy.rebuild()
+        return self.result
+
+    def error(self, line_number, errors):
+        self.result['failed'] += 1
+        self.result['errors'].append({'line': line_number, 'errors': errors})
+
+    def validate(self, chunk):
+        valid = []
+        for line_number, row in chunk:
+            if isinstance(row, Exception):
+                self.error(line_number, {'non_field_errors': [str(row)]})
+                continue
+            serializer = EmployeeImportRowSerializer(data=row)
+            if not serializer.is_valid():
+                self.error(line_number, serializer.errors)
+                continue
+            data = dict(serializer.validated_data)
+            data['email'] = User.objects.normalize_email(data['email'])
+            valid.append((line_number, data))
+        return valid
+
+    def check_unique(self, rows):
+        existing = {
+            field: _existing_values(field, {data[field] for _, data in rows if data.get(field)})
+            for field in UNIQUE_FIELDS
+        }
+        unique = []
+        for line_number, data in rows:
+            errors = {}
+            for field in UNIQUE_FIELDS:
+                value = data.get(field)
+                if not value:
+                    continue
+                if value in existing[field]:
+                    errors[field] = [f"A user with this {field} already exists."]
+                elif value in self.seen[field]:
+                    errors[field] = [f"Duplicate {field} in import file."]
+            if errors:
+                self.error(line_number, errors)
+                continue
+            for field in UNIQUE_FIELDS:
+                if data.get(field):
+                    self.seen[field].add(data[field])
+            unique.append((line_number, data))
+        return unique
+
+    def import_chunk(self, chunk, pool):
+        rows = self.check_unique(self.validate(chunk))
+        if not rows:
+            return
+
+        passwords = [data.pop('password', '') for _, data in rows]
+        to_hash = [password for password in passwords if password]
+        hashed = iter(pool.map(make_password, to_hash, chunksize=max(1, len(to_hash) // 32)))
+
+        users, details = [], []
+        for (_, data), password in zip(rows, passwords):
+            detail_values = {field: data.pop(field) for field in DETAIL_FIELDS if field in data}
+            user = User(**data)
+            if password:
+                user.password = next(hashed)
+            else:
+                user.set_unusable_password()
+                self.result['invites'].append({
+                    'user_id': str(user.id),
+                    'username': user.username,
+                    'email': user.email,
+                    'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+                    'token': default_token_generator.make_token(user),
+                })
+            users.append(user)
+            details.append(EmployeeDetail(
+                user_id=user.id,
+                department_id=user.department_id,
+                **detail_values
+            ))
+
+        User.objects.bulk_create(users, batch_size=self.chunk_size)
+        EmployeeDetail.objects.bulk_create(details, batch_size=self.chunk_size)
+        # bulk_create skips the User signals that index search
+        search.index_users(users)
+        self.result['created'] += len(users)
+
+
+def import_employees(rows, **options):
+    """
+    Import (line_number, row) pairs as produced by read_rows().
+    Returns a summary with created/failed counts, row errors and invites.
+    """
+    return EmployeeImporter(**options).run(rows)
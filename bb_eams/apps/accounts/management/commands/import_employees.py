@@ -0,0 +1,49 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from apps.accounts.importers import DEFAULT_CHUNK_SIZE, detect_format, import_employees, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import employees from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file with one employee per row')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes (default: CPU count)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only: no writes, password hashing or invites')
+        parser.add_argument('--invites-out', help='Write invite tokens for rows without a password to this JSONL file')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if options['dry_run'] and options['invites_out']:
+            raise CommandError('A dry run issues no invites; drop --invites-out')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                result = import_employees(
+                    read_rows(stream, fmt),
+                    chunk_size=options['chunk_size'],
+                    workers=options['workers'],
+                    dry_run=options['dry_run'],
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'], default=str)}")
+
+        if options['invites_out']:
+            with open(options['invites_out'], 'w') as out:
+                for invite in result['invites']:
+                    out.write(json.dumps(invite) + '\n')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Validated {result['created']} employees, {result['failed']} rows failed"
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} employees, {result['failed']} rows failed, "
+            f"{len(result['invites'])} invites issued"
+        ))
@@ -0,0 +1,14 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.accounts import hierarchy
+
+
+class Command(BaseCommand):
+    help = 'Recreate the ReportingLine closure table from EmployeeDetail.manager_id'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = hierarchy.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written:,} reporting lines in {time.monotonic() - started:.2f}s'
+        ))
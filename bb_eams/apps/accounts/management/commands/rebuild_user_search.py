@@ -0,0 +1,14 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.accounts import search
+
+
+class Command(BaseCommand):
+    help = 'Re-index every user for the typeahead search endpoint'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written:,} search entries in {time.monotonic() - started:.2f}s'
+        ))
@@ -99,6 +99,9 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
             models.Index(fields=['employee_id']),
             models.Index(fields=['user_type']),
             models.Index(fields=['status']),
+            models.Index(fields=['last_name']),
+            models.Index(fields=['first_name']),
+            models.Index(fields=['department_id']),
         ]
 
 class Department(BaseModel):
@@ -153,6 +156,46 @@ class EmployeeDetail(BaseModel):
 
     class Meta:
         db_table = 'employee_details'
+        indexes = [
+            models.Index(fields=['department_id']),
+            models.Index(fields=['manager_id']),
+        ]
+
+class UserSearchEntry(BaseModel):
+    """
+    One normalized search token of a user, for prefix search with an
+    anchored range scan on ``token``. Maintained by apps.accounts.search.
+    """
+    token = models.CharField(max_length=100)
+    user_id = models.UUIDField()
+    field = models.CharField(max_length=20)  # employee_id, username, email, first_name, last_name
+    tokens = models.JSONField(default=list)  # every token of the user, to match multi-word queries
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        db_table = 'user_search_entries'
+        indexes = [
+            models.Index(fields=['token']),
+            models.Index(fields=['user_id']),
+        ]
+
+class ReportingLine(BaseModel):
+    """
+    Closure table of the EmployeeDetail.manager_id tree: one row per
+    manager and everyone under them at any depth, plus a depth-0 row per
+    employee. Maintained by apps.accounts.hierarchy.
+    """
+    ancestor_id = models.UUIDField()
+    descendant_id = models.UUIDField()
+    depth = models.IntegerField()
+
+    class Meta:
+        db_table = 'reporting_lines'
+        unique_together = ('ancestor_id', 'descendant_id')
+        indexes = [
+            models.Index(fields=['ancestor_id', 'depth']),
+            models.Index(fields=['descendant_id', 'depth']),
+        ]
 
 class BiometricTemplate(BaseModel):
     BIOMETRIC_TYPES = (
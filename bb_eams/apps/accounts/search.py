@@ -0,0 +1,206 @@
+"""
+Typeahead search over employees.
+
+Each user is indexed as a handful of UserSearchEntry rows, one per
+normalized token of their names, username, email and employee ID
+(lower-cased, accents stripped, split on punctuation; employee IDs also
+by their number without leading zeros, so "123" finds EMP0000123). A
+query prefix-matches its longest word against ``token`` with an
+anchored range scan on the index and filters on its other words in the
+same query, with regexes anchored on each token in the ``tokens`` stored
+on every entry, so the scan limit only counts entries that match every
+word. The hits are ranked and the top ``limit`` users loaded with one
+``$in`` query. Entries are rewritten on every User save;
+bulk writes that skip signals call index_users() or rebuild().
+"""
+import json
+import re
+import unicodedata
+from apps.core.cache import get_reference
+from apps.core.mongo import Repository
+from .models import User, UserSearchEntry
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Matching index entries read per query; a one-letter query still returns
+# the alphabetically closest matches
+SCAN_LIMIT = 1000
+MAX_TOKEN_LENGTH = 100
+
+# Earlier fields rank first among equally good matches
+FIELD_RANK = {'employee_id': 0, 'username': 1, 'last_name': 2, 'first_name': 3, 'email': 4}
+INDEXED_FIELDS = frozenset(('employee_id', 'username', 'first_name', 'last_name', 'email', 'status'))
+RESULT_FIELDS = ('id', 'employee_id', 'username', 'first_name', 'last_name', 'email',
+                 'department_id', 'position', 'user_type', 'status')
+
+_split = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def words(text):
+    return [word for word in _split.split(normalize(text)) if word]
+
+
+def user_tokens(user):
+    """
+    ``[(token, field)]`` for ``user``, most specific field first.
+    """
+    tokens = []
+    if user.employee_id:
+        employee_id = normalize(user.employee_id)
+        tokens.append((_split.sub('', employee_id), 'employee_id'))
+        number = re.search(r'(\d+)$', employee_id)
+        if number and number.group(1).lstrip('0'):
+            tokens.append((number.group(1).lstrip('0'), 'employee_id'))
+    tokens.append((_split.sub('', normalize(user.username)), 'username'))
+    for field in ('last_name', 'first_name'):
+        tokens.extend((word, field) for word in words(getattr(user, field)))
+    email = normalize(user.email)
+    tokens.append((email, 'email'))
+    tokens.extend((word, 'email') for word in words(email.split('@')[0]))
+
+    seen = set()
+    unique = []
+    for token, field in tokens:
+        token = token[:MAX_TOKEN_LENGTH]
+        if token and token not in seen:
+            seen.add(token)
+            unique.append((token, field))
+    return unique
+
+
+class UserSearchRepository(Repository):
+    model = UserSearchEntry
+
+    def replace(self, users):
+        """
+        Rewrite the entries of ``users`` with one delete and one insert.
+        """
+        users = list(users)
+        self.remove([user.id for user in users])
+        entries = []
+        for user in users:
+            tokens = user_tokens(user)
+            all_tokens = [token for token, _ in tokens]
+            entries.extend(
+                UserSearchEntry(token=token, user_id=user.id, field=field, tokens=all_tokens,
+                                active=user.status == 'active')
+                for token, field in tokens
+            )
+        self.insert_many(entries)
+        return len(entries)
+
+    def remove(self, user_ids):
+        if user_ids:
+            self.collection.delete_many({'user_id': {'$in': [self.prep('user_id', pk) for pk in user_ids]}})
+
+    def prefix_scan(self, prefix, others=(), active_only=True, limit=SCAN_LIMIT):
+        """
+        Entries whose token starts with ``prefix`` and whose user has a
+        token starting with each of ``others``.
+        """
+        # \uffff sorts after every character a token can contain
+        query = {'token': {'$gte': prefix, '$lt': prefix + '\uffff'}}
+        if others:
+            # ``tokens`` is stored as JSON text; a token starts after a quote
+            query['$and'] = [{'tokens': re.compile(re.escape(json.dumps(term)[:-1]))} for term in others]
+        if active_only:
+            query['active'] = True
+        return self.collection.find(
+            query, {'token': 1, 'user_id': 1, 'field': 1, '_id': 0},
+            sort=[('token', 1)], limit=limit,
+        )
+
+
+class UserRepository(Repository):
+    model = User
+
+    def by_ids(self, user_ids, fields):
+        return self.find({'id': {'$in': [self.prep('id', pk) for pk in user_ids]}}, fields)
+
+
+search_entries = UserSearchRepository()
+users = UserRepository()
+
+
+def index_users(instances):
+    return search_entries.replace(instances)
+
+
+def rebuild(chunk_size=2000):
+    """
+    Re-index every user. Returns the number of entries written.
+    """
+    written = 0
+    search_entries.collection.delete_many({})
+    batch = []
+    for user in User.objects.only('id', *INDEXED_FIELDS).iterator(chunk_size=chunk_size):
+        batch.append(user)
+        if len(batch) >= chunk_size:
+            written += search_entries.replace(batch)
+            batch = []
+    if batch:
+        written += search_entries.replace(batch)
+    return written
+
+
+def query_terms(query):
+    """
+    The words of ``query``; an email address is kept whole.
+    """
+    query = normalize(query).strip()
+    if '@' in query:
+        return [query[:MAX_TOKEN_LENGTH]]
+    return words(query)
+
+
+def _rank(terms, active_only):
+    terms = sorted(terms, key=len, reverse=True)
+    driver, others = terms[0], terms[1:]
+    best = {}
+    for entry in search_entries.prefix_scan(driver, others, active_only):
+        rank = (entry['token'] != driver, FIELD_RANK.get(entry['field'], len(FIELD_RANK)), len(entry['token']))
+        user_id = entry['user_id']
+        if user_id not in best or rank < best[user_id]:
+            best[user_id] = rank
+    return best
+
+
+def match(query, limit=DEFAULT_LIMIT, active_only=True):
+    """
+    Ids of the best ``limit`` users for ``query``, best first; every
+    user found within SCAN_LIMIT entries when ``limit`` is None.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    best = _rank(terms, active_only)
+    if not best and len(terms) > 1:
+        # "EMP-0001" is indexed as one token
+        best = _rank([''.join(terms)], active_only)
+    field = search_entries.fields['user_id']
+    return [field.to_python(user_id) for user_id in sorted(best, key=best.get)[:limit]]
+
+
+def search(query, limit=DEFAULT_LIMIT, active_only=True):
+    """
+    Result rows for the best ``limit`` users matching ``query``.
+    """
+    user_ids = match(query, limit, active_only)
+    if not user_ids:
+        return []
+    found = {user.id: user for user in users.by_ids(user_ids, RESULT_FIELDS)}
+    results = []
+    for user_id in user_ids:
+        user = found.get(user_id)
+        if user is None:
+            continue
+        department = get_reference('department', user.department_id)
+        row = {field: getattr(user, field) for field in RESULT_FIELDS}
+        row['department_name'] = department.name if department else None
+        results.append(row)
+    return results
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from .hierarchy import reporting_lines
 from .models import Department, EmployeeDetail, BiometricTemplate
+from apps.core.cache import get_reference
 
 User = get_user_model()
 
@@ -23,13 +25,8 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['last_login', 'biometric_enrolled']
 
     def get_department_name(self, obj):
-        if obj.department_id:
-            try:
-                dept = Department.objects.get(id=obj.department_id)
-                return dept.name
-            except Department.DoesNotExist:
-                pass
-        return None
+        dept = get_reference('department', obj.department_id)
+        return dept.name if dept else None
 
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -53,6 +50,13 @@ class EmployeeDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = EmployeeDetail
         fields = '__all__'
+    
+    def validate(self, data):
+        user_id = data.get('user_id', self.instance.user_id if self.instance else None)
+        manager_id = data.get('manager_id')
+        if manager_id and user_id and manager_id in reporting_lines.subordinate_ids(user_id, include_self=True):
+            raise serializers.ValidationError({'manager_id': 'An employee cannot report to themselves or their own reports'})
+        return data
 
 class BiometricTemplateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import hierarchy, search
+from .authentication import invalidate_cached_user
+from .models import EmployeeDetail, User
+
+
+@receiver(post_save, sender=User, dispatch_uid='invalidate-cached-user-save')
+@receiver(post_delete, sender=User, dispatch_uid='invalidate-cached-user-delete')
+def invalidate_user_projection(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=User, dispatch_uid='index-user-search-save')
+def index_user_search(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Fixture loads are left to rebuild_user_search; saves that only touch
+    # e.g. last_login leave the index as it is
+    if raw or (update_fields is not None and not search.INDEXED_FIELDS.intersection(update_fields)):
+        return
+    search.index_users([instance])
+
+
+@receiver(post_delete, sender=User, dispatch_uid='index-user-search-delete')
+def remove_user_search(sender, instance, **kwargs):
+    search.search_entries.remove([instance.pk])
+
+
+@receiver(post_save, sender=EmployeeDetail, dispatch_uid='sync-reporting-lines-save')
+def sync_reporting_lines(sender, instance, raw=False, **kwargs):
+    # Fixture loads are left to rebuild_reporting_lines
+    if not raw:
+        hierarchy.sync_employee(instance.user_id, instance.manager_id)
+
+
+@receiver(post_delete, sender=EmployeeDetail, dispatch_uid='sync-reporting-lines-delete')
+def detach_reporting_lines(sender, instance, **kwargs):
+    # Their reports stay under them
+    hierarchy.sync_employee(instance.user_id, None)
@@ -0,0 +1,28 @@
+from django.contrib.admin.sites import AdminSite
+from apps.accounts.admin import BiometricTemplateAdmin, UserAdmin
+from apps.accounts.models import BiometricTemplate, User
+from apps.core.testing import MongoTestCase
+
+
+class UserPrefixSearchTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.abebe = User.objects.create(username='Abebe.K', email='Abebe@Example.com', employee_id='EMP0000042',
+                                         first_name='Ábebe', last_name='Kebede')
+        self.other = User.objects.create(username='almaz', email='almaz@example.com', first_name='Almaz', last_name='Ayana')
+
+    def search(self, admin_class, model, term):
+        queryset, _ = admin_class(model, AdminSite()).get_search_results(None, model.objects.all(), term)
+        return queryset
+
+    def test_any_case(self):
+        for term in ('abe', 'ABEBE', 'kebede', 'abebe@ex', 'emp00000', '42', 'abebe keb'):
+            self.assertEqual([user.id for user in self.search(UserAdmin, User, term)], [self.abebe.id], term)
+        self.assertEqual(self.search(UserAdmin, User, 'zz').count(), 0)
+
+    def test_user_reference(self):
+        template = BiometricTemplate.objects.create(user_id=self.abebe.id, biometric_type='fingerprint',
+                                                    template_data=b'x', quality_score=0.9)
+        BiometricTemplate.objects.create(user_id=self.other.id, biometric_type='fingerprint',
+                                         template_data=b'y', quality_score=0.9)
+        self.assertEqual([t.id for t in self.search(BiometricTemplateAdmin, BiometricTemplate, 'Kebede')], [template.id])
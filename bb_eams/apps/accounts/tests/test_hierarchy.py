@@ -0,0 +1,63 @@
+import uuid
+from apps.accounts import hierarchy
+from apps.accounts.models import EmployeeDetail, ReportingLine
+from apps.accounts.serializers import EmployeeDetailSerializer
+from apps.core.testing import MongoTestCase
+
+
+class ReportingLineTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        # ceo <- sales <- rep <- trainee, ceo <- finance
+        self.ceo, self.sales, self.rep, self.trainee, self.finance = (uuid.uuid4() for _ in range(5))
+        self.details = {}
+        for user_id, manager_id in ((self.ceo, None), (self.sales, self.ceo), (self.rep, self.sales),
+                                    (self.trainee, self.rep), (self.finance, self.ceo)):
+            self.details[user_id] = EmployeeDetail.objects.create(user_id=user_id, manager_id=manager_id)
+
+    def lines(self):
+        return set(ReportingLine.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def move(self, user_id, manager_id):
+        detail = self.details[user_id]
+        detail.manager_id = manager_id
+        detail.save()
+
+    def test_saves_maintain_the_closure(self):
+        self.assertEqual(sorted(hierarchy.reporting_lines.subordinate_ids(self.sales)), sorted([self.rep, self.trainee]))
+        self.assertEqual(len(hierarchy.reporting_lines.subordinate_ids(self.ceo)), 4)
+        self.assertIn((self.ceo, self.trainee, 3), self.lines())
+
+    def test_moving_an_employee_moves_their_subtree(self):
+        self.move(self.rep, self.finance)
+        self.assertEqual(sorted(hierarchy.reporting_lines.subordinate_ids(self.finance)), sorted([self.rep, self.trainee]))
+        self.assertEqual(hierarchy.reporting_lines.subordinate_ids(self.sales), [])
+        self.assertEqual(hierarchy.reporting_lines.manager_of(self.rep), self.finance)
+        self.assertIn((self.ceo, self.trainee, 3), self.lines())
+
+        self.move(self.rep, None)
+        self.assertEqual(hierarchy.reporting_lines.subordinate_ids(self.rep), [self.trainee])
+        self.assertNotIn(self.trainee, hierarchy.reporting_lines.subordinate_ids(self.ceo))
+
+        # The incremental moves agree with a rebuild from EmployeeDetail
+        moved = self.lines()
+        hierarchy.rebuild()
+        self.assertEqual(self.lines(), moved)
+
+    def test_a_move_into_the_own_subtree_is_refused(self):
+        before = self.lines()
+        with self.assertRaises(ValueError):
+            hierarchy.set_manager(self.sales, self.trainee)
+        # A save that would make a cycle leaves the closure as it was
+        with self.assertLogs('apps.accounts.hierarchy', 'WARNING'):
+            self.move(self.sales, self.trainee)
+        self.assertEqual(self.lines(), before)
+
+    def test_serializer_rejects_a_cycle(self):
+        for manager_id in (self.trainee, self.sales):
+            serializer = EmployeeDetailSerializer(self.details[self.sales], data={'manager_id': manager_id}, partial=True)
+            self.assertFalse(serializer.is_valid())
+            self.assertIn('manager_id', serializer.errors)
+
+        serializer = EmployeeDetailSerializer(self.details[self.sales], data={'manager_id': self.finance}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
@@ -0,0 +1,37 @@
+import io
+from unittest import mock
+from apps.accounts import importers
+from apps.accounts.importers import import_employees, read_rows
+from apps.accounts.models import EmployeeDetail, User
+from apps.core.testing import MongoTestCase
+
+CSV = (
+    'username,email,first_name,last_name,password,employee_id\n'
+    'abebe,abebe@example.com,Abebe,Kebede,s3cret-pass,EMP0000001\n'
+    'almaz,almaz@example.com,Almaz,Ayana,,EMP0000002\n'
+    'dup,abebe@example.com,Dup,Row,,EMP0000003\n'
+    'bad,not-an-email,Bad,Row,,\n'
+)
+
+
+class ImportEmployeesTests(MongoTestCase):
+    def rows(self):
+        return read_rows(io.StringIO(CSV))
+
+    def test_dry_run_only_validates(self):
+        with mock.patch.object(importers, 'ProcessPoolExecutor') as pool, \
+                mock.patch.object(importers.default_token_generator, 'make_token') as make_token:
+            result = import_employees(self.rows(), dry_run=True)
+        pool.assert_not_called()
+        make_token.assert_not_called()
+        self.assertEqual((result['created'], result['failed'], result['invites']), (2, 2, []))
+        self.assertEqual(sorted(error['line'] for error in result['errors']), [4, 5])
+        self.assertEqual(User.objects.count(), 0)
+
+    def test_import(self):
+        result = import_employees(self.rows(), workers=1)
+        self.assertEqual((result['created'], result['failed']), (2, 2))
+        self.assertEqual([invite['username'] for invite in result['invites']], ['almaz'])
+        self.assertTrue(User.objects.get(username='abebe').check_password('s3cret-pass'))
+        self.assertFalse(User.objects.get(username='almaz').has_usable_password())
+        self.assertEqual(EmployeeDetail.objects.count(), 2)
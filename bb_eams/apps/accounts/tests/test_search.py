@@ -0,0 +1,32 @@
+from apps.accounts import search
+from apps.accounts.models import User
+from apps.core.testing import MongoTestCase
+
+
+def employee(number, first_name='Abebe', last_name=None, status='active'):
+    return User(
+        username=f'user{number}', email=f'user{number}@example.com', employee_id=f'EMP{number:07d}',
+        first_name=first_name, last_name=last_name or f'Family{number}', status=status,
+    )
+
+
+class UserSearchTests(MongoTestCase):
+    def test_prefix_and_employee_number(self):
+        users = [employee(1, 'Abebe', 'Kebede'), employee(2, 'Almaz', 'Ayana'), employee(123, 'Tirunesh', 'Dibaba')]
+        search.index_users(users)
+        self.assertEqual(search.match('abe'), [users[0].id])
+        self.assertEqual(search.match('123'), [users[2].id])
+        self.assertEqual(search.match('EMP-0000123'), [users[2].id])
+
+    def test_other_words_are_matched_beyond_the_scan_limit(self):
+        crowd = [employee(number) for number in range(search.SCAN_LIMIT + 50)]
+        target = employee(99999, 'Abebe', 'Zewdu')
+        search.index_users(crowd + [target])
+        self.assertEqual(search.match('abebe zew'), [target.id])
+        self.assertEqual(search.match('zewdu abe'), [target.id])
+
+    def test_inactive_users(self):
+        user = employee(1, 'Abebe', 'Kebede', status='inactive')
+        search.index_users([user])
+        self.assertEqual(search.match('abebe'), [])
+        self.assertEqual(search.match('abebe', active_only=False), [user.id])
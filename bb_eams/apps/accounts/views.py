@@ -9,16 +9,22 @@ from .serializers import (
     EmployeeDetailSerializer, BiometricTemplateSerializer
 )
 from apps.core.utils import encrypt_biometric
+from apps.core.mixins import ConditionalGetMixin, ReferenceDataListMixin
 from .permissions import IsHROfficer
+from .authentication import invalidate_cached_user
+from .importers import detect_format, import_employees, read_rows
+from . import search as user_search
 
 User = get_user_model()
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(ReferenceDataListMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    reference_name = 'department'
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    validator_references = ('department',)
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     
@@ -37,6 +43,52 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Typeahead: ?q= (at least one character), ?limit= (default 10, at
+        most 50), ?include_inactive=true. Answered from the search index,
+        best matches first.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', user_search.DEFAULT_LIMIT)), 1), user_search.MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be a number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        include_inactive = request.query_params.get('include_inactive', '').lower() in ('1', 'true', 'yes')
+        
+        return Response(user_search.search(query, limit, active_only=not include_inactive))
+
+    @action(detail=False, methods=['post'], permission_classes=[IsHROfficer], url_path='bulk-import')
+    def bulk_import(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {'error': 'A CSV or JSONL file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        fmt = request.data.get('format') or detect_format(upload.name)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        
+        try:
+            result = import_employees(read_rows(upload.file, fmt), dry_run=dry_run)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(
+            result,
+            status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED
+        )
+
     @action(detail=True, methods=['post'], permission_classes=[IsHROfficer])
     def reset_password(self, request, pk=None):
         user = self.get_object()
@@ -50,6 +102,9 @@ class UserViewSet(viewsets.ModelViewSet):
         
         user.set_password(password)
         user.save()
+        # The post_save receiver already drops the cached projection; do it
+        # explicitly too so a reset never depends on signal wiring.
+        invalidate_cached_user(user.pk)
         
         return Response({'status': 'Password reset successfully'})
 
@@ -0,0 +1,109 @@
+"""
+Materializes absent, on-leave and holiday rows in DailyAttendance.
+
+Check-out only writes rows for people who worked, so each date is
+completed here as a set difference: active employees minus everyone
+with a present row or a punch that day. Those left get ``holiday`` when
+the attendance policy of their department makes the date a holiday or
+rest day, ``on_leave`` when an approved leave covers it and ``absent``
+otherwise. With the table complete, summaries are one grouped count.
+
+Holidays and rest days come from the attendance policy in force for a
+department (see apps.core.policy_engine); ``rest_days`` default to
+ATTENDANCE_REST_DAYS.
+"""
+from datetime import date, timedelta
+from apps.core.policy_engine import rules_for
+from apps.core.routing import primary_reads
+from .repositories import attendance_records, daily_attendance, day_bounds, month_start, monthly_attendance
+
+MATERIALIZED_STATUSES = ('absent', 'on_leave', 'holiday')
+
+
+def expected_statuses(day, include_absent=True):
+    """
+    ``{user_id: status}`` for every active employee on ``day`` who has
+    neither a present row nor a punch. Without ``include_absent`` only
+    holiday and on-leave employees are returned, for dates still in
+    progress.
+    """
+    from apps.accounts.models import User
+    from apps.leave.models import LeaveRequest
+
+    employees = dict(User.objects.filter(status='active', user_type='employee').values_list('id', 'department_id'))
+    worked = {
+        row.user_id for row in daily_attendance.find(
+            {'date': daily_attendance.prep('date', day), 'status': {'$nin': list(MATERIALIZED_STATUSES)}},
+            ('user_id',),
+        )
+    }
+    start, end = day_bounds(day)
+    punched = set(attendance_records.collection.distinct('user_id', attendance_records.range_filter(start, end)))
+    punched = {attendance_records.fields['user_id'].to_python(user_id) for user_id in punched}
+    on_leave = set(LeaveRequest.objects.filter(
+        status='approved', start_date__lte=day, end_date__gte=day
+    ).values_list('user_id', flat=True))
+
+    day_off = {}
+    statuses = {}
+    for user_id, department_id in employees.items():
+        if user_id in worked or user_id in punched:
+            continue
+        if department_id not in day_off:
+            day_off[department_id] = rules_for('attendance', department_id, day).is_day_off(day)
+        if day_off[department_id]:
+            statuses[user_id] = 'holiday'
+        elif user_id in on_leave:
+            statuses[user_id] = 'on_leave'
+        elif include_absent:
+            statuses[user_id] = 'absent'
+    return statuses
+
+
+def materialize_day(day, include_absent=True):
+    """
+    Write the missing absent/on-leave/holiday rows for ``day`` and fix
+    materialized rows whose status changed (e.g. leave approved later).
+    Returns the number of rows written.
+    """
+    statuses = expected_statuses(day, include_absent)
+    # The rows this run rewrites or deletes
+    with primary_reads():
+        current = {
+            row.user_id: row.status for row in daily_attendance.find(
+                {'date': daily_attendance.prep('date', day), 'status': {'$in': list(MATERIALIZED_STATUSES)}},
+                ('user_id', 'status'),
+            )
+        }
+    rows = [
+        (user_id, day, {'status': status_value})
+        for user_id, status_value in statuses.items() if current.get(user_id) != status_value
+    ]
+    # Materialized rows for people who have since worked or left
+    stale = [user_id for user_id in current if user_id not in statuses and (include_absent or current[user_id] != 'absent')]
+    if stale:
+        daily_attendance.collection.delete_many({
+            'date': daily_attendance.prep('date', day),
+            'user_id': {'$in': [daily_attendance.prep('user_id', user_id) for user_id in stale]},
+            'status': {'$in': list(MATERIALIZED_STATUSES)},
+        })
+
+    daily_attendance.upsert_many(rows)
+    changed = [user_id for user_id, _, _ in rows] + stale
+    if changed:
+        monthly_attendance.refresh_many(month_start(day), changed)
+    return len(rows) + len(stale)
+
+
+def materialize_range(start_date, end_date, today=None):
+    """
+    materialize_day() for every date in the range. Dates before today are
+    completed; today only gets holiday and on-leave rows.
+    """
+    today = today or date.today()
+    written = 0
+    day = start_date
+    while day <= min(end_date, today):
+        written += materialize_day(day, include_absent=day < today)
+        day += timedelta(days=1)
+    return written
@@ -0,0 +1,104 @@
+"""
+Per-worker connections to polled biometric terminals.
+
+ZKDriver talks to ZKTeco-compatible terminals through pyzk, an optional
+dependency; without it NullDriver stands in and every poll returns no
+logs, as the sync task did before. Each worker process keeps one
+connection per device and reuses it across sync runs until it fails or
+sits idle for DEVICE_CONNECTION_IDLE_TIMEOUT seconds.
+"""
+import os
+import threading
+import time
+from django.conf import settings
+from .ingest import Punch
+
+
+class ZKDriver:
+    name = 'zk'
+
+    def __init__(self, device, timeout):
+        from zk import ZK
+
+        self.device_id = device.id
+        self.conn = ZK(device.ip_address, port=device.port, timeout=timeout).connect()
+
+    def fetch(self):
+        return [
+            Punch(self.device_id, log.user_id, log.timestamp, log.punch)
+            for log in self.conn.get_attendance() or []
+        ]
+
+    def close(self):
+        try:
+            self.conn.disconnect()
+        except Exception:
+            pass
+
+
+class NullDriver:
+    name = 'null'
+
+    def __init__(self, device, timeout):
+        self.device_id = device.id
+
+    def fetch(self):
+        return []
+
+    def close(self):
+        pass
+
+
+_driver = None
+_pool = {}
+_pid = None
+_lock = threading.Lock()
+
+
+def driver_class():
+    global _driver
+    if _driver is None:
+        try:
+            import zk  # noqa: F401
+            _driver = ZKDriver
+        except ImportError:
+            _driver = NullDriver
+    return _driver
+
+
+def open_connection(device):
+    return driver_class()(device, getattr(settings, 'DEVICE_CONNECT_TIMEOUT', 5))
+
+
+def get_connection(device):
+    """
+    This worker's idle connection to ``device``, or a new one. Returns
+    ``(connection, reused)``; hand it back with release() after use.
+    """
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            # Sockets inherited from the parent process are not ours to use
+            _pool.clear()
+            _pid = os.getpid()
+        entry = _pool.pop(device.id, None)
+
+    if entry:
+        connection, last_used = entry
+        if time.monotonic() - last_used < getattr(settings, 'DEVICE_CONNECTION_IDLE_TIMEOUT', 300):
+            return connection, True
+        connection.close()
+    return open_connection(device), False
+
+
+def release(device_id, connection):
+    with _lock:
+        _pool[device_id] = (connection, time.monotonic())
+
+
+def close_all():
+    with _lock:
+        entries = list(_pool.values())
+        _pool.clear()
+    for connection, _ in entries:
+        connection.close()
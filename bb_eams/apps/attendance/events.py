@@ -0,0 +1,283 @@
+"""
+Live attendance events for dashboards.
+
+Every punch is appended to a ring of sequence-numbered events in the
+Django cache and updates running per-department counters (present, late,
+on leave) for its date. AttendanceStreamView tails the ring as
+Server-Sent Events, so a dashboard subscribes once and gets deltas
+instead of re-polling the summary and daily views.
+
+Counters are seeded from the database the first time a date is touched
+and are only kept for dates that have live traffic (normally today).
+Publishing never waits for another process's seeding: an event published
+meanwhile carries no counters and is left for the seeder to count.
+"""
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from apps.accounts.authentication import get_user_projection
+
+COUNTERS = ('present', 'late', 'on_leave')
+NO_DEPARTMENT = 'none'
+
+SEQUENCE_KEY = 'attendance:events:seq'
+# Clock difference between app servers the seeder's second pass allows for
+SEED_MARGIN = timedelta(minutes=1)
+
+
+def _event_ttl():
+    return getattr(settings, 'ATTENDANCE_EVENT_TTL', 600)
+
+
+def _counter_ttl():
+    return int(timedelta(days=2).total_seconds())
+
+
+def _event_key(seq):
+    return f'attendance:events:{seq}'
+
+
+def _counter_key(day, department, name):
+    return f'attendance:counters:{day}:{department}:{name}'
+
+
+def _seen_key(day, kind, user_id):
+    return f'attendance:seen:{day}:{kind}:{user_id}'
+
+
+def _ready_key(day):
+    return f'attendance:counters:{day}:ready'
+
+
+def _department(user_id):
+    user = get_user_projection(user_id)
+    department_id = user and user['department_id']
+    return str(department_id) if department_id else NO_DEPARTMENT
+
+
+def _seed_counters(day):
+    """
+    Count present, late and on-leave employees for ``day`` from the
+    database and mark each counted employee as seen.
+    """
+    from apps.accounts.models import User
+    from apps.leave.models import LeaveRequest
+    from .repositories import attendance_records, day_bounds
+
+    started = timezone.now()
+    check_ins = {}
+    for record in attendance_records.find(
+        attendance_records.range_filter(*day_bounds(day), attendance_type='check_in'),
+        ('user_id', 'status', 'timestamp'), sort=[('timestamp', 1)],
+    ):
+        check_ins.setdefault(record.user_id, record.status)
+    on_leave = set(LeaveRequest.objects.filter(
+        status='approved', start_date__lte=day, end_date__gte=day
+    ).values_list('user_id', flat=True))
+
+    departments = dict(User.objects.filter(
+        id__in=set(check_ins) | on_leave
+    ).values_list('id', 'department_id'))
+    department = lambda user_id: str(departments[user_id]) if departments.get(user_id) else NO_DEPARTMENT
+
+    counts = {}
+    seen = {}
+    for user_id, status in check_ins.items():
+        counts[department(user_id), 'present'] = counts.get((department(user_id), 'present'), 0) + 1
+        if status == 'late':
+            counts[department(user_id), 'late'] = counts.get((department(user_id), 'late'), 0) + 1
+        seen[_seen_key(day, 'check_in', user_id)] = 1
+    for user_id in on_leave:
+        counts[department(user_id), 'on_leave'] = counts.get((department(user_id), 'on_leave'), 0) + 1
+        seen[_seen_key(day, 'leave', user_id)] = 1
+
+    ttl = _counter_ttl()
+    cache.set_many(seen, ttl)
+    cache.set_many({_counter_key(day, dept, name): count for (dept, name), count in counts.items()}, ttl)
+    cache.set(_ready_key(day), True, ttl)
+    _count_stored_since(day, started - SEED_MARGIN)
+
+
+def _count_stored_since(day, since):
+    """
+    Count check-ins stored since ``since`` and today's approved leaves.
+    They were published without counting while the seeding read ran;
+    the seen keys skip those it counted already.
+    """
+    from apps.leave.models import LeaveRequest
+    from .repositories import attendance_records, day_bounds
+
+    query = attendance_records.range_filter(*day_bounds(day), attendance_type='check_in')
+    query['created_at'] = {'$gte': attendance_records.prep('created_at', since)}
+    for record in attendance_records.find(query, ('user_id', 'status', 'timestamp'), sort=[('timestamp', 1)]):
+        _count_check_in(day, _department(record.user_id), record.user_id, record.status)
+    for user_id in LeaveRequest.objects.filter(
+        status='approved', start_date__lte=day, end_date__gte=day
+    ).values_list('user_id', flat=True):
+        _count_leave(day, _department(user_id), user_id)
+
+
+def ensure_counters(day, wait=5.0):
+    """
+    Seed the counters for ``day`` once across all processes; others wait
+    up to ``wait`` seconds for the seeding to finish. Returns whether the
+    counters are ready.
+    """
+    if cache.get(_ready_key(day)):
+        return True
+    lock = f'{_ready_key(day)}:lock'
+    if cache.add(lock, True, 60):
+        try:
+            _seed_counters(day)
+        finally:
+            cache.delete(lock)
+        return True
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        if cache.get(_ready_key(day)):
+            return True
+    return False
+
+
+def _incr(day, department, name):
+    key = _counter_key(day, department, name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, _counter_ttl()):
+            return 1
+        return cache.incr(key)
+
+
+def _count_check_in(day, department, user_id, status):
+    # An employee's first check-in of the day counts
+    if cache.add(_seen_key(day, 'check_in', user_id), 1, _counter_ttl()):
+        _incr(day, department, 'present')
+        if status == 'late':
+            _incr(day, department, 'late')
+
+
+def _count_leave(day, department, user_id):
+    if not cache.add(_seen_key(day, 'leave', user_id), 1, _counter_ttl()):
+        return False
+    _incr(day, department, 'on_leave')
+    return True
+
+
+def get_counters(day, department_ids=None, wait=5.0):
+    """
+    ``{department_id: {counter: value}}`` for ``day``.
+    """
+    from apps.core.cache import get_reference_list
+
+    ensure_counters(day, wait)
+    if department_ids is None:
+        department_ids = [str(department.id) for department in get_reference_list('department')] + [NO_DEPARTMENT]
+    keys = {
+        _counter_key(day, department, name): (department, name)
+        for department in department_ids for name in COUNTERS
+    }
+    values = cache.get_many(list(keys))
+    counters = {department: dict.fromkeys(COUNTERS, 0) for department in department_ids}
+    for key, value in values.items():
+        department, name = keys[key]
+        counters[department][name] = value
+    return counters
+
+
+def _append(event):
+    try:
+        seq = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # Seed from the clock so ids keep increasing if the counter is evicted
+        cache.add(SEQUENCE_KEY, int(time.time() * 1000), None)
+        seq = cache.incr(SEQUENCE_KEY)
+    event['id'] = seq
+    cache.set(_event_key(seq), event, _event_ttl())
+    return seq
+
+
+def publish_punch(record):
+    """
+    Append a punch event and update its department's counters. Only
+    punches dated today are published.
+    """
+    day = timezone.localtime(record.timestamp).date()
+    if day != timezone.localdate():
+        return None
+    # Runs inline in the punch request; never wait on another seeder
+    ready = ensure_counters(day, wait=0)
+
+    department = _department(record.user_id)
+    if ready and record.attendance_type == 'check_in':
+        _count_check_in(day, department, record.user_id, record.status)
+
+    user = get_user_projection(record.user_id)
+    return _append({
+        'type': 'punch',
+        'date': str(day),
+        'user_id': str(record.user_id),
+        'employee_name': f"{user['first_name']} {user['last_name']}".strip() if user else None,
+        'department_id': department,
+        'device_id': str(record.device_id),
+        'attendance_type': record.attendance_type,
+        'status': record.status,
+        'timestamp': record.timestamp.isoformat(),
+        'counters': get_counters(day, [department], wait=0)[department] if ready else None,
+    })
+
+
+def publish_punches(records):
+    for record in records:
+        publish_punch(record)
+
+
+def publish_leave_approved(leave_request):
+    """
+    Count a newly approved leave that covers today.
+    """
+    day = timezone.localdate()
+    if not (leave_request.start_date <= day <= leave_request.end_date):
+        return None
+    if not ensure_counters(day, wait=0):
+        # The seeder counts it
+        return None
+
+    department = _department(leave_request.user_id)
+    if not _count_leave(day, department, leave_request.user_id):
+        return None
+    return _append({
+        'type': 'leave',
+        'date': str(day),
+        'user_id': str(leave_request.user_id),
+        'department_id': department,
+        'counters': get_counters(day, [department], wait=0)[department],
+    })
+
+
+def latest_event_id():
+    return cache.get(SEQUENCE_KEY) or 0
+
+
+def events_after(last_id, limit=500):
+    """
+    Events with ids greater than ``last_id``, oldest first, stopping at the
+    first id whose event is not in the cache. Returns ``(events,
+    missing_id)``; ``missing_id`` is None when the ring was read to its
+    end. A missing id is either still being written or has expired.
+    """
+    latest = latest_event_id()
+    if latest <= last_id:
+        return [], None
+    ids = range(max(last_id + 1, latest - limit + 1), latest + 1)
+    found = cache.get_many([_event_key(seq) for seq in ids])
+    events = []
+    for seq in ids:
+        event = found.get(_event_key(seq))
+        if event is None:
+            return events, seq
+        events.append(event)
+    return events, None
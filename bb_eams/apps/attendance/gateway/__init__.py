@@ -0,0 +1,9 @@
+"""
+Asyncio gateway for push-mode biometric terminals.
+
+run_device_gateway keeps persistent connections to the terminals (they
+connect in, or the gateway dials them), decodes their punch frames and
+stores them in micro-batches through apps.attendance.ingest, the same
+path the polling sync task uses. simulate_terminals drives it with
+simulated terminals entirely locally.
+"""
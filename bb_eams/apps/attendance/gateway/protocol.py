@@ -0,0 +1,77 @@
+"""
+Wire format spoken between the gateway and push-mode terminals.
+
+Every frame is a 4-byte big-endian length followed by a UTF-8 JSON
+object with a ``type``:
+
+    hello   terminal -> gateway   {"serial", "token"}   first frame on a connection
+    punch   terminal -> gateway   {"seq", "employee_id", "timestamp", "punch"}
+    ack     gateway -> terminal   {"seq"}               sent once the punch is stored
+    ping    either direction      answered with pong
+    error   gateway -> terminal   {"reason"}            sent before closing
+
+A terminal's token is device_token(serial, DEVICE_GATEWAY_SECRET), so
+each device has its own credential and one leaked token only speaks for
+its terminal. For outbound connections the gateway sends the hello (with
+only the token) and the terminal answers with its own. Terminals keep punches
+until they are acknowledged and resend them after a reconnect; ingest
+drops the duplicates, so delivery is at-least-once end to end.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import struct
+
+HEADER = struct.Struct('>I')
+MAX_FRAME_SIZE = 64 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def device_token(serial, secret):
+    """
+    The hello token of one terminal.
+    """
+    return hmac.new(secret.encode(), f'gateway:{serial}'.encode(), hashlib.sha256).hexdigest()
+
+
+def encode(message):
+    body = json.dumps(message, separators=(',', ':')).encode()
+    return HEADER.pack(len(body)) + body
+
+
+async def read_frame(reader, timeout=None):
+    """
+    Next message from ``reader``, or None when the peer closed the
+    connection between frames. ``timeout`` only applies while waiting for
+    a frame to start, so a timeout never leaves half a frame consumed.
+    """
+    try:
+        header = await asyncio.wait_for(reader.readexactly(HEADER.size), timeout)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise ProtocolError('Connection closed inside a frame header')
+    (length,) = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f'Frame of {length} bytes exceeds {MAX_FRAME_SIZE}')
+
+    try:
+        body = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise ProtocolError('Connection closed inside a frame')
+    try:
+        message = json.loads(body)
+    except ValueError as e:
+        raise ProtocolError(f'Invalid JSON frame: {e}')
+    if not isinstance(message, dict) or 'type' not in message:
+        raise ProtocolError('Frame without a type')
+    return message
+
+
+async def send(writer, message):
+    writer.write(encode(message))
+    await writer.drain()
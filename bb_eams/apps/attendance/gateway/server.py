@@ -0,0 +1,238 @@
+import asyncio
+import hmac
+import logging
+import random
+from datetime import datetime
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections
+from apps.core import metrics
+from apps.core.models import Device
+from apps.attendance.ingest import Punch
+from .protocol import ProtocolError, device_token, encode, read_frame, send
+
+logger = logging.getLogger('apps.attendance.gateway')
+
+DEVICE_FIELDS = ('id', 'device_serial', 'ip_address', 'port')
+
+
+def _find_device(**filters):
+    close_old_connections()
+    return Device.objects.filter(**filters).values(*DEVICE_FIELDS).first()
+
+
+class DeviceGateway:
+    """
+    Holds persistent connections to biometric terminals and feeds their
+    punches to a BatchWriter.
+
+    Terminals either connect in (serve()) or are dialled by the gateway
+    (dial()); both end up in session(), which acknowledges every punch
+    once the writer has stored it. One session is kept per terminal; a
+    terminal that reconnects replaces its stale session. Terminals
+    authenticate with their device_token() under ``secret``.
+    """
+
+    def __init__(self, writer, secret, heartbeat=30, min_backoff=1, max_backoff=60, connect_timeout=10):
+        if not secret:
+            raise ImproperlyConfigured('The device gateway needs DEVICE_GATEWAY_SECRET')
+        self.writer = writer
+        self.secret = secret
+        self.heartbeat = heartbeat
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.connect_timeout = connect_timeout
+        self.sessions = {}
+        self.servers = []
+        self.tasks = set()
+        self.stopping = False
+
+    async def run_sync(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(None, lambda: func(*args, **kwargs))
+
+    def spawn(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.accept, host, port)
+        self.servers.append(server)
+        logger.info('event=listening address=%s', ', '.join(str(s.getsockname()) for s in server.sockets))
+        return server
+
+    async def accept(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        try:
+            hello = await read_frame(reader, self.connect_timeout)
+            device = await self.authenticate(hello)
+        except (ProtocolError, asyncio.TimeoutError, ConnectionError) as e:
+            logger.warning('event=rejected peer=%s reason="%s"', peer, e)
+            await self.close(writer, reason=str(e))
+            return
+        await self.session(device, reader, writer)
+
+    async def authenticate(self, hello):
+        if not hello or hello['type'] != 'hello' or not hello.get('serial'):
+            raise ProtocolError('Expected a hello frame with a serial')
+        token = device_token(str(hello['serial']), self.secret)
+        if not hmac.compare_digest(str(hello.get('token', '')), token):
+            raise ProtocolError('Invalid token')
+        device = await self.run_sync(_find_device, device_serial=hello['serial'])
+        if not device:
+            raise ProtocolError(f"Unknown device {hello['serial']}")
+        return device
+
+    async def dial(self, device):
+        """
+        Keep an outbound connection to a listening terminal, reconnecting
+        with capped exponential backoff and jitter.
+        """
+        delay = self.min_backoff
+        labels = {'device': device['device_serial']}
+        while not self.stopping:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(device['ip_address'], device['port']), self.connect_timeout
+                )
+                await send(writer, {'type': 'hello', 'token': device_token(device['device_serial'], self.secret)})
+                hello = await read_frame(reader, self.connect_timeout)
+                if not hello or hello.get('serial') != device['device_serial']:
+                    raise ProtocolError('Terminal answered with another serial')
+            except (OSError, ProtocolError, asyncio.TimeoutError) as e:
+                metrics.inc('device_gateway_connect_failures_total', labels)
+                logger.warning('event=connect_failed device=%s retry_in=%.1f error="%s"',
+                               device['device_serial'], delay, e)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, self.max_backoff)
+                continue
+
+            delay = self.min_backoff
+            # In its own task, so a replacing session does not cancel this loop
+            await asyncio.wait([self.spawn(self.session(device, reader, writer))])
+            if not self.stopping:
+                await asyncio.sleep(self.min_backoff * random.uniform(0.5, 1.0))
+
+    def decode(self, device, message):
+        try:
+            return Punch(
+                device['id'], str(message['employee_id']),
+                datetime.fromisoformat(message['timestamp']), message.get('punch', 0),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ProtocolError(f'Malformed punch: {e!r}')
+
+    def acknowledge(self, writer, seq):
+        def done(future):
+            if not future.cancelled() and not writer.is_closing():
+                writer.write(encode({'type': 'ack', 'seq': seq}))
+        return done
+
+    async def session(self, device, reader, writer):
+        serial = device['device_serial']
+        labels = {'device': serial}
+        previous = self.sessions.get(serial)
+        if previous:
+            previous.cancel()
+        self.sessions[serial] = asyncio.current_task()
+        metrics.set_gauge('device_gateway_connections', len(self.sessions))
+        logger.info('event=connected device=%s peer=%s', serial, writer.get_extra_info('peername'))
+
+        awaiting_pong = False
+        reason = None
+        try:
+            while True:
+                try:
+                    message = await read_frame(reader, self.heartbeat)
+                except asyncio.TimeoutError:
+                    if awaiting_pong:
+                        reason = 'heartbeat timeout'
+                        break
+                    awaiting_pong = True
+                    await send(writer, {'type': 'ping'})
+                    continue
+                if message is None:
+                    break
+                awaiting_pong = False
+
+                kind = message['type']
+                if kind == 'punch':
+                    punch = self.decode(device, message)
+                    metrics.inc('device_gateway_punches_received_total', labels)
+                    future = await self.writer.submit(punch)
+                    future.add_done_callback(self.acknowledge(writer, message.get('seq')))
+                elif kind == 'ping':
+                    await send(writer, {'type': 'pong'})
+                elif kind != 'pong':
+                    raise ProtocolError(f'Unexpected {kind} frame')
+        except ProtocolError as e:
+            reason = str(e)
+            logger.warning('event=protocol_error device=%s error="%s"', serial, e)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logger.info('event=connection_lost device=%s error="%s"', serial, e)
+        finally:
+            if self.sessions.get(serial) is asyncio.current_task():
+                del self.sessions[serial]
+            metrics.set_gauge('device_gateway_connections', len(self.sessions))
+            await self.close(writer, reason)
+            logger.info('event=disconnected device=%s', serial)
+
+    async def close(self, writer, reason=None):
+        try:
+            if reason and not writer.is_closing():
+                await send(writer, {'type': 'error', 'reason': reason})
+            writer.close()
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+    async def dial_devices(self, serials=None):
+        """
+        Dial every device with an IP address, or only ``serials``.
+        """
+        def load():
+            close_old_connections()
+            queryset = Device.objects.exclude(ip_address__isnull=True)
+            if serials:
+                queryset = queryset.filter(device_serial__in=serials)
+            return list(queryset.values(*DEVICE_FIELDS))
+
+        found = await self.run_sync(load)
+        for device in found:
+            self.spawn(self.dial(device))
+        return found
+
+    async def shutdown(self):
+        """
+        Stop accepting connections, close the sessions and store every
+        punch already queued.
+        """
+        self.stopping = True
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        for task in list(self.tasks) + list(self.sessions.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks, *self.sessions.values(), return_exceptions=True)
+        await self.writer.close()
+        await self.run_sync(metrics.registry.flush, force=True)
+
+    async def run(self, host, port, dial=None, stop=None):
+        """
+        Serve push connections on ``host:port`` (and dial ``dial`` serials,
+        or every device when ``dial`` is True) until ``stop`` is set.
+        """
+        stop = stop or asyncio.Event()
+        self.writer.start()
+        await self.serve(host, port)
+        if dial:
+            await self.dial_devices(None if dial is True else dial)
+        try:
+            await stop.wait()
+        finally:
+            await self.shutdown()
+
+
+metrics.define('device_gateway_connections', 'gauge', 'Terminals connected to the gateway.')
+metrics.define('device_gateway_punches_received_total', 'counter', 'Punch frames received by device.')
+metrics.define('device_gateway_connect_failures_total', 'counter', 'Failed outbound connection attempts by device.')
@@ -0,0 +1,146 @@
+"""
+Simulated push-mode terminals, for exercising the gateway locally.
+
+A SimulatedTerminal generates punches at a fixed rate, keeps each one
+until the gateway acknowledges it and resends everything unacknowledged
+after a reconnect, the way real terminals replay their log. ``drop_every``
+makes it cut its own connection after every N frames to exercise reconnects
+and duplicate suppression.
+"""
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime
+from .protocol import ProtocolError, encode, read_frame, send
+
+
+class SimulatedTerminal:
+    def __init__(self, serial, employee_ids, host, port, token='', rate=10.0, count=100,
+                 drop_every=0, seed=0, min_backoff=0.1, max_backoff=5):
+        self.serial = serial
+        self.employee_ids = list(employee_ids)
+        self.host = host
+        self.port = port
+        self.token = token
+        self.rate = rate
+        self.count = count
+        self.drop_every = drop_every
+        self.rng = random.Random(f'{seed}:{serial}')
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.unacked = OrderedDict()
+        self.states = {}
+        self.produced = 0
+        self.frames = 0
+        self.acked = 0
+        self.reconnects = 0
+        self.errors = []
+
+    def punch(self, seq):
+        employee_id = self.rng.choice(self.employee_ids)
+        # Alternate check-in (0) and check-out (1) per employee
+        state = self.states[employee_id] = 1 - self.states.get(employee_id, 1)
+        return {
+            'type': 'punch', 'seq': seq, 'employee_id': employee_id, 'punch': state,
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+        }
+
+    async def produce(self):
+        interval = 1 / self.rate if self.rate else 0
+        for seq in range(1, self.count + 1):
+            self.unacked[seq] = self.punch(seq)
+            self.produced = seq
+            await asyncio.sleep(interval)
+
+    @property
+    def finished(self):
+        return self.produced == self.count and not self.unacked
+
+    async def read_acks(self, reader, writer):
+        while True:
+            message = await read_frame(reader)
+            if message is None:
+                return
+            if message['type'] == 'ack':
+                if self.unacked.pop(message.get('seq'), None) is not None:
+                    self.acked += 1
+            elif message['type'] == 'ping':
+                await send(writer, {'type': 'pong'})
+            elif message['type'] == 'error':
+                self.errors.append(message.get('reason'))
+                return
+
+    async def stream(self, writer, acks):
+        sent = set()
+        while not self.finished and not acks.done():
+            for seq in [seq for seq in self.unacked if seq not in sent]:
+                writer.write(encode(self.unacked[seq]))
+                sent.add(seq)
+                self.frames += 1
+            await writer.drain()
+            await asyncio.sleep(0.02)
+            # Drop between bursts, leaving some frames in flight unacknowledged
+            if self.drop_every and len(sent) >= self.drop_every:
+                raise ConnectionResetError('simulated connection drop')
+
+    async def run(self):
+        producer = asyncio.get_running_loop().create_task(self.produce())
+        delay = self.min_backoff
+        try:
+            while not self.finished:
+                try:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                    await send(writer, {'type': 'hello', 'serial': self.serial, 'token': self.token})
+                except OSError:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_backoff)
+                    continue
+
+                delay = self.min_backoff
+                acks = asyncio.get_running_loop().create_task(self.read_acks(reader, writer))
+                try:
+                    await self.stream(writer, acks)
+                except (ConnectionError, ProtocolError):
+                    pass
+                finally:
+                    acks.cancel()
+                    writer.close()
+                    try:
+                        await writer.wait_closed()
+                    except (ConnectionError, OSError):
+                        pass
+                if not self.finished:
+                    self.reconnects += 1
+                    await asyncio.sleep(delay)
+        finally:
+            producer.cancel()
+        return self
+
+
+async def run_terminals(terminals, timeout=None):
+    """
+    Run ``terminals`` concurrently until every punch is acknowledged or
+    ``timeout`` seconds pass. Returns a summary dict.
+    """
+    started = time.perf_counter()
+    tasks = [asyncio.get_running_loop().create_task(terminal.run()) for terminal in terminals]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    acked = sum(terminal.acked for terminal in terminals)
+    return {
+        'terminals': len(terminals),
+        'produced': sum(terminal.produced for terminal in terminals),
+        'frames': sum(terminal.frames for terminal in terminals),
+        'acked': acked,
+        'unacked': sum(len(terminal.unacked) for terminal in terminals),
+        'reconnects': sum(terminal.reconnects for terminal in terminals),
+        'errors': sorted({error for terminal in terminals for error in terminal.errors}),
+        'timed_out': bool(pending),
+        'seconds': round(elapsed, 3),
+        'acked_per_second': round(acked / elapsed, 1) if elapsed else 0,
+    }
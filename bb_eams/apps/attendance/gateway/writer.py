@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+from pymongo.errors import ConnectionFailure
+from apps.core import metrics
+from apps.attendance.ingest import ingest_punches
+
+logger = logging.getLogger('apps.attendance.gateway')
+dead_letters = logging.getLogger('apps.attendance.gateway.dead_letter')
+
+
+def is_transient(error):
+    """
+    Whether ``error`` is the database being unreachable rather than
+    something wrong with the punches; djongo wraps the pymongo error.
+    """
+    return isinstance(error, ConnectionFailure) or isinstance(error.__cause__, ConnectionFailure)
+
+
+def log_dead_letter(punch, error):
+    dead_letters.error(
+        'event=punch_dead_lettered device=%s employee=%s timestamp=%s punch=%s error="%s"',
+        punch.device_id, punch.employee_id, punch.timestamp, punch.punch_type, error,
+    )
+
+
+class BatchWriter:
+    """
+    Collects punches from every connection into micro-batches and stores
+    each batch with one ingest_punches() call on a worker thread.
+
+    The queue is bounded: when the database falls behind, submit() waits,
+    connection handlers stop reading, and TCP flow control pushes back on
+    the terminals instead of the gateway buffering without limit.
+
+    A failed batch is retried with capped backoff and its punches stay
+    unacknowledged until it is stored. While the database is unreachable
+    that goes on indefinitely; any other error is retried
+    ``max_attempts`` times, then the batch is split in halves and each is
+    written on its own, until the punches that cannot be stored are
+    isolated and handed to ``dead_letter`` (logged to
+    apps.attendance.gateway.dead_letter by default). Those are
+    acknowledged too, so the terminal stops resending them and one bad
+    punch never holds up the queue.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=0.25, queue_size=20000, retry_delay=0.5,
+                 max_retry_delay=30, max_attempts=3, ingest=ingest_punches, dead_letter=log_dead_letter):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.ingest = ingest
+        self.dead_letter = dead_letter
+        self.queue = asyncio.Queue(queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gateway-writer')
+        self.received = 0
+        self.stored = 0
+        self.batches = 0
+        self.dead_lettered = 0
+        self.closing = False
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    async def submit(self, punch):
+        """
+        Queue ``punch``, waiting while the queue is full. Returns a future
+        that resolves once the punch is stored.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((punch, future))
+        self.received += 1
+        return future
+
+    async def next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await asyncio.wait_for(self.queue.get(), self.flush_interval)]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        while True:
+            try:
+                batch = await self.next_batch()
+            except asyncio.TimeoutError:
+                if self.closing:
+                    return
+                continue
+            await self.write(batch)
+
+    def store(self, punches):
+        close_old_connections()
+        try:
+            return self.ingest(punches)
+        finally:
+            metrics.registry.flush()
+
+    async def write(self, batch):
+        metrics.set_gauge('device_gateway_queue_depth', self.queue.qsize())
+        await self.write_punches([punch for punch, _ in batch])
+        self.batches += 1
+        for _, future in batch:
+            if not future.done():
+                future.set_result(True)
+
+    async def write_punches(self, punches):
+        """
+        Store ``punches``, splitting them when they keep failing. Storing
+        again after a partial failure is safe: ingest drops punches that
+        are already stored.
+        """
+        loop = asyncio.get_running_loop()
+        delay = self.retry_delay
+        attempts = 0
+        error = None
+        while True:
+            started = time.perf_counter()
+            try:
+                records = await loop.run_in_executor(self.executor, self.store, punches)
+                break
+            except Exception as e:
+                metrics.inc('device_gateway_write_failures_total')
+                if not is_transient(e):
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        logger.error('event=batch_given_up punches=%d error="%s"', len(punches), e)
+                        error = e
+                        break
+                logger.error('event=batch_failed punches=%d retry_in=%.1f error="%s"',
+                             len(punches), delay, e, exc_info=True)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+        if error is None:
+            metrics.observe('device_gateway_batch_size', len(punches))
+            metrics.observe('device_gateway_write_seconds', time.perf_counter() - started)
+            metrics.inc('device_gateway_punches_stored_total', amount=len(records))
+            self.stored += len(records)
+        elif len(punches) == 1:
+            metrics.inc('device_gateway_dead_letters_total')
+            self.dead_lettered += 1
+            self.dead_letter(punches[0], error)
+        else:
+            middle = len(punches) // 2
+            await self.write_punches(punches[:middle])
+            await self.write_punches(punches[middle:])
+
+    async def close(self):
+        """
+        Store everything still queued, then stop the worker thread.
+        """
+        self.closing = True
+        if self.task:
+            await self.task
+        self.executor.shutdown(wait=True)
+
+
+metrics.define('device_gateway_batch_size', 'histogram', 'Punches per gateway database write.', metrics.COUNT_BUCKETS)
+metrics.define('device_gateway_write_seconds', 'histogram', 'Time to store one gateway batch.')
+metrics.define('device_gateway_punches_stored_total', 'counter', 'New attendance records written by the gateway.')
+metrics.define('device_gateway_write_failures_total', 'counter', 'Gateway batch writes that failed and were retried.')
+metrics.define('device_gateway_dead_letters_total', 'counter', 'Punches given up on after repeated write failures.')
+metrics.define('device_gateway_queue_depth', 'gauge', 'Punches waiting in the gateway queue.')
@@ -0,0 +1,203 @@
+"""
+Device health and adaptive polling.
+
+Each polled device's health lives in the cache under
+``device:health:<id>``: its state, consecutive failures, a moving
+average of poll latency, when it was last seen and when it is next due.
+record_poll() runs the state machine after every poll:
+
+    success, latency within DEVICE_DEGRADED_LATENCY_MS   -> online
+    slower success, or a failure below the threshold     -> degraded
+    DEVICE_OFFLINE_AFTER_FAILURES failures in a row      -> offline
+
+and schedules the next poll: DEVICE_POLL_MIN_INTERVAL after a poll that
+returned punches, doubling towards DEVICE_POLL_MAX_INTERVAL while a
+device is idle and backing off exponentially up to
+DEVICE_OFFLINE_BACKOFF_MAX while it fails. Device.status is only written
+when the state changes, in one bulk update per sync run.
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.core.cache import cache
+from apps.core.cache import bump_reference_version
+from . import connections
+from .ingest import ingest_punches, normalize_timestamp
+from .repositories import devices as device_repository
+
+STATES = ('online', 'degraded', 'offline')
+
+# Terminals return their whole log, oldest entry first. Entries past the
+# length seen by the last poll are new whatever their timestamps say (a
+# corrected device clock can move backwards); of the rest, punches older
+# than the last poll's newest punch minus this overlap were already stored
+LOG_OVERLAP = timedelta(hours=1)
+LATENCY_SMOOTHING = 0.3
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _key(device_id):
+    return f'device:health:{device_id}'
+
+
+def _ttl():
+    return int(timedelta(days=7).total_seconds())
+
+
+def initial_health(device):
+    return {
+        'state': device.status if device.status in STATES else 'offline',
+        'failures': 0,
+        'latency_ms': None,
+        'interval': _setting('DEVICE_POLL_MIN_INTERVAL', 60),
+        'next_poll': 0,
+        'last_seen': device.last_communication.timestamp() if device.last_communication else None,
+        'last_error': None,
+        'cursor': None,
+        'log_size': None,
+        'polled': False,
+    }
+
+
+def get_health(device):
+    return cache.get(_key(device.id)) or initial_health(device)
+
+
+def get_health_many(devices):
+    found = cache.get_many([_key(device.id) for device in devices])
+    return {device.id: found.get(_key(device.id)) or initial_health(device) for device in devices}
+
+
+def save_health(device_id, health):
+    cache.set(_key(device_id), health, _ttl())
+
+
+def is_due(health, now=None):
+    return health['next_poll'] <= (now or time.time())
+
+
+def record_poll(health, ok, latency_ms=None, punches=0, error=None, now=None):
+    """
+    Apply one poll outcome to ``health`` in place and schedule the next
+    poll. Returns the new state.
+    """
+    now = now or time.time()
+    min_interval = _setting('DEVICE_POLL_MIN_INTERVAL', 60)
+    health['polled'] = True
+
+    if ok:
+        previous = health['latency_ms']
+        health['latency_ms'] = round(latency_ms if previous is None else
+                                     previous + LATENCY_SMOOTHING * (latency_ms - previous), 1)
+        health['failures'] = 0
+        health['last_seen'] = now
+        health['last_error'] = None
+        slow = health['latency_ms'] > _setting('DEVICE_DEGRADED_LATENCY_MS', 2000)
+        health['state'] = 'degraded' if slow else 'online'
+        interval = min_interval if punches else min(health['interval'] * 2, _setting('DEVICE_POLL_MAX_INTERVAL', 900))
+    else:
+        health['failures'] += 1
+        health['last_error'] = str(error)[:200] if error else None
+        offline = health['failures'] >= _setting('DEVICE_OFFLINE_AFTER_FAILURES', 3)
+        health['state'] = 'offline' if offline else 'degraded'
+        interval = min(min_interval * 2 ** health['failures'], _setting('DEVICE_OFFLINE_BACKOFF_MAX', 1800))
+
+    health['interval'] = interval
+    # Jitter keeps devices that failed together from retrying together
+    health['next_poll'] = now + interval * random.uniform(0.9, 1.1)
+    return health['state']
+
+
+def fetch_punches(device):
+    """
+    Read the device log over this worker's pooled connection, retrying
+    once on a fresh connection when a reused one turns out to be stale.
+    """
+    connection, reused = connections.get_connection(device)
+    try:
+        punches = connection.fetch()
+    except Exception:
+        connection.close()
+        if not reused:
+            raise
+        connection = connections.open_connection(device)
+        try:
+            punches = connection.fetch()
+        except Exception:
+            connection.close()
+            raise
+    connections.release(device.id, connection)
+    return punches
+
+
+def poll_device(device, health):
+    """
+    Poll ``device``, store its new punches and update ``health``. Returns
+    the records written; a device error is recorded rather than raised.
+    """
+    started = time.perf_counter()
+    try:
+        punches = fetch_punches(device)
+    except Exception as e:
+        record_poll(health, False, error=e)
+        return []
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    log_size = len(punches)
+    cursor, seen = health.get('cursor'), health.get('log_size')
+    # A shorter log was cleared on the device; read it all again and let
+    # ingest_punches drop what is already stored
+    if cursor is not None and seen is not None and seen <= log_size:
+        punches = [
+            punch for punch in punches[:seen]
+            if normalize_timestamp(punch.timestamp).timestamp() >= cursor - LOG_OVERLAP.total_seconds()
+        ] + list(punches[seen:])
+    records = ingest_punches(punches)
+    record_poll(health, True, latency_ms, len(records))
+    if punches:
+        health['cursor'] = max(normalize_timestamp(punch.timestamp).timestamp() for punch in punches)
+    health['log_size'] = log_size
+    return records
+
+
+def apply_transitions(statuses):
+    """
+    Write changed device states in one bulk update.
+    """
+    if not statuses:
+        return
+    device_repository.set_statuses(statuses)
+    bump_reference_version('device')
+
+
+def health_summary(devices, now=None):
+    """
+    Per-device health rows and counts by state for ``devices``.
+    """
+    now = now or time.time()
+    healths = get_health_many(devices)
+    rows = []
+    for device in devices:
+        health = healths[device.id]
+        rows.append({
+            'id': device.id,
+            'name': device.name,
+            'device_serial': device.device_serial,
+            'location': device.location,
+            'state': health['state'],
+            'failures': health['failures'],
+            'latency_ms': health['latency_ms'],
+            'last_seen': datetime.fromtimestamp(health['last_seen'], timezone.utc) if health['last_seen'] else None,
+            'last_error': health['last_error'],
+            'poll_interval': health['interval'],
+            'next_poll_in': max(0, round(health['next_poll'] - now)) if health['polled'] else None,
+            'polled': health['polled'],
+        })
+    counts = dict.fromkeys(STATES, 0)
+    for row in rows:
+        counts[row['state']] += 1
+    return {'counts': counts, 'devices': rows}
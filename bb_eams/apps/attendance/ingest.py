@@ -0,0 +1,93 @@
+"""
+Turns raw device punches into attendance records.
+
+Shared by the polling sync task and the push gateway, so both resolve
+employees, drop re-delivered logs, classify punches and publish live
+events the same way.
+"""
+from collections import namedtuple
+from datetime import datetime
+from django.utils import timezone
+from apps.accounts.models import User
+from apps.core.routing import record_writes
+from .events import publish_punches
+from .models import AttendanceRecord
+from .repositories import attendance_records, devices
+from .roster import RosterIndex, classify_punch
+
+Punch = namedtuple('Punch', 'device_id employee_id timestamp punch_type')
+
+# Terminal punch states: 0/4/5 are check-in variants, the rest check-out
+CHECK_IN_STATES = ('0', '4', '5')
+
+
+def attendance_type_for(punch_type):
+    return 'check_in' if str(punch_type) in CHECK_IN_STATES else 'check_out'
+
+
+def normalize_timestamp(timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    # MongoDB keeps milliseconds; match it so re-delivered logs compare equal
+    return timestamp.replace(microsecond=timestamp.microsecond // 1000 * 1000)
+
+
+def build_records(punches):
+    """
+    AttendanceRecords for ``punches`` that are not stored yet, with
+    unknown employees and duplicates dropped.
+    """
+    punches = [
+        punch._replace(employee_id=str(punch.employee_id), timestamp=normalize_timestamp(punch.timestamp))
+        for punch in punches if punch.employee_id
+    ]
+    if not punches:
+        return []
+
+    user_ids = dict(User.objects.filter(
+        employee_id__in={punch.employee_id for punch in punches}
+    ).values_list('employee_id', 'id'))
+    existing = attendance_records.existing_punches(
+        {punch.device_id for punch in punches}, [punch.timestamp for punch in punches]
+    )
+    timestamps = [punch.timestamp for punch in punches]
+    roster = RosterIndex(set(user_ids.values()), min(timestamps), max(timestamps))
+    records = []
+
+    for punch in punches:
+        user_id = user_ids.get(punch.employee_id)
+        key = (punch.device_id, user_id, punch.timestamp)
+        if not user_id or key in existing:
+            continue
+        existing.add(key)
+
+        attendance_type = attendance_type_for(punch.punch_type)
+
+        records.append(AttendanceRecord(
+            user_id=user_id,
+            device_id=punch.device_id,
+            timestamp=punch.timestamp,
+            attendance_type=attendance_type,
+            status=classify_punch(attendance_type, punch.timestamp, roster.find(user_id, punch.timestamp)),
+            biometric_verified=True,
+            synced=True
+        ))
+    return records
+
+
+def ingest_punches(punches):
+    """
+    Store new punches with one insert_many, publish them to the live
+    stream and touch the devices they came from. Returns the records
+    written.
+    """
+    records = build_records(punches)
+    attendance_records.insert_many(records)
+    publish_punches(records)
+    record_writes({record.user_id for record in records})
+    now = timezone.now()
+    for device_id in {punch.device_id for punch in punches}:
+        devices.touch(device_id, now)
+    return records
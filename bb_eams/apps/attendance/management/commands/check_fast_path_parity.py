@@ -0,0 +1,162 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from apps.attendance.models import AttendanceRecord, DailyAttendance
+from apps.attendance import roster
+from apps.attendance.repositories import attendance_records, daily_attendance, devices, shift_roster
+from apps.attendance.serializers import (
+    AttendanceRecordSerializer, DailyAttendanceSerializer, compiled_attendance_records, compiled_daily_attendance,
+)
+from apps.attendance.utils import compute_daily_values, first_and_last_punch
+from apps.core.models import Device
+from apps.core.renderers import FastJSONRenderer
+from apps.leave.models import LeaveRequest
+from apps.leave.serializers import LeaveRequestSerializer, compiled_leave_requests
+
+
+def field_values(instance, fields=None):
+    names = fields or [field.attname for field in instance._meta.concrete_fields]
+    values = {}
+    for name in names:
+        value = getattr(instance, name)
+        if isinstance(value, datetime):
+            # MongoDB stores milliseconds
+            value = value.replace(microsecond=value.microsecond // 1000 * 1000)
+        values[name] = value
+    return values
+
+
+class Command(BaseCommand):
+    help = 'Compare the native repository fast path with the ORM on a sample of live data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sample', type=int, default=200, help='User-days to compare')
+        parser.add_argument('--days', type=int, default=30, help='Sample from punches in the last N days')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--write', action='store_true',
+                            help='Also round-trip writes through the fast path (rows are deleted afterwards)')
+
+    def handle(self, *args, **options):
+        self.mismatches = []
+        self.checked = 0
+        rng = random.Random(options['seed'])
+
+        since = timezone.now() - timedelta(days=options['days'])
+        pairs = sorted({
+            (user_id, timezone.localtime(timestamp).date())
+            for user_id, timestamp in AttendanceRecord.objects.filter(
+                timestamp__gte=since
+            ).values_list('user_id', 'timestamp')[:options['sample'] * 20]
+        })
+        pairs = rng.sample(pairs, min(options['sample'], len(pairs)))
+        if not pairs:
+            raise CommandError('No attendance records in the sampled range; seed some with seed_data')
+
+        for user_id, day in pairs:
+            self.check_punches(user_id, day)
+            self.check_daily(user_id, day)
+        for device in Device.objects.all()[:options['sample']]:
+            self.compare('device', device.id, field_values(device), field_values(devices.get(device.id)))
+        for name, queryset, serializer_class, compiled in (
+            ('attendance_records', AttendanceRecord.objects.order_by('-timestamp'),
+             AttendanceRecordSerializer, compiled_attendance_records),
+            ('daily_attendance', DailyAttendance.objects.order_by('-date'),
+             DailyAttendanceSerializer, compiled_daily_attendance),
+            ('leave_requests', LeaveRequest.objects.order_by('-created_at'),
+             LeaveRequestSerializer, compiled_leave_requests),
+        ):
+            self.check_list(name, queryset[:options['sample']], serializer_class, compiled)
+        if options['write']:
+            self.check_writes(pairs[0][0])
+
+        for mismatch in self.mismatches:
+            self.stderr.write(mismatch)
+        if self.mismatches:
+            raise CommandError(f'{len(self.mismatches)} of {self.checked} checks differ')
+        self.stdout.write(self.style.SUCCESS(f'{self.checked} checks match'))
+
+    def compare(self, name, key, expected, actual):
+        self.checked += 1
+        if expected != actual:
+            self.mismatches.append(f'{name} {key}: ORM {expected!r} != fast path {actual!r}')
+
+    def check_punches(self, user_id, day):
+        orm = list(AttendanceRecord.objects.filter(user_id=user_id, timestamp__date=day).order_by('timestamp'))
+        fast = attendance_records.punches_for_day(user_id, day, fields=None)
+        key = (user_id, day)
+        self.compare('punches_for_day', key, [field_values(r) for r in orm], [field_values(r) for r in fast])
+        self.compare('punch_types', key, {r.attendance_type for r in orm}, attendance_records.punch_types(user_id, day))
+        for attendance_type in ('check_in', 'check_out'):
+            self.compare(
+                f'has_punch[{attendance_type}]', key,
+                any(r.attendance_type == attendance_type for r in orm),
+                attendance_records.has_punch(user_id, attendance_type, day),
+            )
+
+    def check_daily(self, user_id, day):
+        key = (user_id, day)
+        orm_in = AttendanceRecord.objects.filter(
+            user_id=user_id, attendance_type='check_in', timestamp__date=day
+        ).order_by('timestamp').first()
+        orm_out = AttendanceRecord.objects.filter(
+            user_id=user_id, attendance_type='check_out', timestamp__date=day
+        ).order_by('-timestamp').first()
+        fast_in, fast_out = first_and_last_punch(attendance_records.punches_for_day(user_id, day))
+        self.compare('first_check_in', key, orm_in and orm_in.id, fast_in and fast_in.id)
+        self.compare('last_check_out', key, orm_out and orm_out.id, fast_out and fast_out.id)
+
+        if orm_in and orm_out and fast_in and fast_out:
+            row = roster.row_for_date(user_id, day)
+            self.compare(
+                'daily_values', key,
+                compute_daily_values(orm_in, orm_out, row),
+                compute_daily_values(fast_in, fast_out, row),
+            )
+
+        if roster.is_generated(day):
+            # The materialized roster must match resolving Assignment on the fly
+            built = roster.build_rows(day, day, [user_id]).get((user_id, day))
+            stored = shift_roster.get(user_id, day)
+            roster_fields = ('shift_id', 'window_start', 'window_end', 'grace_end')
+            self.compare(
+                'shift_roster', key,
+                built and field_values(built, roster_fields), stored and field_values(stored, roster_fields),
+            )
+
+        row = DailyAttendance.objects.filter(user_id=user_id, date=day).first()
+        fast_row = daily_attendance.get(user_id, day)
+        self.compare('daily_attendance', key, row and field_values(row), fast_row and field_values(fast_row))
+
+    def check_list(self, name, queryset, serializer_class, compiled):
+        # The compiled serializer and orjson renderer against DRF's own, byte for byte
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        data = compiled.represent(queryset.values(*compiled.projection))
+        self.compare(f'{name} compiled', 'page', expected, JSONRenderer().render(data))
+        self.compare(f'{name} rendered', 'page', expected, FastJSONRenderer().render(data))
+
+    def check_writes(self, user_id):
+        marker = uuid.uuid4()
+        record = attendance_records.create(
+            user_id=user_id, device_id=marker, attendance_type='check_in', status='late',
+            location_data={'parity': True},
+        )
+        try:
+            self.compare('insert', record.id, field_values(record), field_values(AttendanceRecord.objects.get(id=record.id)))
+        finally:
+            AttendanceRecord.objects.filter(id=record.id).delete()
+
+        day = timezone.localdate()
+        values = {'first_check_in': timezone.now().replace(microsecond=0), 'total_hours': 8.5, 'status': 'present'}
+        try:
+            daily_attendance.upsert(marker, day, values)
+            daily_attendance.upsert(marker, day, {**values, 'total_hours': 9.25})
+            rows = list(DailyAttendance.objects.filter(user_id=marker, date=day))
+            self.compare('upsert rows', marker, 1, len(rows))
+            if rows:
+                self.compare('upsert', marker, field_values(rows[0]), field_values(daily_attendance.get(marker, day)))
+                self.compare('upsert total_hours', marker, 9.25, rows[0].total_hours)
+        finally:
+            DailyAttendance.objects.filter(user_id=marker).delete()
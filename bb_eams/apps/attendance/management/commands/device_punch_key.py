@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.attendance.gateway.protocol import device_token
+from apps.attendance.punch_app import device_key
+from apps.core.models import Device
+
+
+class Command(BaseCommand):
+    help = 'Print the key a device signs /punch/ requests with, or its device gateway token'
+
+    def add_arguments(self, parser):
+        parser.add_argument('serial', help='device_serial of the device')
+        parser.add_argument('--gateway', action='store_true',
+                            help='Print the hello token for run_device_gateway instead')
+
+    def handle(self, *args, **options):
+        setting = 'DEVICE_GATEWAY_SECRET' if options['gateway'] else 'DEVICE_PUNCH_SECRET'
+        secret = getattr(settings, setting)
+        if not secret:
+            raise CommandError(f'{setting} is not set')
+        if not Device.objects.filter(device_serial=options['serial']).exists():
+            raise CommandError(f"No device {options['serial']}")
+        if options['gateway']:
+            self.stdout.write(device_token(options['serial'], secret))
+        else:
+            self.stdout.write(device_key(options['serial'], secret))
@@ -0,0 +1,34 @@
+import time
+from datetime import date, datetime
+from django.core.management.base import BaseCommand, CommandError
+from apps.attendance import roster
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date {value!r}; expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Materialize the shift roster; without dates, generates the rolling horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First work date, YYYY-MM-DD')
+        parser.add_argument('--to', dest='end', help='Last work date, YYYY-MM-DD (default: --from)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if not options['start']:
+            start, end = roster.horizon()
+            written = roster.extend(date.today())
+        else:
+            start = parse_date(options['start'])
+            end = parse_date(options['end']) if options['end'] else start
+            if end < start:
+                raise CommandError('--to is before --from')
+            written = roster.generate(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f'Roster {start} to {end}: {written:,} rows written in {time.monotonic() - started:.2f}s'
+        ))
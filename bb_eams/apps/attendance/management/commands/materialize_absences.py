@@ -0,0 +1,36 @@
+import time
+from datetime import date, datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from apps.attendance.absences import materialize_day
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date {value!r}; expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Write absent, on-leave and holiday DailyAttendance rows for a range of dates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First date, YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--to', dest='end', help='Last date, YYYY-MM-DD (default: --from)')
+
+    def handle(self, *args, **options):
+        today = date.today()
+        start = parse_date(options['start']) if options['start'] else today - timedelta(days=1)
+        end = parse_date(options['end']) if options['end'] else start
+        if end < start:
+            raise CommandError('--to is before --from')
+        if end > today:
+            raise CommandError('Cannot materialize future dates')
+
+        day = start
+        while day <= end:
+            started = time.monotonic()
+            written = materialize_day(day, include_absent=day < today)
+            self.stdout.write(f'{day}: {written:,} rows in {time.monotonic() - started:.2f}s')
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS('Absences materialized'))
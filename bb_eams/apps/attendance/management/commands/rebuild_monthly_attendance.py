@@ -0,0 +1,34 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.attendance.repositories import month_start, monthly_attendance, next_month
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Invalid month {value!r}; expected YYYY-MM')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild MonthlyAttendance rollups from DailyAttendance for a range of months'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First month, YYYY-MM (default: current month)')
+        parser.add_argument('--to', dest='end', help='Last month, YYYY-MM (default: --from)')
+
+    def handle(self, *args, **options):
+        start = parse_month(options['start']) if options['start'] else month_start(timezone.localdate())
+        end = parse_month(options['end']) if options['end'] else start
+        if end < start:
+            raise CommandError('--to is before --from')
+
+        month = start
+        while month <= end:
+            started = time.monotonic()
+            written = monthly_attendance.refresh_many(month)
+            self.stdout.write(f'{month:%Y-%m}: {written:,} employees in {time.monotonic() - started:.2f}s')
+            month = next_month(month)
+        self.stdout.write(self.style.SUCCESS('Monthly attendance rebuilt'))
@@ -0,0 +1,126 @@
+import time
+import uuid
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from apps.accounts.models import User
+from apps.attendance import recompute
+from apps.attendance.models import RecomputeJob
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date {value!r}; expected YYYY-MM-DD')
+
+
+def is_uuid(value):
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = ('Recompute DailyAttendance over a date range in parallel chunks; '
+            'interrupted runs resume with --resume')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First work date, YYYY-MM-DD')
+        parser.add_argument('--to', dest='end', help='Last work date, YYYY-MM-DD (default: --from)')
+        parser.add_argument('--user', dest='users', action='append', default=[],
+                            help='Employee id (UUID) or employee_id; repeatable')
+        parser.add_argument('--department', help='Only employees of this department id')
+        parser.add_argument('--chunk-days', type=int, default=recompute.DEFAULT_CHUNK_DAYS)
+        parser.add_argument('--chunk-users', type=int, default=recompute.DEFAULT_CHUNK_USERS)
+        parser.add_argument('--workers', type=int, default=1, help='Processes to run chunks in')
+        parser.add_argument('--celery', action='store_true', help='Run chunks as a Celery chord and return')
+        parser.add_argument('--keep-statuses', action='store_true',
+                            help='Do not re-classify punch statuses against the shift roster')
+        parser.add_argument('--resume', metavar='JOB_ID', help='Run the unfinished chunks of a job')
+        parser.add_argument('--status', metavar='JOB_ID', help='Show the progress of a job')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.report(self.get_job(options['status']))
+            return
+
+        if options['resume']:
+            job = self.get_job(options['resume'])
+        else:
+            job = self.create_job(options)
+            self.stdout.write(f'Job {job.id}: {job.start_date} to {job.end_date}, {job.total_chunks} chunks')
+
+        if options['celery']:
+            recompute.dispatch(job)
+            self.stdout.write(self.style.SUCCESS(
+                f'Dispatched; follow with recompute_attendance --status {job.id}'
+            ))
+            return
+
+        started = time.monotonic()
+        total = {'done': 0, 'rows': 0}
+        pending = len(recompute.pending_chunk_ids(job))
+
+        def progress(index, status, rows, seconds):
+            total['done'] += 1
+            total['rows'] += rows
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'[{total["done"]}/{pending}] chunk {index} {status}: {rows:,} rows in {seconds:.2f}s, '
+                f'{total["rows"] / elapsed if elapsed else 0:,.0f} rows/s overall'
+            )
+
+        status = recompute.run_local(job, options['workers'], progress)
+        elapsed = time.monotonic() - started
+        summary = (f'{total["rows"]:,} rows in {elapsed:.1f}s '
+                   f'({total["rows"] / elapsed if elapsed else 0:,.0f} rows/s)')
+        if status != 'completed':
+            raise CommandError(f'Job {job.id} {status}: {summary}; rerun with --resume {job.id}')
+        self.stdout.write(self.style.SUCCESS(f'Job {job.id} completed: {summary}'))
+
+    def get_job(self, job_id):
+        try:
+            return RecomputeJob.objects.get(id=job_id)
+        except (RecomputeJob.DoesNotExist, ValueError):
+            raise CommandError(f'No recompute job {job_id}')
+
+    def create_job(self, options):
+        if not options['start']:
+            raise CommandError('--from is required unless --resume or --status is given')
+        start = parse_date(options['start'])
+        end = parse_date(options['end']) if options['end'] else start
+        if end < start:
+            raise CommandError('--to is before --from')
+        if options['chunk_days'] < 1 or options['chunk_users'] < 1:
+            raise CommandError('--chunk-days and --chunk-users must be positive')
+
+        user_ids = None
+        if options['users'] or options['department']:
+            users = User.objects.filter(user_type='employee')
+            if options['department']:
+                users = users.filter(department_id=options['department'])
+            if options['users']:
+                uuids = [value for value in options['users'] if is_uuid(value)]
+                ids = set(users.filter(employee_id__in=options['users']).values_list('id', flat=True))
+                ids.update(users.filter(id__in=uuids).values_list('id', flat=True))
+                user_ids = ids
+            else:
+                user_ids = set(users.values_list('id', flat=True))
+            if not user_ids:
+                raise CommandError('No matching employees')
+
+        return recompute.create_job(
+            start, end, user_ids, options['chunk_days'], options['chunk_users'],
+            reclassify=not options['keep_statuses'],
+        )
+
+    def report(self, job):
+        progress = recompute.job_progress(job)
+        self.stdout.write(
+            f'Job {job.id} {job.status}: {job.start_date} to {job.end_date}\n'
+            f'  chunks: {progress["done"]}/{progress["total"]} done, {progress["failed"]} failed\n'
+            f'  rows: {progress["rows"]:,}, punch statuses updated: {progress["punches_updated"]:,}\n'
+            f'  throughput: {progress["rows_per_second"]:,.0f} rows/s per worker'
+        )
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.attendance.gateway.server import DeviceGateway
+from apps.attendance.gateway.writer import BatchWriter
+
+
+class Command(BaseCommand):
+    help = 'Run the asyncio gateway that receives punches from push-mode biometric terminals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default=settings.DEVICE_GATEWAY_HOST)
+        parser.add_argument('--port', type=int, default=settings.DEVICE_GATEWAY_PORT)
+        parser.add_argument('--dial', action='append', metavar='SERIAL',
+                            help='Also connect out to this listening terminal (repeatable)')
+        parser.add_argument('--dial-all', action='store_true',
+                            help='Connect out to every device with an IP address')
+        parser.add_argument('--batch-size', type=int, default=settings.DEVICE_GATEWAY_BATCH_SIZE)
+        parser.add_argument('--flush-interval', type=float, default=settings.DEVICE_GATEWAY_FLUSH_INTERVAL)
+        parser.add_argument('--queue-size', type=int, default=settings.DEVICE_GATEWAY_QUEUE_SIZE)
+
+    def handle(self, *args, **options):
+        if not settings.DEVICE_GATEWAY_SECRET:
+            raise CommandError('DEVICE_GATEWAY_SECRET is not set; terminals could not be authenticated')
+        if not logging.getLogger().handlers:
+            logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+        asyncio.run(self.serve(options))
+
+    async def serve(self, options):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        writer = BatchWriter(
+            batch_size=options['batch_size'], flush_interval=options['flush_interval'],
+            queue_size=options['queue_size'],
+        )
+        gateway = DeviceGateway(
+            writer, settings.DEVICE_GATEWAY_SECRET, heartbeat=settings.DEVICE_GATEWAY_HEARTBEAT,
+        )
+        self.stdout.write(f"Device gateway listening on {options['host']}:{options['port']}")
+        await gateway.run(options['host'], options['port'], dial=options['dial_all'] or options['dial'], stop=stop)
+        self.stdout.write(f'Stopped: {writer.received} punches received, {writer.stored} new records stored')
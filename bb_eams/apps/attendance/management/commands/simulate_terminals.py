@@ -0,0 +1,110 @@
+import asyncio
+import secrets
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.accounts.models import User
+from apps.attendance.gateway.protocol import device_token
+from apps.attendance.gateway.server import DeviceGateway
+from apps.attendance.gateway.simulator import SimulatedTerminal, run_terminals
+from apps.attendance.gateway.writer import BatchWriter
+from apps.attendance.models import AttendanceRecord
+from apps.core.benchmarks import Fixtures, use_database
+from apps.core.models import Device
+
+
+class Command(BaseCommand):
+    help = 'Drive the device gateway with simulated push-mode terminals and check every punch was stored'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terminals', type=int, default=10)
+        parser.add_argument('--punches', type=int, default=200, help='Punches per terminal')
+        parser.add_argument('--rate', type=float, default=50.0, help='Punches per second per terminal')
+        parser.add_argument('--employees', type=int, default=500, help='Employees punching on the terminals')
+        parser.add_argument('--drop-every', type=int, default=0,
+                            help='Each terminal cuts its connection every N frames')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=settings.DEVICE_GATEWAY_PORT)
+        parser.add_argument('--live', action='store_true',
+                            help='Punch into the configured database through a running gateway; the '
+                                 'SIM-* devices must already be registered there')
+        parser.add_argument('--batch-size', type=int, default=settings.DEVICE_GATEWAY_BATCH_SIZE)
+        parser.add_argument('--queue-size', type=int, default=settings.DEVICE_GATEWAY_QUEUE_SIZE)
+        parser.add_argument('--database-name',
+                            help='Seed and use this throwaway MongoDB database instead of mongomock')
+        parser.add_argument('--timeout', type=float, default=300)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Without --live nothing touches the configured database: the
+        # gateway runs in this process on a seeded throwaway database
+        options['with_gateway'] = not options['live']
+        if options['with_gateway']:
+            name = options['database_name'] or 'bb_eams_gateway_sim'
+            if name == settings.DATABASES['default']['NAME']:
+                raise CommandError('Refusing to seed the configured application database')
+            use_database(name, mongomock=not options['database_name'])
+            self.stdout.write(f"Seeding {options['employees']} employees into {name}...")
+            Fixtures(options['employees'], days=1, seed=options['seed']).seed()
+            options['secret'] = settings.DEVICE_GATEWAY_SECRET or secrets.token_hex(16)
+        elif not settings.DEVICE_GATEWAY_SECRET:
+            raise CommandError('DEVICE_GATEWAY_SECRET is not set')
+        else:
+            options['secret'] = settings.DEVICE_GATEWAY_SECRET
+
+        employee_ids = list(User.objects.filter(
+            user_type='employee', status='active'
+        ).values_list('employee_id', flat=True)[:options['employees']])
+        if not employee_ids:
+            raise CommandError('No employees to punch; seed some with seed_data')
+
+        serials = [f'SIM-{i:04d}' for i in range(options['terminals'])]
+        if options['live']:
+            device_ids = list(Device.objects.filter(device_serial__in=serials).values_list('id', flat=True))
+            if len(device_ids) < len(serials):
+                raise CommandError(f"Register devices {serials[0]}..{serials[-1]} first; --live does not create them")
+        else:
+            device_ids = [
+                Device.objects.create(
+                    device_serial=serial, name=f'Simulated terminal {serial}', device_type='simulated',
+                    location='simulator',
+                ).id
+                for serial in serials
+            ]
+
+        started = timezone.now()
+        summary = asyncio.run(self.simulate(options, employee_ids))
+        stored = AttendanceRecord.objects.filter(device_id__in=device_ids, timestamp__gte=started).count()
+
+        for key, value in summary.items():
+            self.stdout.write(f'{key:<18} {value}')
+        self.stdout.write(f"{'stored':<18} {stored}")
+        if summary['unacked'] or summary['timed_out']:
+            raise CommandError(f"{summary['unacked']} punches were never acknowledged")
+        if stored < summary['acked'] and options['with_gateway']:
+            raise CommandError(f"{summary['acked'] - stored} acknowledged punches are missing")
+        self.stdout.write(self.style.SUCCESS('Every punch was acknowledged'))
+
+    async def simulate(self, options, employee_ids):
+        terminals = [
+            SimulatedTerminal(
+                f'SIM-{i:04d}', employee_ids, options['host'], options['port'],
+                token=device_token(f'SIM-{i:04d}', options['secret']),
+                rate=options['rate'], count=options['punches'], drop_every=options['drop_every'],
+                seed=options['seed'],
+            )
+            for i in range(options['terminals'])
+        ]
+        if not options['with_gateway']:
+            return await run_terminals(terminals, options['timeout'])
+
+        writer = BatchWriter(batch_size=options['batch_size'], queue_size=options['queue_size'])
+        gateway = DeviceGateway(writer, options['secret'], heartbeat=settings.DEVICE_GATEWAY_HEARTBEAT)
+        writer.start()
+        await gateway.serve(options['host'], options['port'])
+        try:
+            summary = await run_terminals(terminals, options['timeout'])
+        finally:
+            await gateway.shutdown()
+        summary['batches'] = writer.batches
+        return summary
@@ -31,6 +31,28 @@ class Assignment(BaseModel):
             models.Index(fields=['user_id', 'from_date']),
         ]
 
+class ShiftRoster(BaseModel):
+    """
+    One employee's shift window for one work date, materialized from
+    Assignment and Shift by apps.attendance.roster. ``window_end`` is on
+    the next day for shifts that cross midnight.
+    """
+    user_id = models.UUIDField()
+    work_date = models.DateField()
+    shift_id = models.UUIDField()
+    window_start = models.DateTimeField()
+    window_end = models.DateTimeField()
+    grace_end = models.DateTimeField()
+
+    class Meta:
+        db_table = 'shift_roster'
+        unique_together = ('user_id', 'work_date')
+        indexes = [
+            models.Index(fields=['user_id', '-window_start']),
+            models.Index(fields=['shift_id', 'work_date']),
+            models.Index(fields=['work_date']),
+        ]
+
 class AttendanceRecord(BaseModel):
     ATTENDANCE_TYPES = (
         ('check_in', 'Check In'),
@@ -69,11 +91,12 @@ class AttendanceRecord(BaseModel):
             models.Index(fields=['user_id', '-timestamp']),
             models.Index(fields=['device_id', 'timestamp']),
             models.Index(fields=['status']),
+            models.Index(fields=['timestamp']),
         ]
         ordering = ['-timestamp']
 
 class DailyAttendance(BaseModel):
-    user_id = models.UUIDField(unique_for_date='date')
+    user_id = models.UUIDField()
     date = models.DateField()
     first_check_in = models.DateTimeField(null=True, blank=True)
     last_check_out = models.DateTimeField(null=True, blank=True)
@@ -84,10 +107,92 @@ class DailyAttendance(BaseModel):
     early_exit_minutes = models.IntegerField(default=0)
     
     # Status
-    status = models.CharField(max_length=20, default='present')  # present, absent, half_day, holiday
+    status = models.CharField(max_length=20, default='present')  # present, absent, on_leave, holiday
     
     class Meta:
         db_table = 'daily_attendance'
+        unique_together = ('user_id', 'date')
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+class MonthlyAttendance(BaseModel):
+    """
+    Per-employee totals of DailyAttendance for one calendar month, kept in
+    step by MonthlyAttendanceRepository.refresh() whenever a daily row
+    changes. Rebuild with ``manage.py rebuild_monthly_attendance``.
+    """
+    user_id = models.UUIDField()
+    month = models.DateField()  # First day of the month
+    days_recorded = models.IntegerField(default=0)
+    present_days = models.IntegerField(default=0)
+    absent_days = models.IntegerField(default=0)
+    leave_days = models.IntegerField(default=0)
+    holiday_days = models.IntegerField(default=0)
+    late_days = models.IntegerField(default=0)
+    total_hours = models.FloatField(default=0.0)
+    regular_hours = models.FloatField(default=0.0)
+    overtime_hours = models.FloatField(default=0.0)
+    late_minutes = models.IntegerField(default=0)
+    early_exit_minutes = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'monthly_attendance'
+        unique_together = ('user_id', 'month')
         indexes = [
-            models.Index(fields=['user_id', 'date']),
-        ]
\ No newline at end of file
+            models.Index(fields=['month']),
+        ]
+
+class RecomputeJob(BaseModel):
+    """
+    A DailyAttendance recompute over a date range and a set of employees,
+    split into RecomputeChunks so an interrupted run resumes where it
+    stopped. See apps.attendance.recompute.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    start_date = models.DateField()
+    end_date = models.DateField()
+    reclassify = models.BooleanField(default=True)  # Also re-derive punch statuses
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_chunks = models.IntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'recompute_jobs'
+        ordering = ['-created_at']
+
+class RecomputeChunk(BaseModel):
+    """
+    One checkpointed unit of a RecomputeJob: a run of dates for a batch
+    of employees.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    job_id = models.UUIDField()
+    index = models.IntegerField()
+    start_date = models.DateField()
+    end_date = models.DateField()
+    user_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows = models.IntegerField(default=0)
+    punches_updated = models.IntegerField(default=0)
+    seconds = models.FloatField(default=0.0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'recompute_chunks'
+        unique_together = ('job_id', 'index')
+        indexes = [
+            models.Index(fields=['job_id', 'status']),
+        ]
@@ -0,0 +1,346 @@
+"""
+Slim ASGI endpoint for device punches.
+
+POST /punch/check-in/ and /punch/check-out/ record a terminal's punch
+the way CheckInView and CheckOutView do, without the Django middleware
+stack, DRF content negotiation or serializers. A request is signed by
+the device:
+
+    X-Device-Serial  device_serial of a registered Device
+    X-Timestamp      unix seconds, within DEVICE_PUNCH_MAX_SKEW of now
+    X-Signature      sign(): hex HMAC-SHA256 of
+                     "<method> <path>\n<timestamp>.<body>" keyed with
+                     device_key(serial)
+
+and its JSON body names the employee, {"user_id": "<uuid>"} or
+{"employee_id": "EMP0001"}, with optional "location_data". A signature
+is accepted once: resending the same request is refused with 409, and a
+check-in cannot be replayed as a check-out. A device that retries should
+send an Idempotency-Key (see apps.core.idempotency), scoped to the
+device; a retry then gets the first response back, marked
+Idempotent-Replayed, even when it is the same signed request. Checks, the
+roster lookup and the insert run on a worker thread; the live event,
+device touch, audit log and notification or daily attendance update
+then run concurrently before the 201 is sent.
+
+bb_eams.asgi mounts this at /punch/ in front of Django. A WSGI
+deployment serves /punch/ from bb_eams.asgi under an ASGI server and
+leaves everything else on bb_eams.wsgi.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.accounts.authentication import get_user_projection
+from apps.accounts.models import User
+from apps.core import metrics
+from apps.core import idempotency
+from apps.core.cache import get_loaded_version, get_reference_list
+from apps.core.models import AuditLog, Notification
+from apps.core.mongo import insert_instances
+from apps.core.routing import record_writes
+from . import roster
+from .events import publish_punch
+from .repositories import attendance_records, devices
+from .serializers import punch_conflict, punch_context
+from .utils import update_daily_attendance
+
+logger = logging.getLogger('apps.attendance.punch')
+
+PUNCH_PATH = '/punch/'
+ROUTES = {'/punch/check-in/': 'check_in', '/punch/check-out/': 'check_out'}
+MAX_BODY_BYTES = 4096
+RESPONSE_FIELDS = ('id', 'user_id', 'device_id', 'timestamp', 'attendance_type', 'status')
+
+
+class PunchError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Replayed(Exception):
+    def __init__(self, status, payload):
+        super().__init__(status)
+        self.status = status
+        self.payload = payload
+
+
+def device_key(serial, secret=None):
+    """
+    The signing key of one device, derived from DEVICE_PUNCH_SECRET.
+    """
+    secret = settings.DEVICE_PUNCH_SECRET if secret is None else secret
+    return hmac.new(secret.encode(), serial.encode(), hashlib.sha256).hexdigest()
+
+
+def sign(key, method, path, timestamp, body):
+    message = f'{method} {path}\n{timestamp}.'.encode() + body
+    return hmac.new(key.encode(), message, hashlib.sha256).hexdigest()
+
+
+_devices = (None, {})
+
+
+def device_by_serial(serial):
+    global _devices
+    version, by_serial = _devices
+    loaded = get_loaded_version('device')
+    if version != loaded:
+        by_serial = {device.device_serial: device for device in get_reference_list('device')}
+        _devices = (loaded, by_serial)
+    return by_serial.get(serial)
+
+
+def parse(body):
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise PunchError(400, 'Body must be JSON')
+    if not isinstance(payload, dict) or not (payload.get('user_id') or payload.get('employee_id')):
+        raise PunchError(400, 'Expected an object with user_id or employee_id')
+    if not isinstance(payload.setdefault('location_data', {}), dict):
+        raise PunchError(400, 'location_data must be an object')
+    return payload
+
+
+def resolve_user(payload):
+    if payload.get('user_id'):
+        try:
+            user_id = uuid.UUID(str(payload['user_id']))
+        except ValueError:
+            raise PunchError(400, 'user_id must be a UUID')
+        if get_user_projection(user_id) is None:
+            raise PunchError(404, 'User not found')
+        return user_id
+
+    key = f"punch:employee:{payload['employee_id']}"
+    user_id = cache.get(key)
+    if user_id is None:
+        user_id = User.objects.filter(employee_id=str(payload['employee_id'])).values_list('id', flat=True).first()
+        if user_id is None:
+            raise PunchError(404, 'Employee not found')
+        cache.set(key, user_id, settings.AUTH_USER_CACHE_TIMEOUT)
+    return user_id
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise PunchError(400, 'Client disconnected')
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_BYTES:
+            raise PunchError(413, 'Body too large')
+        if not message.get('more_body'):
+            return body
+
+
+async def respond(send, status, payload, replayed=False):
+    body = json.dumps(payload, cls=DjangoJSONEncoder).encode()
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    if replayed:
+        headers.append((idempotency.REPLAYED_HEADER.lower().encode(), b'true'))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _call(func, *args):
+    close_old_connections()
+    return func(*args)
+
+
+class PunchApplication:
+    """
+    The ASGI app. Database and cache work runs on a pool of
+    DEVICE_PUNCH_WORKERS threads so the event loop only parses, signs
+    and schedules.
+    """
+
+    def __init__(self, secret=None, workers=None):
+        self.secret = secret
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or settings.DEVICE_PUNCH_WORKERS, thread_name_prefix='punch'
+        )
+
+    def run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, _call, func, *args)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        started = time.perf_counter()
+        attendance_type = ROUTES.get(scope['path'])
+        request = {'method': scope['method'], 'path': scope['path'], 'idempotency': None}
+        replayed = False
+        try:
+            if attendance_type is None:
+                raise PunchError(404, 'Not found')
+            if scope['method'] != 'POST':
+                raise PunchError(405, 'Method not allowed')
+            body = await read_body(receive)
+            client = scope.get('client')
+            device, record, row = await self.run(self.store, attendance_type, request, dict(scope['headers']), body)
+            await self.side_effects(device, record, row, client[0] if client else None)
+            status, payload = 201, {field: getattr(record, field) for field in RESPONSE_FIELDS}
+        except Replayed as e:
+            status, payload, replayed = e.status, e.payload, True
+        except PunchError as e:
+            status, payload = e.status, {'error': e.message}
+        except Exception:
+            logger.exception('event=punch_failed path=%s', scope['path'])
+            status, payload = 500, {'error': 'Internal error'}
+
+        if request['idempotency']:
+            await self.run(idempotency.finish, *request['idempotency'], status, payload)
+        await respond(send, status, payload, replayed)
+        metrics.observe('punch_api_duration_seconds', time.perf_counter() - started, {
+            'type': attendance_type or 'unknown', 'status': status,
+        })
+        self.run(metrics.registry.flush)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def authenticate(self, request, headers, body):
+        secret = settings.DEVICE_PUNCH_SECRET if self.secret is None else self.secret
+        if not secret:
+            raise PunchError(503, 'Device punches are not enabled')
+        serial = headers.get(b'x-device-serial', b'').decode('latin-1')
+        timestamp = headers.get(b'x-timestamp', b'').decode('latin-1')
+        signature = headers.get(b'x-signature', b'').decode('latin-1')
+        if not (serial and timestamp and signature):
+            raise PunchError(401, 'Missing X-Device-Serial, X-Timestamp or X-Signature')
+        try:
+            skew = abs(time.time() - int(timestamp))
+        except ValueError:
+            raise PunchError(401, 'Invalid timestamp')
+        if skew > settings.DEVICE_PUNCH_MAX_SKEW:
+            raise PunchError(401, 'Timestamp outside the allowed window')
+        expected = sign(device_key(serial, secret), request['method'], request['path'], timestamp, body)
+        if not hmac.compare_digest(expected, signature):
+            raise PunchError(401, 'Invalid signature')
+        device = device_by_serial(serial)
+        if device is None:
+            raise PunchError(401, 'Unknown device')
+        return device
+
+    def claim(self, request, device, headers, body):
+        """
+        Honour Idempotency-Key, then accept each signature only once.
+        """
+        key = headers.get(idempotency.HEADER.lower().encode(), b'').decode('latin-1')
+        if key:
+            if not idempotency.valid_key(key):
+                raise PunchError(
+                    400, f'{idempotency.HEADER} must be at most {idempotency.MAX_KEY_LENGTH} printable characters'
+                )
+            state = (
+                idempotency.cache_key(f'punch:{device.device_serial}', key),
+                idempotency.fingerprint(request['method'], request['path'], body),
+            )
+            try:
+                entry = idempotency.begin(*state, type(self).__name__)
+            except (idempotency.IdempotencyConflict, idempotency.IdempotencyKeyReused) as e:
+                raise PunchError(e.status_code, str(e.detail))
+            if entry is not None:
+                raise Replayed(entry['status'], entry['data'])
+            request['idempotency'] = state
+
+        signature = headers[b'x-signature'].decode('latin-1')
+        # Outlives the window in which the timestamp is accepted
+        if not cache.add(f'punch:seen:{device.device_serial}:{signature}', 1, 2 * settings.DEVICE_PUNCH_MAX_SKEW):
+            raise PunchError(409, 'Request already received')
+
+    def store(self, attendance_type, request, headers, body):
+        """
+        Authenticate, validate and insert one punch. Returns ``(device,
+        record, roster row)``.
+        """
+        device = self.authenticate(request, headers, body)
+        self.claim(request, device, headers, body)
+        payload = parse(body)
+        data = {'user_id': resolve_user(payload)}
+        error = punch_conflict(attendance_type, data['user_id'], *punch_context(data))
+        if error:
+            raise PunchError(400, error)
+        row = data['roster']
+        if attendance_type == 'check_in' and row is None:
+            raise PunchError(400, 'No shift assigned for today')
+
+        record = attendance_records.create(
+            user_id=data['user_id'],
+            device_id=device.id,
+            timestamp=data['timestamp'],
+            attendance_type=attendance_type,
+            status=roster.classify_punch(attendance_type, data['timestamp'], row),
+            location_data=payload['location_data'],
+        )
+        return device, record, row
+
+    async def side_effects(self, device, record, row, ip_address):
+        """
+        Everything CheckInView/CheckOutView do after the insert, at once.
+        Failures are logged; the punch itself is already stored.
+        """
+        checked_in = record.attendance_type == 'check_in'
+        effects = [
+            (publish_punch, record),
+            (devices.touch, device.id),
+            (record_writes, [record.user_id]),
+            (insert_instances, AuditLog, [AuditLog(
+                user_id=record.user_id,
+                action=record.attendance_type,
+                resource_type='attendance',
+                resource_id=record.id,
+                description=f"User checked {'in' if checked_in else 'out'} at {device.name}",
+                ip_address=ip_address,
+            )]),
+        ]
+        if checked_in:
+            effects.append((insert_instances, Notification, [Notification(
+                user_id=record.user_id,
+                notification_type='success',
+                title='Check-In Successful',
+                message=f'You checked in at {timezone.localtime(record.timestamp).strftime("%H:%M:%S")}',
+                status='sent',
+                sent_at=timezone.now(),
+            )]))
+        else:
+            work_date = row.work_date if row else timezone.localtime(record.timestamp).date()
+            effects.append((update_daily_attendance, record.user_id, work_date))
+
+        results = await asyncio.gather(*(self.run(*effect) for effect in effects), return_exceptions=True)
+        for (func, *_), result in zip(effects, results):
+            if isinstance(result, Exception):
+                metrics.inc('punch_api_side_effect_failures_total', {'effect': func.__name__})
+                logger.error('event=side_effect_failed effect=%s record=%s error="%s"',
+                             func.__name__, record.id, result, exc_info=result)
+
+
+metrics.define('punch_api_duration_seconds', 'histogram', 'Time to handle one /punch/ request.')
+metrics.define('punch_api_side_effect_failures_total', 'counter', 'Punch side effects that failed after the insert.')
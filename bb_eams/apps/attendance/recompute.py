@@ -0,0 +1,272 @@
+"""
+Parallel, resumable recompute of DailyAttendance.
+
+create_job() splits a date range and a set of employees into chunks of
+``chunk_days`` days by ``chunk_users`` employees, stored as
+RecomputeChunk rows. A chunk is independent of the others: it rebuilds
+its employees' shift windows from Assignment, re-classifies their
+punches against them and rewrites their punch-derived DailyAttendance
+rows with a handful of bulk queries, then marks itself done. run_local()
+spreads the pending chunks over a process pool and dispatch() over a
+Celery chord. An interrupted job is resumed by running its pending
+chunks again, and a chunk that runs twice writes the same rows.
+
+Chunks of the same employees can share a month, so MonthlyAttendance is
+refreshed once by finish_job() after every chunk has run rather than by
+each chunk.
+
+Materialized absent, on-leave and holiday rows are left alone; run
+materialize_absences over the range afterwards if punches moved days.
+"""
+import bisect
+import logging
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+from django.utils import timezone
+from . import roster
+from .models import RecomputeChunk, RecomputeJob
+from .repositories import attendance_records, daily_attendance, day_bounds, month_start, monthly_attendance
+from .utils import compute_daily_values, first_and_last_punch
+
+logger = logging.getLogger('apps.tasks')
+
+DEFAULT_CHUNK_DAYS = 7
+DEFAULT_CHUNK_USERS = 500
+
+
+def dates(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def months(start_date, end_date):
+    return sorted({month_start(day) for day in dates(start_date, end_date)})
+
+
+def affected_users(start_date, end_date):
+    """
+    Everyone with a punch or a punch-derived row in the range.
+    """
+    start, _ = day_bounds(start_date)
+    _, end = day_bounds(end_date)
+    user_ids = set(attendance_records.collection.distinct('user_id', attendance_records.range_filter(start, end)))
+    user_ids.update(daily_attendance.collection.distinct('user_id', {
+        'date': {'$gte': daily_attendance.prep('date', start_date), '$lte': daily_attendance.prep('date', end_date)},
+        'first_check_in': {'$ne': None},
+    }))
+    return sorted({attendance_records.fields['user_id'].to_python(user_id) for user_id in user_ids}, key=str)
+
+
+def create_job(start_date, end_date, user_ids=None, chunk_days=DEFAULT_CHUNK_DAYS,
+               chunk_users=DEFAULT_CHUNK_USERS, reclassify=True):
+    """
+    Create a job and its chunks. ``user_ids`` defaults to affected_users().
+    """
+    user_ids = sorted(set(user_ids), key=str) if user_ids is not None else affected_users(start_date, end_date)
+    job = RecomputeJob(start_date=start_date, end_date=end_date, reclassify=reclassify)
+
+    chunks = []
+    day = start_date
+    while day <= end_date:
+        last = min(day + timedelta(days=chunk_days - 1), end_date)
+        for i in range(0, len(user_ids), chunk_users):
+            chunks.append(RecomputeChunk(
+                job_id=job.id, index=len(chunks), start_date=day, end_date=last,
+                user_ids=[str(user_id) for user_id in user_ids[i:i + chunk_users]],
+            ))
+        day = last + timedelta(days=1)
+
+    job.total_chunks = len(chunks)
+    job.save()
+    RecomputeChunk.objects.bulk_create(chunks)
+    return job
+
+
+def pending_chunk_ids(job):
+    return list(RecomputeChunk.objects.filter(job_id=job.id).exclude(status='done').order_by('index').values_list('id', flat=True))
+
+
+def recompute_users(start_date, end_date, user_ids, reclassify=True, refresh_months=True):
+    """
+    Rewrite the punch-derived DailyAttendance rows of ``user_ids`` for
+    every work date in the range, and their monthly totals unless
+    ``refresh_months`` is False. Returns ``(rows, punches_updated)``.
+    """
+    rows = roster.refresh_range(start_date, end_date, user_ids)
+    # Windows reach back to the day before and into the day after
+    start = day_bounds(start_date)[0] - roster.EARLY_ARRIVAL
+    end = day_bounds(end_date)[1] + roster.MAX_LOOKBACK
+
+    punches_by_user = {}
+    for punch in attendance_records.punches_between(start, end, user_ids=user_ids):
+        punches_by_user.setdefault(punch.user_id, []).append(punch)
+
+    values = []
+    statuses = {}
+    for user_id, punches in punches_by_user.items():
+        timestamps = [punch.timestamp for punch in punches]
+        for day in dates(start_date, end_date):
+            row = rows.get((user_id, day))
+            window_start, window_end = roster.punch_range(row, day)
+            in_window = punches[bisect.bisect_left(timestamps, window_start):bisect.bisect_left(timestamps, window_end)]
+            if not in_window:
+                continue
+            if reclassify and row:
+                for punch in in_window:
+                    status = roster.classify_punch(punch.attendance_type, punch.timestamp, row)
+                    if status != punch.status:
+                        punch.status = statuses[punch.id] = status
+            check_in, check_out = first_and_last_punch(in_window)
+            if check_in and check_out:
+                values.append((user_id, day, compute_daily_values(check_in, check_out, row)))
+
+    # Rows whose punches no longer pair up, e.g. after a device clock fix
+    computed = {(user_id, day) for user_id, day, _ in values}
+    existing = daily_attendance.worked_between(start_date, end_date, user_ids)
+    stale = [pk for key, pk in existing.items() if key not in computed]
+
+    attendance_records.set_statuses(statuses)
+    daily_attendance.upsert_many(values)
+    daily_attendance.delete_ids(stale)
+    if refresh_months:
+        for month in months(start_date, end_date):
+            monthly_attendance.refresh_many(month, user_ids)
+    return len(values) + len(stale), len(statuses)
+
+
+def process_chunk(chunk_id):
+    """
+    Run one chunk unless it is already done and record the outcome.
+    Returns ``(index, status, rows, seconds)``.
+    """
+    chunk = RecomputeChunk.objects.get(id=chunk_id)
+    if chunk.status == 'done':
+        return chunk.index, chunk.status, chunk.rows, chunk.seconds
+    reclassify = RecomputeJob.objects.get(id=chunk.job_id).reclassify
+
+    started = time.perf_counter()
+    try:
+        rows, punches_updated = recompute_users(
+            chunk.start_date, chunk.end_date, chunk.user_ids, reclassify, refresh_months=False
+        )
+    except Exception as e:
+        logger.exception('recompute chunk failed job=%s chunk=%s', chunk.job_id, chunk.index)
+        RecomputeChunk.objects.filter(id=chunk_id).update(
+            status='failed', error=''.join(traceback.format_exception_only(type(e), e))[:2000]
+        )
+        return chunk.index, 'failed', 0, time.perf_counter() - started
+
+    seconds = time.perf_counter() - started
+    RecomputeChunk.objects.filter(id=chunk_id).update(
+        status='done', rows=rows, punches_updated=punches_updated, seconds=seconds, error=''
+    )
+    return chunk.index, 'done', rows, seconds
+
+
+def start_job(job):
+    RecomputeJob.objects.filter(id=job.id).update(status='running', started_at=timezone.now(), finished_at=None)
+
+
+def refresh_job_months(job):
+    """
+    Refresh the monthly totals of every month and employee of ``job``,
+    one batch of employees per chunk row.
+    """
+    batches = {
+        tuple(user_ids) for user_ids in RecomputeChunk.objects.filter(job_id=job.id).values_list('user_ids', flat=True)
+    }
+    for month in months(job.start_date, job.end_date):
+        for user_ids in batches:
+            monthly_attendance.refresh_many(month, user_ids)
+
+
+def finish_job(job_id):
+    """
+    Refresh the monthly totals the job touched, then mark it completed
+    when every chunk is done, failed otherwise.
+    """
+    # Failed chunks may have written some of their rows
+    refresh_job_months(RecomputeJob.objects.get(id=job_id))
+    failed = RecomputeChunk.objects.filter(job_id=job_id).exclude(status='done').exists()
+    status = 'failed' if failed else 'completed'
+    RecomputeJob.objects.filter(id=job_id).update(status=status, finished_at=timezone.now())
+    return status
+
+
+def job_progress(job):
+    """
+    Chunk counts, rows written and throughput of ``job`` so far.
+    """
+    done = failed = rows = punches_updated = 0
+    seconds = 0.0
+    for status, chunk_rows, chunk_punches, chunk_seconds in RecomputeChunk.objects.filter(job_id=job.id).values_list(
+        'status', 'rows', 'punches_updated', 'seconds'
+    ):
+        if status == 'done':
+            done += 1
+            rows += chunk_rows
+            punches_updated += chunk_punches
+            seconds += chunk_seconds
+        elif status == 'failed':
+            failed += 1
+    return {
+        'total': job.total_chunks,
+        'done': done,
+        'failed': failed,
+        'rows': rows,
+        'punches_updated': punches_updated,
+        # Summed over workers, so this is per-worker throughput
+        'rows_per_second': rows / seconds if seconds else 0.0,
+    }
+
+
+def _init_worker():
+    import django
+    from django.db import connections
+
+    django.setup()
+    # Connections inherited from the parent are not ours to use
+    connections.close_all()
+
+
+def run_local(job, workers=1, progress=None):
+    """
+    Run the pending chunks of ``job`` in this process or over a pool of
+    ``workers`` processes, calling ``progress(index, status, rows,
+    seconds)`` as each finishes. Returns the final job status.
+    """
+    start_job(job)
+    chunk_ids = pending_chunk_ids(job)
+    if workers <= 1:
+        for chunk_id in chunk_ids:
+            result = process_chunk(chunk_id)
+            if progress:
+                progress(*result)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for future in as_completed([pool.submit(process_chunk, chunk_id) for chunk_id in chunk_ids]):
+                result = future.result()
+                if progress:
+                    progress(*result)
+    return finish_job(job.id)
+
+
+def dispatch(job):
+    """
+    Run the pending chunks of ``job`` as a Celery chord that marks the
+    job finished once every chunk has run.
+    """
+    from celery import chord
+    from .tasks import finish_recompute_job, recompute_attendance_chunk
+
+    start_job(job)
+    chunk_ids = pending_chunk_ids(job)
+    if not chunk_ids:
+        return finish_recompute_job.delay(None, str(job.id))
+    return chord(recompute_attendance_chunk.s(str(chunk_id)) for chunk_id in chunk_ids)(
+        finish_recompute_job.s(str(job.id))
+    )
@@ -0,0 +1,321 @@
+"""
+Native MongoDB access for the attendance hot paths.
+
+The check-in/check-out views, daily attendance computation and device sync
+go through these repositories instead of the ORM. See
+apps.core.mongo.Repository. apps/attendance/tests compares both paths;
+check_fast_path_parity does the same on a sample of live data.
+"""
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from apps.core.models import Device
+from apps.core.mongo import Repository
+from apps.core.routing import primary_reads
+from .models import AttendanceRecord, DailyAttendance, MonthlyAttendance, ShiftRoster
+
+PUNCH_FIELDS = ('id', 'user_id', 'device_id', 'timestamp', 'attendance_type', 'status')
+
+
+def day_bounds(day):
+    """
+    [start, end) of ``day`` in the current time zone, matching the ORM's
+    ``timestamp__date`` lookup.
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+class AttendanceRecordRepository(Repository):
+    model = AttendanceRecord
+
+    def range_filter(self, start, end, **filters):
+        query = {name: self.prep(name, value) for name, value in filters.items()}
+        query['timestamp'] = {'$gte': self.prep('timestamp', start), '$lt': self.prep('timestamp', end)}
+        return query
+
+    def day_filter(self, user_id, day, **filters):
+        return self.range_filter(*day_bounds(day), user_id=user_id, **filters)
+
+    def has_punch(self, user_id, attendance_type, day):
+        return self.has_punch_between(user_id, attendance_type, *day_bounds(day))
+
+    def has_punch_between(self, user_id, attendance_type, start, end):
+        return self.exists(self.range_filter(start, end, user_id=user_id, attendance_type=attendance_type))
+
+    def punch_types(self, user_id, day):
+        """
+        The set of attendance types ``user_id`` punched on ``day``.
+        """
+        return self.punch_types_between(user_id, *day_bounds(day))
+
+    def punch_types_between(self, user_id, start, end):
+        cursor = self.collection.find(self.range_filter(start, end, user_id=user_id), {'attendance_type': 1, '_id': 0})
+        return {document['attendance_type'] for document in cursor}
+
+    def punches_for_day(self, user_id, day, fields=PUNCH_FIELDS):
+        return self.punches_for_user(user_id, *day_bounds(day), fields=fields)
+
+    def punches_for_user(self, user_id, start, end, fields=PUNCH_FIELDS):
+        return self.find(self.range_filter(start, end, user_id=user_id), fields, sort=[('timestamp', ASCENDING)])
+
+    def punches_between(self, start, end, fields=PUNCH_FIELDS, user_ids=None):
+        query = self.range_filter(start, end)
+        if user_ids is not None:
+            query['user_id'] = {'$in': [self.prep('user_id', user_id) for user_id in user_ids]}
+        return self.find(query, fields, sort=[('user_id', ASCENDING), ('timestamp', ASCENDING)])
+
+    def set_statuses(self, statuses):
+        """
+        Write ``{record_id: status}`` in unordered bulk updates.
+        """
+        operations = [
+            UpdateOne({'id': self.prep('id', record_id)}, {'$set': {'status': status}})
+            for record_id, status in statuses.items()
+        ]
+        for i in range(0, len(operations), 1000):
+            self.collection.bulk_write(operations[i:i + 1000], ordered=False)
+        return len(operations)
+
+    def existing_punches(self, device_ids, timestamps):
+        """
+        (device_id, user_id, timestamp) triples already stored for any of
+        ``device_ids`` at any of ``timestamps``; used to drop re-delivered
+        device logs.
+        """
+        if not timestamps:
+            return set()
+        query = {
+            'device_id': {'$in': [self.prep('device_id', device_id) for device_id in set(device_ids)]},
+            'timestamp': {'$in': [self.prep('timestamp', ts) for ts in set(timestamps)]},
+        }
+        return {
+            (record.device_id, record.user_id, record.timestamp)
+            for record in self.find(query, ('device_id', 'user_id', 'timestamp'))
+        }
+
+    def create(self, **values):
+        return self.insert(AttendanceRecord(**values))
+
+
+class DailyAttendanceRepository(Repository):
+    model = DailyAttendance
+
+    def get(self, user_id, day, fields=None):
+        return self.find_one(self.key_filter({'user_id': user_id, 'date': day}), fields)
+
+    def upsert(self, user_id, day, values):
+        self.upsert_by({'user_id': user_id, 'date': day}, values)
+
+    def upsert_many(self, rows, chunk_size=1000):
+        """
+        Upsert ``(user_id, day, values)`` rows. Returns the number written.
+        """
+        return self.bulk_upsert(
+            (({'user_id': user_id, 'date': day}, values) for user_id, day, values in rows), chunk_size,
+        )
+
+    def worked_between(self, start_date, end_date, user_ids):
+        """
+        ``{(user_id, date): id}`` of rows in the range built from punches,
+        leaving out materialized absent, on-leave and holiday rows.
+        """
+        query = {
+            'date': {'$gte': self.prep('date', start_date), '$lte': self.prep('date', end_date)},
+            'user_id': {'$in': [self.prep('user_id', user_id) for user_id in user_ids]},
+            'first_check_in': {'$ne': None},
+        }
+        return {(row.user_id, row.date): row.id for row in self.find(query, ('id', 'user_id', 'date'))}
+
+    def delete_ids(self, ids):
+        if ids:
+            self.collection.delete_many({'id': {'$in': [self.prep('id', pk) for pk in ids]}})
+
+    def status_counts(self, day, user_ids=None):
+        """
+        ``{status: count}`` of the rows for ``day``, plus ``late`` for
+        present rows with late minutes, in one grouped aggregation.
+        """
+        match = {'date': self.prep('date', day)}
+        if user_ids is not None:
+            match['user_id'] = {'$in': [self.prep('user_id', user_id) for user_id in user_ids]}
+        counts = {}
+        for row in self.collection.aggregate([
+            {'$match': match},
+            {'$group': {
+                '_id': '$status',
+                'count': {'$sum': 1},
+                'late': {'$sum': {'$cond': [{'$gt': ['$late_minutes', 0]}, 1, 0]}},
+            }},
+        ]):
+            counts[row['_id']] = row['count']
+            counts['late'] = counts.get('late', 0) + row['late']
+        return counts
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+class MonthlyAttendanceRepository(Repository):
+    model = MonthlyAttendance
+
+    def totals(self, month, user_ids=None):
+        """
+        Aggregate DailyAttendance rows of ``month`` in the database.
+        Returns ``{user_id: values}``.
+        """
+        daily = daily_attendance
+        match = {'date': {'$gte': daily.prep('date', month), '$lt': daily.prep('date', next_month(month))}}
+        if user_ids is not None:
+            match['user_id'] = {'$in': [daily.prep('user_id', user_id) for user_id in user_ids]}
+        count_if = lambda condition: {'$sum': {'$cond': [condition, 1, 0]}}
+        pipeline = [
+            {'$match': match},
+            {'$group': {
+                '_id': '$user_id',
+                'days_recorded': {'$sum': 1},
+                'present_days': count_if({'$eq': ['$status', 'present']}),
+                'absent_days': count_if({'$eq': ['$status', 'absent']}),
+                'leave_days': count_if({'$eq': ['$status', 'on_leave']}),
+                'holiday_days': count_if({'$eq': ['$status', 'holiday']}),
+                'late_days': count_if({'$gt': ['$late_minutes', 0]}),
+                'total_hours': {'$sum': '$total_hours'},
+                'regular_hours': {'$sum': '$regular_hours'},
+                'overtime_hours': {'$sum': '$overtime_hours'},
+                'late_minutes': {'$sum': '$late_minutes'},
+                'early_exit_minutes': {'$sum': '$early_exit_minutes'},
+            }},
+        ]
+        to_uuid = self.fields['user_id'].to_python
+        return {to_uuid(row.pop('_id')): row for row in daily.collection.aggregate(pipeline)}
+
+    def refresh(self, user_id, day):
+        """
+        Recompute one employee's month after a DailyAttendance change.
+        """
+        self.refresh_many(month_start(day), [user_id])
+
+    def refresh_many(self, month, user_ids=None):
+        """
+        Recompute ``month`` for ``user_ids`` (all employees when None) and
+        delete rows left without any daily attendance. Returns the number
+        of rows written.
+        """
+        if user_ids is not None:
+            user_ids = {self.fields['user_id'].to_python(user_id) for user_id in user_ids}
+        # Must see the daily rows just written, and decides what to delete
+        with primary_reads():
+            totals = self.totals(month, user_ids)
+        written = self.bulk_upsert(
+            ({'user_id': user_id, 'month': month}, values) for user_id, values in totals.items()
+        )
+        stale = {'month': self.prep('month', month)}
+        stale_ids = user_ids - set(totals) if user_ids is not None else None
+        if stale_ids is None:
+            stale['user_id'] = {'$nin': [self.prep('user_id', user_id) for user_id in totals]}
+        elif stale_ids:
+            stale['user_id'] = {'$in': [self.prep('user_id', user_id) for user_id in stale_ids]}
+        if stale_ids is None or stale_ids:
+            self.collection.delete_many(stale)
+        return written
+
+
+class ShiftRosterRepository(Repository):
+    model = ShiftRoster
+
+    def get(self, user_id, work_date, fields=None):
+        return self.find_one(self.key_filter({'user_id': user_id, 'work_date': work_date}), fields)
+
+    def for_date(self, work_date, user_ids=None):
+        query = {'work_date': self.prep('work_date', work_date)}
+        if user_ids is not None:
+            query['user_id'] = {'$in': [self.prep('user_id', user_id) for user_id in user_ids]}
+        return self.find(query)
+
+    def latest_starting_before(self, user_id, when):
+        return self.find_one(
+            {'user_id': self.prep('user_id', user_id), 'window_start': {'$lte': self.prep('window_start', when)}},
+            sort=[('window_start', DESCENDING)],
+        )
+
+    def starting_between(self, user_ids, start, end):
+        return self.find({
+            'user_id': {'$in': [self.prep('user_id', user_id) for user_id in set(user_ids)]},
+            'window_start': {'$gte': self.prep('window_start', start), '$lte': self.prep('window_start', end)},
+        })
+
+    def users_for_shift(self, shift_id, start_date, end_date):
+        user_ids = self.collection.distinct('user_id', {
+            'shift_id': self.prep('shift_id', shift_id),
+            'work_date': {'$gte': self.prep('work_date', start_date), '$lte': self.prep('work_date', end_date)},
+        })
+        return {self.fields['user_id'].to_python(user_id) for user_id in user_ids}
+
+    def sync_range(self, start_date, end_date, rows, user_ids=None):
+        """
+        Make the stored rows between the dates match ``rows``
+        (``{(user_id, work_date): ShiftRoster}``) for ``user_ids`` (all
+        employees when None). Returns the number of rows written or deleted.
+        """
+        query = {'work_date': {'$gte': self.prep('work_date', start_date), '$lte': self.prep('work_date', end_date)}}
+        if user_ids is not None:
+            user_ids = {self.fields['user_id'].to_python(user_id) for user_id in user_ids}
+            query['user_id'] = {'$in': [self.prep('user_id', user_id) for user_id in user_ids]}
+        compared = ('shift_id', 'window_start', 'window_end', 'grace_end')
+        existing = {(row.user_id, row.work_date): row for row in self.find(query, ('id', 'user_id', 'work_date') + compared)}
+
+        changed = [
+            ({'user_id': user_id, 'work_date': work_date}, {name: getattr(row, name) for name in compared})
+            for (user_id, work_date), row in rows.items()
+            if (user_id, work_date) not in existing
+            or any(getattr(existing[user_id, work_date], name) != getattr(row, name) for name in compared)
+        ]
+        stale = [row.id for key, row in existing.items() if key not in rows]
+        self.bulk_upsert(changed)
+        if stale:
+            self.collection.delete_many({'id': {'$in': [self.prep('id', pk) for pk in stale]}})
+        return len(changed) + len(stale)
+
+
+class DeviceRepository(Repository):
+    model = Device
+
+    def get(self, device_id, fields=None):
+        return self.find_one({'id': self.prep('id', device_id)}, fields)
+
+    def touch(self, device_id, when=None):
+        """
+        Set last_communication without a full-row save, so the device
+        reference cache is not invalidated on every punch.
+        """
+        when = when or timezone.now()
+        self.collection.update_one(
+            {'id': self.prep('id', device_id)},
+            {'$set': {'last_communication': self.prep('last_communication', when),
+                      'updated_at': self.prep('updated_at', when)}},
+        )
+
+    def set_statuses(self, statuses, when=None):
+        """
+        Write ``{device_id: status}`` in one bulk update.
+        """
+        if not statuses:
+            return
+        when = self.prep('updated_at', when or timezone.now())
+        self.collection.bulk_write([
+            UpdateOne({'id': self.prep('id', device_id)}, {'$set': {'status': status, 'updated_at': when}})
+            for device_id, status in statuses.items()
+        ], ordered=False)
+
+
+attendance_records = AttendanceRecordRepository()
+daily_attendance = DailyAttendanceRepository()
+monthly_attendance = MonthlyAttendanceRepository()
+shift_roster = ShiftRosterRepository()
+devices = DeviceRepository()
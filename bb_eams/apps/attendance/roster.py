@@ -0,0 +1,219 @@
+"""
+Materialized shift roster.
+
+ShiftRoster holds one row per employee and work date with the shift
+window already resolved to datetimes, so classifying a punch is one
+indexed lookup: the employee's latest window starting no later than
+EARLY_ARRIVAL after the punch. Shifts that end at or before their start
+time cross midnight and end on the next day, and a punch belongs to a
+window from EARLY_ARRIVAL before its start to LATE_DEPARTURE after its
+end, so a night-shift check-out after midnight still lands on the work
+date it started.
+
+The nightly extend_shift_roster task keeps ROSTER_HISTORY_DAYS back to
+ROSTER_HORIZON_DAYS ahead generated; Assignment and Shift changes
+regenerate the affected employees. Dates outside the generated range are
+resolved from Assignment and Shift on the fly, with the same result.
+"""
+import bisect
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from apps.core.cache import get_reference_map
+from apps.core.policy_engine import rules_for_roster
+from .models import Assignment, ShiftRoster
+from .repositories import day_bounds, shift_roster
+
+EARLY_ARRIVAL = timedelta(hours=4)
+LATE_DEPARTURE = timedelta(hours=8)
+# Longest a window can reach back from a punch: a 24h shift plus LATE_DEPARTURE
+MAX_LOOKBACK = timedelta(hours=24) + LATE_DEPARTURE
+
+GENERATED_KEY = 'roster:generated'
+
+
+def horizon(today=None):
+    today = today or date.today()
+    return (
+        today - timedelta(days=getattr(settings, 'ROSTER_HISTORY_DAYS', 35)),
+        today + timedelta(days=getattr(settings, 'ROSTER_HORIZON_DAYS', 35)),
+    )
+
+
+def shift_window(shift, work_date):
+    start = timezone.make_aware(datetime.combine(work_date, shift.start_time))
+    end = timezone.make_aware(datetime.combine(work_date, shift.end_time))
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end, start + timedelta(minutes=shift.grace_period_minutes)
+
+
+def roster_row(user_id, work_date, shift):
+    start, end, grace_end = shift_window(shift, work_date)
+    return ShiftRoster(
+        user_id=user_id, work_date=work_date, shift_id=shift.id,
+        window_start=start, window_end=end, grace_end=grace_end,
+    )
+
+
+def punch_window(row):
+    """
+    The ``[start, end)`` range of punches that belong to ``row``.
+    """
+    return row.window_start - EARLY_ARRIVAL, row.window_end + LATE_DEPARTURE
+
+
+def punch_range(row, work_date):
+    return punch_window(row) if row else day_bounds(work_date)
+
+
+def covers(row, timestamp):
+    start, end = punch_window(row)
+    return start <= timestamp < end
+
+
+def classify_punch(attendance_type, timestamp, row):
+    """
+    Status of a punch against its roster row under the attendance policy
+    of the employee's department; punches with no shift are on time.
+    """
+    if row is None:
+        return 'on_time'
+    return rules_for_roster('attendance', row).classify(attendance_type, timestamp, row)
+
+
+def build_rows(start_date, end_date, user_ids=None):
+    """
+    Unsaved roster rows for every assigned employee and date in the
+    range, from one Assignment query and the shift reference cache. The
+    oldest assignment covering a date wins, as in active_assignments().
+    """
+    assignments = Assignment.objects.filter(
+        Q(to_date__gte=start_date) | Q(to_date__isnull=True),
+        from_date__lte=end_date,
+    )
+    if user_ids is not None:
+        assignments = assignments.filter(user_id__in=list(user_ids))
+    shifts = get_reference_map('shift')
+
+    rows = {}
+    for user_id, shift_id, from_date, to_date in assignments.order_by('pk').values_list(
+        'user_id', 'shift_id', 'from_date', 'to_date'
+    ):
+        shift = shifts.get(shift_id)
+        if shift is None:
+            continue
+        day = max(from_date, start_date)
+        last = min(to_date or end_date, end_date)
+        while day <= last:
+            if (user_id, day) not in rows:
+                rows[user_id, day] = roster_row(user_id, day, shift)
+            day += timedelta(days=1)
+    return rows
+
+
+def generate(start_date, end_date, user_ids=None):
+    """
+    Materialize the roster for the range, writing only rows that changed
+    and deleting rows whose assignment is gone. Returns the number of
+    rows written or deleted.
+    """
+    rows = build_rows(start_date, end_date, user_ids)
+    return shift_roster.sync_range(start_date, end_date, rows, user_ids)
+
+
+def extend(today=None):
+    """
+    Generate the whole rolling horizon and record it as generated.
+    """
+    start, end = horizon(today)
+    written = generate(start, end)
+    cache.set(GENERATED_KEY, (start, end), None)
+    return written
+
+
+def is_generated(day):
+    generated = cache.get(GENERATED_KEY)
+    return bool(generated) and generated[0] <= day <= generated[1]
+
+
+def refresh_range(start_date, end_date, user_ids):
+    """
+    Fresh rows for ``user_ids`` over the range, also written to the
+    materialized roster where the range overlaps the generated horizon.
+    """
+    rows = build_rows(start_date, end_date, user_ids)
+    generated = cache.get(GENERATED_KEY)
+    if generated:
+        first, last = max(start_date, generated[0]), min(end_date, generated[1])
+        if first <= last:
+            shift_roster.sync_range(
+                first, last, {key: row for key, row in rows.items() if first <= key[1] <= last}, user_ids
+            )
+    return rows
+
+
+def regenerate_users(user_ids):
+    start, end = horizon()
+    return generate(start, end, user_ids)
+
+
+def row_for_date(user_id, work_date):
+    """
+    ``user_id``'s roster row for ``work_date``, or None without a shift.
+    """
+    if is_generated(work_date):
+        return shift_roster.get(user_id, work_date)
+    return build_rows(work_date, work_date, [user_id]).get((user_id, work_date))
+
+
+def rows_for_date(work_date, user_ids=None):
+    """
+    ``{user_id: row}`` for ``work_date``.
+    """
+    if is_generated(work_date):
+        return {row.user_id: row for row in shift_roster.for_date(work_date, user_ids)}
+    return {user_id: row for (user_id, _), row in build_rows(work_date, work_date, user_ids).items()}
+
+
+def find_row(user_id, timestamp):
+    """
+    The roster row whose punch window contains ``timestamp``, or None.
+    """
+    day = timezone.localtime(timestamp).date()
+    if is_generated(day) and is_generated(day - timedelta(days=1)):
+        row = shift_roster.latest_starting_before(user_id, timestamp + EARLY_ARRIVAL)
+        return row if row and covers(row, timestamp) else None
+    return RosterIndex([user_id], timestamp, timestamp).find(user_id, timestamp)
+
+
+class RosterIndex:
+    """
+    Roster rows for a batch of punches between ``start`` and ``end``,
+    fetched with one query and searched in memory.
+    """
+
+    def __init__(self, user_ids, start, end):
+        first = timezone.localtime(start - MAX_LOOKBACK).date()
+        last = timezone.localtime(end + EARLY_ARRIVAL).date()
+        if is_generated(first) and is_generated(last):
+            rows = shift_roster.starting_between(user_ids, start - MAX_LOOKBACK, end + EARLY_ARRIVAL)
+        else:
+            rows = build_rows(first, last, user_ids).values()
+
+        self.rows = {}
+        for row in sorted(rows, key=lambda row: row.window_start):
+            self.rows.setdefault(row.user_id, []).append(row)
+        self.starts = {user_id: [row.window_start for row in rows] for user_id, rows in self.rows.items()}
+
+    def find(self, user_id, timestamp):
+        starts = self.starts.get(user_id)
+        if not starts:
+            return None
+        i = bisect.bisect_right(starts, timestamp + EARLY_ARRIVAL) - 1
+        if i < 0:
+            return None
+        row = self.rows[user_id][i]
+        return row if covers(row, timestamp) else None
@@ -0,0 +1,333 @@
+"""
+Deterministic, high-volume seed data.
+
+SeedGenerator yields model instances for departments, shifts, devices,
+users, employee details, assignments, leave requests and balances, and
+months of punches with realistic late, overtime, early-exit and missed
+patterns. The same ``seed`` and scale always produce the same data, ids
+included. Instances are streamed into a sink: DatabaseSink inserts them
+in chunks, and FixtureSink writes JSONL fixtures loadable with
+``manage.py loaddata``.
+"""
+import os
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.contrib.auth.hashers import make_password
+from django.core import serializers
+from django.utils import timezone
+
+FIRST_NAMES = (
+    'Abebe', 'Almaz', 'Bekele', 'Birtukan', 'Dawit', 'Eden', 'Fikru', 'Genet',
+    'Hana', 'Haile', 'Kebede', 'Lemlem', 'Meron', 'Mulugeta', 'Selam', 'Solomon',
+    'Tigist', 'Tesfaye', 'Yared', 'Zewdu',
+)
+LAST_NAMES = (
+    'Alemu', 'Ayele', 'Bekele', 'Desta', 'Gebre', 'Girma', 'Haile', 'Kassa',
+    'Mekonnen', 'Negash', 'Tadesse', 'Tefera', 'Tesfaye', 'Wolde', 'Worku', 'Yohannes',
+)
+DEPARTMENT_NAMES = (
+    'Operations', 'Finance', 'Human Resources', 'Engineering', 'Sales', 'Logistics',
+    'Customer Service', 'Procurement', 'Quality', 'Security',
+)
+REST_DAYS = (5, 6)  # Saturday, Sunday
+
+
+class SeedGenerator:
+    def __init__(self, seed=0, scale=1.0, employees=None, days=90, end_date=None,
+                 night_shift_ratio=0.1, employees_per_department=100):
+        self.rng = random.Random(seed)
+        self.employees = employees or max(1, int(1000 * scale))
+        self.days = days
+        self.end_date = end_date or timezone.localdate() - timedelta(days=1)
+        self.start_date = self.end_date - timedelta(days=days - 1)
+        self.night_shift_ratio = night_shift_ratio
+        self.department_count = max(1, self.employees // employees_per_department)
+        self.password = make_password('password123')
+
+        self.departments = []
+        self.shifts = {}  # department id -> (day shift, night shift)
+        self.devices = []
+        self.users = []
+        self.hr_users = []
+        self.user_shift = {}
+        self.leave_days = defaultdict(set)
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def aware(self, day, at):
+        return timezone.make_aware(datetime.combine(day, at))
+
+    def generate(self):
+        """
+        Yield every seeded instance, parents before children.
+        """
+        yield from self.generate_departments()
+        yield from self.generate_shifts()
+        yield from self.generate_devices()
+        yield from self.generate_users()
+        yield from self.generate_assignments()
+        yield from self.generate_leave()
+        yield from self.generate_punches()
+
+    def generate_departments(self):
+        from apps.accounts.models import Department
+
+        for i in range(self.department_count):
+            suffix = f' {i // len(DEPARTMENT_NAMES) + 1}' if i >= len(DEPARTMENT_NAMES) else ''
+            department = Department(
+                id=self.uuid(),
+                name=f'{DEPARTMENT_NAMES[i % len(DEPARTMENT_NAMES)]}{suffix}',
+            )
+            self.departments.append(department)
+            yield department
+
+    def generate_shifts(self):
+        from apps.attendance.models import Shift
+
+        for department in self.departments:
+            day = Shift(
+                id=self.uuid(), name='Day', department_id=department.id,
+                start_time=time(8, 30), end_time=time(17, 30), grace_period_minutes=15,
+            )
+            night = Shift(
+                id=self.uuid(), name='Night', department_id=department.id,
+                start_time=time(22, 0), end_time=time(6, 0), grace_period_minutes=10,
+                overtime_allowed=True,
+            )
+            self.shifts[department.id] = (day, night)
+            yield day
+            yield night
+
+    def generate_devices(self):
+        from apps.core.models import Device
+
+        for i in range(max(1, self.department_count // 2)):
+            device = Device(
+                id=self.uuid(), name=f'Terminal {i + 1}', device_serial=f'SEED-{i + 1:05d}',
+                ip_address=f'10.0.{i // 250}.{i % 250 + 1}', location=f'Gate {i + 1}',
+                status='online',
+            )
+            self.devices.append(device)
+            yield device
+
+    def generate_users(self):
+        from apps.accounts.models import EmployeeDetail, User
+
+        managers = {}
+        for i in range(self.employees):
+            department = self.departments[i % self.department_count]
+            first_name = self.rng.choice(FIRST_NAMES)
+            last_name = self.rng.choice(LAST_NAMES)
+            user_type = 'admin' if i == 0 else 'hr_officer' if i % 100 == 1 else 'employee'
+            user = User(
+                id=self.uuid(),
+                username=f'{first_name}.{last_name}{i}'.lower(),
+                email=f'{first_name}.{last_name}{i}@example.com'.lower(),
+                first_name=first_name,
+                last_name=last_name,
+                user_type=user_type,
+                employee_id=f'EMP{i:07d}',
+                department_id=department.id,
+                position='Staff',
+                employment_type='full_time',
+                hire_date=self.start_date - timedelta(days=self.rng.randint(30, 3000)),
+                password=self.password,
+                is_staff=user_type == 'admin',
+                is_superuser=user_type == 'admin',
+            )
+            self.users.append(user)
+            if user_type == 'hr_officer':
+                self.hr_users.append(user)
+            yield user
+
+            manager_id = managers.setdefault(department.id, user.id)
+            yield EmployeeDetail(
+                id=self.uuid(),
+                user_id=user.id,
+                department_id=department.id,
+                manager_id=None if manager_id == user.id else manager_id,
+                contract_start_date=user.hire_date,
+            )
+
+    def generate_assignments(self):
+        from apps.attendance.models import Assignment
+
+        assigned_by = self.users[0].id
+        for user in self.users:
+            day, night = self.shifts[user.department_id]
+            shift = night if self.rng.random() < self.night_shift_ratio else day
+            self.user_shift[user.id] = shift
+            yield Assignment(
+                id=self.uuid(), user_id=user.id, shift_id=shift.id,
+                from_date=self.start_date - timedelta(days=30), assigned_by=assigned_by,
+            )
+
+    def generate_leave(self):
+        from apps.leave.models import LeaveBalance, LeaveRequest
+
+        approver = self.hr_users[0].id if self.hr_users else self.users[0].id
+        for user in self.users:
+            used = defaultdict(lambda: {'annual': 0, 'sick': 0})
+            for _ in range(max(1, self.days // 90)):
+                if self.rng.random() > 0.3:
+                    continue
+                start = self.start_date + timedelta(days=self.rng.randrange(self.days))
+                length = self.rng.randint(1, 5)
+                end = start + timedelta(days=length - 1)
+                leave_type = self.rng.choice(('annual', 'annual', 'annual', 'sick', 'unpaid'))
+                status = self.rng.choices(('approved', 'pending', 'rejected'), (70, 20, 10))[0]
+                if status == 'approved':
+                    for offset in range(length):
+                        self.leave_days[user.id].add(start + timedelta(days=offset))
+                    if leave_type in ('annual', 'sick'):
+                        used[start.year][leave_type] += length
+                yield LeaveRequest(
+                    id=self.uuid(), user_id=user.id, leave_type=leave_type,
+                    start_date=start, end_date=end, total_days=length,
+                    reason='Seeded leave request', status=status,
+                    approved_by=approver if status == 'approved' else None,
+                    approved_at=self.aware(start - timedelta(days=3), time(10, 0)) if status == 'approved' else None,
+                    rejection_reason='Staffing constraints' if status == 'rejected' else '',
+                )
+            # LeaveBalance.user_id is unique, so only the latest year gets a row
+            year = self.end_date.year
+            yield LeaveBalance(
+                id=self.uuid(), user_id=user.id, year=year,
+                annual_used=used[year]['annual'], annual_remaining=20 - used[year]['annual'],
+                sick_used=used[year]['sick'], sick_remaining=12 - used[year]['sick'],
+            )
+
+    def generate_punches(self):
+        from apps.attendance.models import AttendanceRecord
+
+        rng = self.rng
+        department_device = {
+            department.id: self.devices[i % len(self.devices)]
+            for i, department in enumerate(self.departments)
+        }
+        for offset in range(self.days):
+            day = self.start_date + timedelta(days=offset)
+            if day.weekday() in REST_DAYS:
+                continue
+            for user in self.users:
+                if day in self.leave_days[user.id] or rng.random() < 0.03:
+                    continue  # on leave, or absent
+                shift = self.user_shift[user.id]
+                device = department_device[user.department_id]
+                start = self.aware(day, shift.start_time)
+                end_day = day + timedelta(days=1) if shift.end_time <= shift.start_time else day
+                end = self.aware(end_day, shift.end_time)
+                grace_end = start + timedelta(minutes=shift.grace_period_minutes)
+
+                roll = rng.random()
+                if roll < 0.12:
+                    check_in = grace_end + timedelta(minutes=rng.randint(1, 90))
+                else:
+                    check_in = start + timedelta(minutes=rng.randint(-25, shift.grace_period_minutes))
+                check_in += timedelta(seconds=rng.randint(0, 59))
+                yield AttendanceRecord(
+                    id=self.uuid(), user_id=user.id, device_id=device.id, timestamp=check_in,
+                    attendance_type='check_in', status='late' if check_in > grace_end else 'on_time',
+                )
+
+                roll = rng.random()
+                if roll < 0.03:
+                    continue  # missed check-out
+                if roll < 0.07:
+                    check_out = end - timedelta(minutes=rng.randint(31, 120))
+                elif roll < 0.22:
+                    check_out = end + timedelta(minutes=rng.randint(15, 180))
+                else:
+                    check_out = end + timedelta(minutes=rng.randint(-10, 20))
+                check_out += timedelta(seconds=rng.randint(0, 59))
+                if check_out < end - timedelta(minutes=30):
+                    status = 'early_exit'
+                elif check_out > end:
+                    status = 'overtime'
+                else:
+                    status = 'on_time'
+                yield AttendanceRecord(
+                    id=self.uuid(), user_id=user.id, device_id=device.id, timestamp=check_out,
+                    attendance_type='check_out', status=status,
+                )
+
+
+class ChunkedSink:
+    """
+    Buffers instances per model and flushes each buffer at ``chunk_size``.
+    """
+
+    def __init__(self, chunk_size=5000):
+        self.chunk_size = chunk_size
+        self.buffers = defaultdict(list)
+        self.counts = defaultdict(int)
+
+    def add(self, instance):
+        model = type(instance)
+        buffer = self.buffers[model]
+        buffer.append(instance)
+        if len(buffer) >= self.chunk_size:
+            self.flush(model)
+
+    def flush(self, model):
+        buffer = self.buffers.pop(model, [])
+        if buffer:
+            self.write(model, buffer)
+            self.counts[model._meta.label] += len(buffer)
+
+    def close(self):
+        # Parents before children, in first-seen order
+        for model in list(self.buffers):
+            self.flush(model)
+
+    def write(self, model, instances):
+        raise NotImplementedError
+
+    def consume(self, instances):
+        for instance in instances:
+            self.add(instance)
+        self.close()
+        return dict(self.counts)
+
+
+class DatabaseSink(ChunkedSink):
+    """
+    Inserts chunks with native insert_many, or bulk_create when ``orm`` is
+    set. Neither path sends model signals.
+    """
+
+    def __init__(self, chunk_size=5000, orm=False):
+        super().__init__(chunk_size)
+        self.orm = orm
+
+    def write(self, model, instances):
+        if self.orm:
+            model.objects.bulk_create(instances)
+        else:
+            from apps.core.mongo import insert_instances
+            insert_instances(model, instances)
+
+
+class FixtureSink(ChunkedSink):
+    """
+    Appends chunks to one ``<app_label>.<model>.jsonl`` fixture per model.
+    """
+
+    def __init__(self, directory, chunk_size=5000):
+        super().__init__(chunk_size)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.started = set()
+
+    def write(self, model, instances):
+        path = os.path.join(self.directory, f'{model._meta.label_lower}.jsonl')
+        mode = 'a' if model in self.started else 'w'
+        self.started.add(model)
+        # Limit to concrete fields: serializing User's m2m fields would
+        # query groups/permissions once per instance.
+        fields = [field.attname for field in model._meta.concrete_fields]
+        with open(path, mode) as f:
+            serializers.serialize('jsonl', instances, stream=f, fields=fields)
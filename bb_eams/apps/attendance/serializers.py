@@ -1,8 +1,71 @@
 from rest_framework import serializers
-from .models import Shift, Assignment, AttendanceRecord, DailyAttendance
-from apps.core.models import Device
+from .models import Shift, Assignment, AttendanceRecord, DailyAttendance, MonthlyAttendance
+from apps.core.cache import get_reference
+from apps.core.compiled import CompiledSerializer
+from . import roster
+from .repositories import attendance_records
 from django.utils import timezone
 
+def punch_context(data):
+    """
+    Stamp the punch time and resolve the roster row it falls in, so a
+    night shift's check-out after midnight is checked against the
+    check-in of the shift it ends. Returns the range to look for punches.
+    """
+    data['timestamp'] = timezone.now()
+    data['roster'] = roster.find_row(data['user_id'], data['timestamp'])
+    return roster.punch_range(data['roster'], timezone.localtime(data['timestamp']).date())
+
+def punch_conflict(attendance_type, user_id, start, end):
+    """
+    Why ``user_id`` cannot punch ``attendance_type`` now, given the punch
+    range from punch_context(); None when they can.
+    """
+    if attendance_type == 'check_in':
+        # Check if user has already checked in this shift
+        if attendance_records.has_punch_between(user_id, 'check_in', start, end):
+            return "User already checked in today"
+        return None
+    
+    # Check if user has checked in this shift, and not checked out yet
+    punch_types = attendance_records.punch_types_between(user_id, start, end)
+    if 'check_in' not in punch_types:
+        return "User hasn't checked in today"
+    if 'check_out' in punch_types:
+        return "User already checked out today"
+    return None
+
+def projected_employee_names(rows):
+    """
+    Compiled employee_name from the cached user projection, one lookup
+    per employee on the page.
+    """
+    from apps.accounts.authentication import get_user_projection
+    names = {}
+    for user_id in {row['user_id'] for row in rows}:
+        user = get_user_projection(user_id)
+        names[user_id] = f"{user['first_name']} {user['last_name']}".strip() if user else None
+    return lambda row: names[row['user_id']]
+
+def employee_names(rows):
+    """
+    Compiled employee_name from User, one query per page.
+    """
+    from apps.accounts.models import User
+    names = {
+        user_id: f"{first_name} {last_name}".strip()
+        for user_id, first_name, last_name in User.objects.filter(
+            id__in={row['user_id'] for row in rows}
+        ).values_list('id', 'first_name', 'last_name')
+    }
+    return lambda row: names.get(row['user_id'])
+
+def device_names(rows):
+    def device_name(row):
+        device = get_reference('device', row['device_id'])
+        return device.name if device else None
+    return device_name
+
 class ShiftSerializer(serializers.ModelSerializer):
     class Meta:
         model = Shift
@@ -27,19 +90,20 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_employee_name(self, obj):
-        from apps.accounts.models import User
-        try:
-            user = User.objects.get(id=obj.user_id)
-            return user.get_full_name()
-        except User.DoesNotExist:
+        from apps.accounts.authentication import get_user_projection
+        user = get_user_projection(obj.user_id)
+        if user is None:
             return None
+        return f"{user['first_name']} {user['last_name']}".strip()
     
     def get_device_name(self, obj):
-        try:
-            device = Device.objects.get(id=obj.device_id)
-            return device.name
-        except Device.DoesNotExist:
-            return None
+        device = get_reference('device', obj.device_id)
+        return device.name if device else None
+
+# Read-only list form for history pages (apps.core.compiled)
+compiled_attendance_records = CompiledSerializer(
+    AttendanceRecordSerializer, employee_name=projected_employee_names, device_name=device_names
+)
 
 class CheckInSerializer(serializers.Serializer):
     user_id = serializers.UUIDField()
@@ -48,16 +112,9 @@ class CheckInSerializer(serializers.Serializer):
     location_data = serializers.JSONField(required=False, default=dict)
     
     def validate(self, data):
-        # Check if user has already checked in today without checking out
-        today = timezone.now().date()
-        check_in_exists = AttendanceRecord.objects.filter(
-            user_id=data['user_id'],
-            attendance_type='check_in',
-            timestamp__date=today
-        ).exists()
-        
-        if check_in_exists:
-            raise serializers.ValidationError("User already checked in today")
+        error = punch_conflict('check_in', data['user_id'], *punch_context(data))
+        if error:
+            raise serializers.ValidationError(error)
         
         return data
 
@@ -68,26 +125,9 @@ class CheckOutSerializer(serializers.Serializer):
     location_data = serializers.JSONField(required=False, default=dict)
     
     def validate(self, data):
-        # Check if user has checked in today
-        today = timezone.now().date()
-        check_in = AttendanceRecord.objects.filter(
-            user_id=data['user_id'],
-            attendance_type='check_in',
-            timestamp__date=today
-        ).first()
-        
-        if not check_in:
-            raise serializers.ValidationError("User hasn't checked in today")
-        
-        # Check if already checked out
-        check_out_exists = AttendanceRecord.objects.filter(
-            user_id=data['user_id'],
-            attendance_type='check_out',
-            timestamp__date=today
-        ).exists()
-        
-        if check_out_exists:
-            raise serializers.ValidationError("User already checked out today")
+        error = punch_conflict('check_out', data['user_id'], *punch_context(data))
+        if error:
+            raise serializers.ValidationError(error)
         
         return data
 
@@ -106,6 +146,22 @@ class DailyAttendanceSerializer(serializers.ModelSerializer):
         except User.DoesNotExist:
             return None
 
+compiled_daily_attendance = CompiledSerializer(DailyAttendanceSerializer, employee_name=employee_names)
+
+class MonthlyAttendanceSerializer(serializers.ModelSerializer):
+    employee_name = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = MonthlyAttendance
+        fields = '__all__'
+    
+    def get_employee_name(self, obj):
+        from apps.accounts.authentication import get_user_projection
+        user = get_user_projection(obj.user_id)
+        if user is None:
+            return None
+        return f"{user['first_name']} {user['last_name']}".strip()
+
 class AttendanceSummarySerializer(serializers.Serializer):
     date = serializers.DateField()
     present = serializers.IntegerField()
@@ -113,4 +169,23 @@ class AttendanceSummarySerializer(serializers.Serializer):
     late = serializers.IntegerField()
     on_time = serializers.IntegerField()
     leave = serializers.IntegerField()
-    total_employees = serializers.IntegerField()
\ No newline at end of file
+    holiday = serializers.IntegerField()
+    total_employees = serializers.IntegerField()
+
+class DeviceHealthSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    name = serializers.CharField()
+    device_serial = serializers.CharField()
+    location = serializers.CharField()
+    state = serializers.CharField()
+    failures = serializers.IntegerField()
+    latency_ms = serializers.FloatField(allow_null=True)
+    last_seen = serializers.DateTimeField(allow_null=True)
+    last_error = serializers.CharField(allow_null=True)
+    poll_interval = serializers.IntegerField()
+    next_poll_in = serializers.IntegerField(allow_null=True)
+    polled = serializers.BooleanField()
+
+class DeviceHealthSummarySerializer(serializers.Serializer):
+    counts = serializers.DictField(child=serializers.IntegerField())
+    devices = DeviceHealthSerializer(many=True)
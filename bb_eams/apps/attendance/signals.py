@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.core.cache import bump_reference_version
+from . import roster
+from .events import publish_punch
+from .models import Assignment, AttendanceRecord, DailyAttendance, Shift
+from .repositories import monthly_attendance
+
+
+@receiver(post_save, sender=DailyAttendance, dispatch_uid='refresh-monthly-attendance-save')
+@receiver(post_delete, sender=DailyAttendance, dispatch_uid='refresh-monthly-attendance-delete')
+def refresh_monthly_attendance(sender, instance, raw=False, **kwargs):
+    # ORM writes only; the repository fast path refreshes explicitly.
+    # Fixture loads are left to rebuild_monthly_attendance.
+    if not raw:
+        monthly_attendance.refresh(instance.user_id, instance.date)
+
+
+@receiver(post_save, sender=AttendanceRecord, dispatch_uid='publish-attendance-event')
+def publish_attendance_event(sender, instance, created, raw=False, **kwargs):
+    # ORM inserts only; the repository fast path publishes explicitly
+    if created and not raw:
+        publish_punch(instance)
+
+
+@receiver(post_save, sender=Assignment, dispatch_uid='regenerate-roster-assignment-save')
+@receiver(post_delete, sender=Assignment, dispatch_uid='regenerate-roster-assignment-delete')
+def regenerate_assignment_roster(sender, instance, raw=False, **kwargs):
+    # One employee's horizon is a few dozen rows; regenerate it inline so
+    # the next punch is classified against the new shift
+    if not raw:
+        roster.regenerate_users([instance.user_id])
+
+
+@receiver(post_save, sender=Shift, dispatch_uid='regenerate-roster-shift-save')
+@receiver(post_delete, sender=Shift, dispatch_uid='regenerate-roster-shift-delete')
+def regenerate_shift_roster(sender, instance, raw=False, **kwargs):
+    from .tasks import regenerate_shift_roster as task
+
+    if not raw:
+        # apps.core's reference cache receiver runs after this one; the
+        # task must see the new shift times
+        bump_reference_version('shift')
+        task.delay(str(instance.id))
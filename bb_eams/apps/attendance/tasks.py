@@ -1,116 +1,77 @@
+import logging
+import time
 from celery import shared_task
+from django.core.cache import cache
 from django.utils import timezone
-from datetime import timedelta, date, datetime
-from django.db.models import Q
-from .models import AttendanceRecord, DailyAttendance, Assignment, Shift
+from datetime import timedelta, date
+from .models import Assignment, AttendanceRecord
+from apps.core import metrics
+from apps.core.celery_metrics import records_processed
 from apps.core.models import Device
-from .utils import update_daily_attendance
+from apps.core.routing import reporting_reads
+from . import health, recompute, roster
+from .absences import materialize_range
+from .repositories import shift_roster
+from .utils import rebuild_daily_attendance
+
+logger = logging.getLogger('apps.tasks')
 
 @shared_task
 def sync_offline_attendance():
     """
-    Sync offline attendance records from devices
+    Poll the devices that are due and store their new punches. How often
+    each device is polled, and its online/degraded/offline state, comes
+    from apps.attendance.health.
     """
-    from apps.accounts.models import User
-    
-    devices = Device.objects.filter(status='online')
+    polled_devices = list(Device.objects.exclude(ip_address__isnull=True))
+    healths = health.get_health_many(polled_devices)
+    transitions = {}
     total_synced = 0
+    polled = 0
     
-    for device in devices:
+    for device in polled_devices:
+        state = healths[device.id]
+        if not health.is_due(state):
+            continue
+        # Overlapping runs skip a device another worker is polling
+        lock = f'device:poll:{device.id}'
+        if not cache.add(lock, True, 300):
+            continue
+        labels = {'device': device.device_serial}
+        started = time.perf_counter()
         try:
-            # --- SDK INTEGRATION POINT ---
-            # This is where you would connect to your specific biometric device.
-            # Example using pyzk:
-            # from zk import ZK
-            # zk = ZK(device.ip_address, port=device.port, timeout=5)
-            # conn = zk.connect()
-            # logs = conn.get_attendance()
-            # conn.disconnect()
-            
-            # Mocking logs for structure. Replace 'logs' with actual SDK result.
-            logs = [] 
-            
-            for log in logs:
-                # Extract data (adjust attribute names based on your SDK)
-                employee_id = getattr(log, 'user_id', None)
-                timestamp = getattr(log, 'timestamp', timezone.now())
-                punch_type = getattr(log, 'punch', 0) # 0: In, 1: Out
-                
-                if not employee_id:
-                    continue
-                    
-                # Ensure timestamp is timezone aware
-                if timezone.is_naive(timestamp):
-                    timestamp = timezone.make_aware(timestamp)
-
-                # Find User
-                user = User.objects.filter(employee_id=employee_id).first()
-                if not user:
-                    continue
-                
-                # Check for duplicates
-                if AttendanceRecord.objects.filter(
-                    user_id=user.id, 
-                    timestamp=timestamp, 
-                    device_id=device.id
-                ).exists():
-                    continue
-
-                # Determine Type (0/4/5 = Check-In, 1/5 = Check-Out is common)
-                attendance_type = 'check_in' if str(punch_type) in ['0', '4', '5'] else 'check_out'
-                
-                # Determine Status
-                status_val = 'on_time'
-                log_date = timestamp.date()
-                
-                assignment = Assignment.objects.filter(
-                    Q(to_date__gte=log_date) | Q(to_date__isnull=True),
-                    user_id=user.id,
-                    from_date__lte=log_date
-                ).first()
-                
-                if assignment:
-                    try:
-                        shift = Shift.objects.get(id=assignment.shift_id)
-                        
-                        if attendance_type == 'check_in':
-                            shift_start = datetime.combine(log_date, shift.start_time)
-                            shift_start = timezone.make_aware(shift_start)
-                            grace_end = shift_start + timedelta(minutes=shift.grace_period_minutes)
-                            
-                            if timestamp > grace_end:
-                                status_val = 'late'
-                                
-                        elif attendance_type == 'check_out':
-                            shift_end = datetime.combine(log_date, shift.end_time)
-                            shift_end = timezone.make_aware(shift_end)
-                            
-                            if timestamp < shift_end - timedelta(minutes=30):
-                                status_val = 'early_exit'
-                            elif timestamp > shift_end:
-                                status_val = 'overtime'
-                                
-                    except Shift.DoesNotExist:
-                        pass
+            if state['last_seen']:
+                metrics.set_gauge('device_sync_lag_seconds', round(time.time() - state['last_seen'], 3), labels)
+            records = health.poll_device(device, state)
+            health.save_health(device.id, state)
+        except Exception as e:
+            metrics.inc('device_sync_failures_total', labels)
+            logger.error(
+                'task=sync_offline_attendance device=%s event=failure error="%s"',
+                device.device_serial, e, exc_info=True,
+            )
+            continue
+        finally:
+            cache.delete(lock)
 
-                AttendanceRecord.objects.create(
-                    user_id=user.id,
-                    device_id=device.id,
-                    timestamp=timestamp,
-                    attendance_type=attendance_type,
-                    status=status_val,
-                    biometric_verified=True,
-                    synced=True
-                )
-                total_synced += 1
+        polled += 1
+        total_synced += len(records)
+        if state['state'] != device.status:
+            transitions[device.id] = state['state']
+        for name in health.STATES:
+            metrics.set_gauge('device_health_state', int(name == state['state']), {**labels, 'state': name})
+        if state['failures']:
+            metrics.inc('device_sync_failures_total', labels)
+        else:
+            metrics.set_gauge('device_last_sync_timestamp_seconds', int(time.time()), labels)
+        logger.info(
+            'task=sync_offline_attendance device=%s state=%s records=%d next_poll=%ds duration=%.3f',
+            device.device_serial, state['state'], len(records), state['interval'], time.perf_counter() - started,
+        )
 
-            device.last_communication = timezone.now()
-            device.save()
-            
-        except Exception as e:
-            print(f"Error syncing device {device.name}: {e}")
-            
-    return f"Synced {total_synced} records from {devices.count()} devices"
+    health.apply_transitions(transitions)
+    records_processed(total_synced)
+    return f"Synced {total_synced} records from {polled} of {len(polled_devices)} devices"
 
 @shared_task
 def calculate_daily_attendance():
@@ -119,14 +80,78 @@ def calculate_daily_attendance():
     """
     yesterday = date.today() - timedelta(days=1)
     
-    user_ids = AttendanceRecord.objects.filter(
-        timestamp__date=yesterday
-    ).values_list('user_id', flat=True).distinct()
+    # Yesterday's punches are long replicated; the writes, and the monthly
+    # totals derived from them, use the primary
+    with reporting_reads():
+        processed = rebuild_daily_attendance(yesterday)
+    records_processed(processed)
+    
+    return f"Processed {processed} users"
+
+@shared_task
+def materialize_absences(start_date=None, end_date=None):
+    """
+    Write absent, on-leave and holiday DailyAttendance rows. By default
+    completes yesterday and adds today's leave and holiday rows; dates
+    are ISO strings.
+    """
+    today = date.today()
+    start = date.fromisoformat(start_date) if start_date else today - timedelta(days=1)
+    end = date.fromisoformat(end_date) if end_date else today
+    
+    if start_date or end_date:
+        # Queued right after a leave approval, which must be read back
+        written = materialize_range(start, end, today)
+    else:
+        with reporting_reads():
+            written = materialize_range(start, end, today)
+    records_processed(written)
     
-    for user_id in user_ids:
-        update_daily_attendance(user_id, yesterday)
+    return f"Materialized {written} rows from {start} to {min(end, today)}"
+
+@shared_task
+def extend_shift_roster():
+    """
+    Keep the shift roster generated over its rolling horizon
+    """
+    written = roster.extend()
+    records_processed(written)
+    
+    return f"Wrote {written} roster rows"
+
+@shared_task
+def regenerate_shift_roster(shift_id):
+    """
+    Regenerate the roster of everyone assigned to a shift after its times
+    changed
+    """
+    start, end = roster.horizon()
+    user_ids = set(Assignment.objects.filter(shift_id=shift_id).values_list('user_id', flat=True))
+    # Rows for a deleted shift are left by its former assignments' users
+    user_ids.update(shift_roster.users_for_shift(shift_id, start, end))
+    written = roster.generate(start, end, user_ids) if user_ids else 0
+    records_processed(written)
+    
+    return f"Wrote {written} roster rows for {len(user_ids)} users"
+
+@shared_task
+def recompute_attendance_chunk(chunk_id):
+    """
+    Run one chunk of a recompute_attendance job
+    """
+    index, status, rows, seconds = recompute.process_chunk(chunk_id)
+    records_processed(rows)
+    
+    return [index, status, rows, seconds]
+
+@shared_task
+def finish_recompute_job(results, job_id):
+    """
+    Chord callback once every chunk of a recompute job has run
+    """
+    status = recompute.finish_job(job_id)
     
-    return f"Processed {user_ids.count()} users"
+    return f"Recompute job {job_id} {status}"
 
 @shared_task
 def cleanup_old_records():
@@ -137,4 +162,5 @@ def cleanup_old_records():
     old_records = AttendanceRecord.objects.filter(timestamp__lt=cutoff_date)
     count = old_records.count()
     old_records.delete()
+    records_processed(count)
     return f"Deleted {count} old records"
\ No newline at end of file
@@ -0,0 +1,67 @@
+import asyncio
+import time
+import uuid
+from unittest import mock
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from apps.attendance import events
+from apps.attendance.models import AttendanceRecord
+from apps.attendance.views import AttendanceStreamView
+from apps.core.testing import MongoTestCase
+
+
+class PublishTests(MongoTestCase):
+    def check_in(self, status='on_time'):
+        return AttendanceRecord.objects.create(
+            user_id=uuid.uuid4(), device_id=uuid.uuid4(), attendance_type='check_in', status=status,
+        )
+
+    def last_event(self):
+        return events.events_after(events.latest_event_id() - 1)[0][0]
+
+    def counters(self):
+        return events.get_counters(timezone.localdate(), [events.NO_DEPARTMENT])[events.NO_DEPARTMENT]
+
+    def test_punches_are_counted_once(self):
+        # Published by the post_save signal, then again
+        record = self.check_in('late')
+        events.publish_punch(record)
+        self.assertEqual(self.counters(), {'present': 1, 'late': 1, 'on_leave': 0})
+        event = self.last_event()
+        self.assertEqual((event['user_id'], event['counters']['present']), (str(record.user_id), 1))
+
+    def test_publish_does_not_wait_for_another_seeder(self):
+        day = timezone.localdate()
+        cache.add(f'{events._ready_key(day)}:lock', True, 60)
+        started = time.monotonic()
+        # Stored by the signal while the other process seeds
+        record = self.check_in()
+        self.assertLess(time.monotonic() - started, 1)
+        event = self.last_event()
+        self.assertEqual((event['user_id'], event['counters']), (str(record.user_id), None))
+
+        # The seeder counts what was published meanwhile, once
+        with mock.patch.object(events, '_count_stored_since', wraps=events._count_stored_since) as top_up:
+            cache.delete(f'{events._ready_key(day)}:lock')
+            self.assertTrue(events.ensure_counters(day))
+        top_up.assert_called_once()
+        self.assertEqual(self.counters()['present'], 1)
+
+
+@override_settings(ATTENDANCE_STREAM_MAX_SECONDS=0.2, ATTENDANCE_STREAM_POLL_INTERVAL=0.05)
+class StreamTests(MongoTestCase):
+    def test_async_stream(self):
+        events.publish_punch(AttendanceRecord(
+            user_id=uuid.uuid4(), device_id=uuid.uuid4(), attendance_type='check_in', timestamp=timezone.now(),
+        ))
+        latest = events.latest_event_id()
+        view = AttendanceStreamView()
+
+        async def collect():
+            return [chunk async for chunk in view.astream(view.steps(None, latest - 1))]
+
+        chunks = asyncio.run(collect())
+        self.assertEqual(chunks[0], 'retry: 3000\n\n')
+        self.assertTrue(chunks[1].startswith(f'id: {latest}\nevent: punch\n'))
+        self.assertNotIn('', chunks)
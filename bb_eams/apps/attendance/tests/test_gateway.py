@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from pymongo.errors import AutoReconnect
+from apps.accounts.models import User
+from apps.attendance.gateway.protocol import device_token
+from apps.attendance.gateway.server import DeviceGateway
+from apps.attendance.gateway.simulator import SimulatedTerminal, run_terminals
+from apps.attendance.gateway.writer import BatchWriter
+from apps.attendance.ingest import Punch
+from apps.attendance.models import AttendanceRecord
+from apps.core.models import Device
+from apps.core.testing import MongoTestCase
+
+SECRET = 'test-gateway-secret'
+
+
+def punches(*employee_ids):
+    return [Punch('device', employee_id, datetime(2024, 1, 1, 8, i), 0) for i, employee_id in enumerate(employee_ids)]
+
+
+class BatchWriterTests(SimpleTestCase):
+    def write(self, batch, ingest, **options):
+        dead = []
+        writer = BatchWriter(retry_delay=0, max_attempts=2, ingest=ingest,
+                             dead_letter=lambda punch, error: dead.append(punch.employee_id), **options)
+
+        async def run():
+            writer.start()
+            futures = [await writer.submit(punch) for punch in batch]
+            await writer.close()
+            return futures
+
+        with self.assertLogs('apps.attendance.gateway', 'ERROR'):
+            futures = asyncio.run(run())
+        self.assertTrue(all(future.done() for future in futures))
+        return writer, dead
+
+    def test_failing_punch_is_dead_lettered(self):
+        def ingest(batch):
+            if any(punch.employee_id == 'bad' for punch in batch):
+                raise ValueError('bad timestamp')
+            return list(batch)
+
+        writer, dead = self.write(punches('a', 'b', 'bad', 'c', 'd', 'e', 'f', 'g'), ingest)
+        self.assertEqual(dead, ['bad'])
+        self.assertEqual((writer.stored, writer.dead_lettered), (7, 1))
+
+    def test_unreachable_database_is_retried_without_giving_up(self):
+        failures = iter(range(5))
+
+        def ingest(batch):
+            if next(failures, None) is not None:
+                raise AutoReconnect('primary down')
+            return list(batch)
+
+        writer, dead = self.write(punches('a', 'b', 'c'), ingest)
+        self.assertEqual(dead, [])
+        self.assertEqual(writer.stored, 3)
+
+
+class DeviceGatewayTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.device = Device.objects.create(name='Gate', device_serial='SIM-0000')
+        Device.objects.create(name='Other', device_serial='SIM-0001')
+        self.employee_ids = []
+        for i in range(3):
+            User.objects.create(
+                username=f'user{i}', email=f'user{i}@example.com', first_name='Test', last_name=str(i),
+                employee_id=f'EMP{i:04d}',
+            )
+            self.employee_ids.append(f'EMP{i:04d}')
+
+    def simulate(self, token, count=20):
+        async def run():
+            writer = BatchWriter(flush_interval=0.05)
+            gateway = DeviceGateway(writer, SECRET, heartbeat=5)
+            writer.start()
+            server = await gateway.serve('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            terminal = SimulatedTerminal(
+                'SIM-0000', self.employee_ids, '127.0.0.1', port, token=token, rate=200, count=count,
+            )
+            try:
+                summary = await run_terminals([terminal], timeout=30 if token == self.token else 1)
+            finally:
+                await gateway.shutdown()
+            return summary, terminal
+
+        return asyncio.run(run())
+
+    @property
+    def token(self):
+        return device_token('SIM-0000', SECRET)
+
+    def test_punches_are_stored_and_acknowledged(self):
+        summary, _ = self.simulate(self.token)
+        self.assertEqual((summary['acked'], summary['unacked']), (20, 0))
+        self.assertEqual(AttendanceRecord.objects.filter(device_id=self.device.id).count(), 20)
+
+    def test_rejects_shared_or_foreign_tokens(self):
+        for token in ('', SECRET, device_token('SIM-0001', SECRET)):
+            with self.assertLogs('apps.attendance.gateway', 'WARNING'):
+                summary, terminal = self.simulate(token, count=2)
+            self.assertEqual(summary['acked'], 0)
+            self.assertIn('Invalid token', terminal.errors)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_requires_a_secret(self):
+        with self.assertRaises(ImproperlyConfigured):
+            DeviceGateway(BatchWriter(), '')
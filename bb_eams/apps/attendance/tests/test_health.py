@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase
+from django.utils import timezone
+from apps.attendance import health
+from apps.attendance.ingest import Punch
+
+NOW = timezone.make_aware(datetime(2026, 3, 2, 9, 0))
+
+
+def punch(timestamp, employee_id='EMP0000001'):
+    return Punch(1, employee_id, timestamp, '0')
+
+
+class PollCursorTests(SimpleTestCase):
+    def setUp(self):
+        self.device = SimpleNamespace(id=1, status='online', last_communication=None)
+        self.health = health.initial_health(self.device)
+
+    def poll(self, log):
+        with mock.patch.object(health, 'fetch_punches', return_value=log), \
+                mock.patch.object(health, 'ingest_punches', side_effect=list) as ingest:
+            health.poll_device(self.device, self.health)
+        return ingest.call_args.args[0]
+
+    def test_old_punches_are_skipped(self):
+        log = [punch(NOW - timedelta(days=2)), punch(NOW - timedelta(minutes=30)), punch(NOW)]
+        self.assertEqual(self.poll(log), log)
+        log.append(punch(NOW + timedelta(hours=1)))
+        self.assertEqual(self.poll(log), log[1:])
+
+    def test_punches_after_a_clock_correction_are_kept(self):
+        # The clock ran a day fast, then was set back
+        log = [punch(NOW + timedelta(days=1))]
+        self.poll(log)
+        log.append(punch(NOW + timedelta(minutes=5)))
+        self.assertEqual(self.poll(log), log)
+
+    def test_cleared_log_is_read_again(self):
+        self.poll([punch(NOW - timedelta(days=1)), punch(NOW)])
+        log = [punch(NOW - timedelta(days=3))]
+        self.assertEqual(self.poll(log), log)
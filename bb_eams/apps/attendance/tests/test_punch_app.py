@@ -0,0 +1,89 @@
+import asyncio
+import json
+import time
+import uuid
+from datetime import timedelta
+from django.test import override_settings
+from django.utils import timezone
+from apps.accounts.models import User
+from apps.attendance import roster
+from apps.attendance.models import Assignment, AttendanceRecord, Shift
+from apps.attendance.punch_app import PunchApplication, device_key, sign
+from apps.core.models import Device
+from apps.core.testing import MongoTestCase
+
+SECRET = 'test-punch-secret'
+
+
+@override_settings(DEVICE_PUNCH_SECRET=SECRET)
+class PunchApplicationTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.device = Device.objects.create(name='Gate', device_serial='GATE-1')
+        self.user = User.objects.create(username='abebe', email='abebe@example.com', first_name='Abebe', last_name='K')
+        now = timezone.localtime()
+        shift = Shift.objects.create(
+            name='Day', department_id=uuid.uuid4(),
+            start_time=(now - timedelta(hours=1)).time(), end_time=(now + timedelta(hours=7)).time(),
+        )
+        Assignment.objects.create(
+            user_id=self.user.id, shift_id=shift.id, from_date=now.date() - timedelta(days=1), assigned_by=self.user.id,
+        )
+        roster.generate(now.date() - timedelta(days=1), now.date() + timedelta(days=1), [self.user.id])
+        self.app = PunchApplication(workers=2)
+
+    def request(self, path, timestamp=None, signed_path=None, key=None, body=None):
+        body = body or json.dumps({'user_id': str(self.user.id)}).encode()
+        timestamp = str(timestamp or int(time.time()))
+        signature = sign(device_key('GATE-1', SECRET), 'POST', signed_path or path, timestamp, body)
+        headers = [(b'x-device-serial', b'GATE-1'), (b'x-timestamp', timestamp.encode()), (b'x-signature', signature.encode())]
+        if key:
+            headers.append((b'idempotency-key', key.encode()))
+        return {'type': 'http', 'method': 'POST', 'path': path, 'client': ('10.0.0.5', 0), 'headers': headers}, body
+
+    def send(self, scope, body):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.app(scope, receive, send))
+        return messages[0]['status'], dict(messages[0]['headers']), json.loads(messages[1]['body'])
+
+    def test_check_in(self):
+        status, _, payload = self.send(*self.request('/punch/check-in/'))
+        self.assertEqual(status, 201, payload)
+        self.assertEqual(payload['attendance_type'], 'check_in')
+        record = AttendanceRecord.objects.get(user_id=self.user.id)
+        self.assertEqual((str(record.id), record.device_id), (payload['id'], self.device.id))
+
+    def test_signature_covers_the_path(self):
+        status, _, _ = self.send(*self.request('/punch/check-out/', signed_path='/punch/check-in/'))
+        self.assertEqual(status, 401)
+
+    def test_resent_request_is_refused(self):
+        scope, body = self.request('/punch/check-in/')
+        self.assertEqual(self.send(scope, body)[0], 201)
+        status, _, payload = self.send(scope, body)
+        self.assertEqual((status, payload), (409, {'error': 'Request already received'}))
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_idempotent_retry_gets_the_first_response(self):
+        scope, body = self.request('/punch/check-in/', key='retry-1')
+        status, _, first = self.send(scope, body)
+        self.assertEqual(status, 201, first)
+
+        # The same signed request, and one signed again a second later
+        for retry in ((scope, body), self.request('/punch/check-in/', timestamp=int(time.time()) + 1, key='retry-1')):
+            status, headers, payload = self.send(*retry)
+            self.assertEqual((status, payload), (201, first))
+            self.assertEqual(headers[b'idempotent-replayed'], b'true')
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_idempotency_key_reused_for_another_request(self):
+        self.assertEqual(self.send(*self.request('/punch/check-in/', key='retry-2'))[0], 201)
+        status, _, _ = self.send(*self.request('/punch/check-out/', key='retry-2'))
+        self.assertEqual(status, 422)
@@ -0,0 +1,37 @@
+import uuid
+from datetime import date, datetime, time
+from django.utils import timezone
+from apps.attendance import recompute
+from apps.attendance.models import AttendanceRecord, MonthlyAttendance, RecomputeJob
+from apps.core.testing import MongoTestCase
+
+DAYS = (date(2026, 3, 2), date(2026, 3, 3))
+
+
+class RecomputeJobTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user_ids = [uuid.uuid4(), uuid.uuid4()]
+        device_id = uuid.uuid4()
+        for user_id in self.user_ids:
+            for day in DAYS:
+                for attendance_type, hour in (('check_in', 8), ('check_out', 17)):
+                    AttendanceRecord.objects.create(
+                        user_id=user_id, device_id=device_id, attendance_type=attendance_type,
+                        timestamp=timezone.make_aware(datetime.combine(day, time(hour))),
+                    )
+
+    def test_months_are_refreshed_once_per_job(self):
+        # One chunk per day and employee: four chunks share each month row
+        job = recompute.create_job(DAYS[0], DAYS[1], self.user_ids, chunk_days=1, chunk_users=1)
+        self.assertEqual(job.total_chunks, 4)
+        for chunk_id in recompute.pending_chunk_ids(job):
+            self.assertEqual(recompute.process_chunk(chunk_id)[1], 'done')
+        self.assertFalse(MonthlyAttendance.objects.filter(month=date(2026, 3, 1)).count())
+
+        self.assertEqual(recompute.finish_job(job.id), 'completed')
+        self.assertEqual(RecomputeJob.objects.get(id=job.id).status, 'completed')
+        months = MonthlyAttendance.objects.filter(month=date(2026, 3, 1))
+        self.assertEqual(sorted((row.user_id, row.days_recorded) for row in months),
+                         sorted((user_id, 2) for user_id in self.user_ids))
+        self.assertEqual({row.total_hours for row in months}, {18.0})
@@ -0,0 +1,105 @@
+import uuid
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from apps.attendance.models import AttendanceRecord, DailyAttendance, MonthlyAttendance
+from apps.attendance.repositories import attendance_records, daily_attendance, devices, month_start, monthly_attendance
+from apps.core.models import Device
+from apps.core.testing import MongoTestCase
+
+
+def field_values(instance, fields=None):
+    names = fields or [field.attname for field in instance._meta.concrete_fields]
+    values = {}
+    for name in names:
+        value = getattr(instance, name)
+        if isinstance(value, datetime):
+            # MongoDB stores milliseconds
+            value = value.replace(microsecond=value.microsecond // 1000 * 1000)
+        values[name] = value
+    return values
+
+
+class RepositoryParityTests(MongoTestCase):
+    """
+    The native repositories read and write what the ORM does.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.device = Device.objects.create(name='Gate', device_serial='GATE-1')
+        self.user_id = uuid.uuid4()
+        self.day = timezone.localdate() - timedelta(days=1)
+
+    def at(self, hour, minute=0, day=None):
+        return timezone.make_aware(datetime.combine(day or self.day, time(hour, minute)))
+
+    def punch(self, attendance_type, when, user_id=None):
+        return AttendanceRecord.objects.create(
+            user_id=user_id or self.user_id, device_id=self.device.id, timestamp=when,
+            attendance_type=attendance_type, location_data={'gate': 1},
+        )
+
+    def test_punches_for_day(self):
+        self.punch('check_out', self.at(17, 30))
+        self.punch('check_in', self.at(8, 5))
+        self.punch('check_in', self.at(8, 0, self.day - timedelta(days=1)))
+        self.punch('check_in', self.at(9), user_id=uuid.uuid4())
+
+        orm = AttendanceRecord.objects.filter(
+            user_id=self.user_id, timestamp__gte=self.at(0), timestamp__lt=self.at(0, day=self.day + timedelta(days=1)),
+        ).order_by('timestamp')
+        fast = attendance_records.punches_for_day(self.user_id, self.day, fields=None)
+        self.assertEqual([field_values(r) for r in fast], [field_values(r) for r in orm])
+        self.assertEqual(attendance_records.punch_types(self.user_id, self.day), {'check_in', 'check_out'})
+        self.assertTrue(attendance_records.has_punch(self.user_id, 'check_out', self.day))
+        self.assertFalse(attendance_records.has_punch(self.user_id, 'check_out', self.day - timedelta(days=1)))
+
+    def test_projection_in_any_order(self):
+        record = self.punch('check_in', self.at(8))
+        fields = ('status', 'device_id', 'user_id', 'timestamp')
+        fast = attendance_records.find({}, fields)
+        self.assertEqual([field_values(r, fields) for r in fast], [field_values(record, fields)])
+        self.assertEqual(attendance_records.existing_punches({self.device.id}, [self.at(8)]),
+                         {(self.device.id, self.user_id, self.at(8))})
+
+    def test_insert_reads_back_through_orm(self):
+        record = attendance_records.create(
+            user_id=self.user_id, device_id=self.device.id, timestamp=self.at(8),
+            attendance_type='check_in', status='late', location_data={'lat': 9.03},
+        )
+        self.assertEqual(field_values(AttendanceRecord.objects.get(id=record.id)), field_values(record))
+
+    def test_upsert_matches_orm(self):
+        values = {'first_check_in': self.at(8), 'total_hours': 8.5, 'status': 'present'}
+        daily_attendance.upsert(self.user_id, self.day, values)
+        daily_attendance.upsert(self.user_id, self.day, {**values, 'total_hours': 9.25})
+
+        rows = list(DailyAttendance.objects.filter(user_id=self.user_id, date=self.day))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0].total_hours, 9.25)
+        self.assertEqual(field_values(daily_attendance.get(self.user_id, self.day)), field_values(rows[0]))
+
+    def test_device_get(self):
+        self.assertEqual(field_values(devices.get(self.device.id)), field_values(Device.objects.get(id=self.device.id)))
+
+    def test_monthly_totals(self):
+        month = month_start(self.day)
+        other = uuid.uuid4()
+        daily_attendance.upsert_many([
+            (self.user_id, month, {'status': 'present', 'total_hours': 8.0, 'late_minutes': 10}),
+            (self.user_id, month + timedelta(days=1), {'status': 'absent'}),
+            (other, month, {'status': 'on_leave'}),
+        ])
+        monthly_attendance.refresh_many(month, [self.user_id, other])
+
+        row = MonthlyAttendance.objects.get(user_id=self.user_id, month=month)
+        self.assertEqual(
+            (row.days_recorded, row.present_days, row.absent_days, row.late_days, row.total_hours),
+            (2, 1, 1, 1, 8.0),
+        )
+        self.assertEqual(MonthlyAttendance.objects.get(user_id=other, month=month).leave_days, 1)
+
+        # A user left without daily rows loses the month row
+        DailyAttendance.objects.filter(user_id=other).delete()
+        monthly_attendance.refresh_many(month, [other])
+        self.assertFalse(MonthlyAttendance.objects.filter(user_id=other, month=month).exists())
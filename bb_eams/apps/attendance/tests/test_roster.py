@@ -0,0 +1,65 @@
+import uuid
+from datetime import date, datetime, time
+from django.core.cache import cache
+from django.utils import timezone
+from apps.attendance import roster
+from apps.attendance.models import Assignment, AttendanceRecord, DailyAttendance, Shift, ShiftRoster
+from apps.attendance.utils import rebuild_daily_attendance, update_daily_attendance
+from apps.core.testing import MongoTestCase
+
+MONDAY, TUESDAY = date(2026, 3, 2), date(2026, 3, 3)
+
+
+def at(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+class OvernightRosterTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user_id = uuid.uuid4()
+        shift = Shift.objects.create(name='Night', department_id=uuid.uuid4(), start_time=time(22),
+                                     end_time=time(6), grace_period_minutes=15)
+        Assignment.objects.create(user_id=self.user_id, shift_id=shift.id, from_date=date(2026, 3, 1),
+                                  assigned_by=uuid.uuid4())
+        device_id = uuid.uuid4()
+        for attendance_type, timestamp in (('check_in', at(MONDAY, 21, 50)), ('check_out', at(TUESDAY, 6, 5))):
+            AttendanceRecord.objects.create(user_id=self.user_id, device_id=device_id,
+                                            attendance_type=attendance_type, timestamp=timestamp)
+
+    def assert_night_of_monday(self):
+        row = roster.find_row(self.user_id, at(TUESDAY, 6, 5))
+        self.assertEqual((row.work_date, row.window_start, row.window_end),
+                         (MONDAY, at(MONDAY, 22), at(TUESDAY, 6)))
+        self.assertEqual(roster.classify_punch('check_in', at(MONDAY, 22, 20), row), 'late')
+
+        update_daily_attendance(self.user_id, MONDAY)
+        daily = DailyAttendance.objects.get(user_id=self.user_id)
+        self.assertEqual((daily.date, daily.status, round(daily.total_hours, 2)), (MONDAY, 'present', 8.25))
+        # Tuesday's own window starts on Tuesday evening
+        self.assertEqual(rebuild_daily_attendance(TUESDAY), 0)
+
+    def test_overnight_check_out_lands_on_the_start_date(self):
+        roster.extend(today=date(2026, 3, 5))
+        self.assertTrue(roster.is_generated(TUESDAY))
+        self.assertEqual(ShiftRoster.objects.filter(user_id=self.user_id, work_date=MONDAY).count(), 1)
+        self.assert_night_of_monday()
+
+    def test_dates_outside_the_generated_range_are_built_on_the_fly(self):
+        self.assertIsNone(cache.get(roster.GENERATED_KEY))
+        self.assertFalse(ShiftRoster.objects.filter(work_date=MONDAY).count())
+        self.assert_night_of_monday()
+        self.assertEqual(roster.row_for_date(self.user_id, MONDAY).window_end, at(TUESDAY, 6))
+        self.assertEqual(list(roster.rows_for_date(MONDAY)), [self.user_id])
+        self.assertFalse(ShiftRoster.objects.filter(work_date=MONDAY).count())
+
+    def test_generated_rows_match_the_rows_built_on_the_fly(self):
+        built = roster.rows_for_date(MONDAY)[self.user_id]
+        roster.extend(today=date(2026, 3, 5))
+        stored = roster.rows_for_date(MONDAY)[self.user_id]
+        self.assertEqual(
+            (stored.shift_id, stored.window_start, stored.window_end, stored.grace_end),
+            (built.shift_id, built.window_start, built.window_end, built.grace_end),
+        )
+        # Nothing changed, so nothing is rewritten
+        self.assertEqual(roster.extend(today=date(2026, 3, 5)), 0)
@@ -0,0 +1,38 @@
+from datetime import date
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.attendance.models import DailyAttendance
+from apps.core.testing import MongoTestCase
+
+DAY = date(2026, 3, 2)
+
+
+class AttendanceSummaryViewTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employees = [
+            User.objects.create(username=f'e{i}', email=f'e{i}@example.com', user_type='employee') for i in range(4)
+        ]
+        User.objects.create(username='gone', email='gone@example.com', user_type='employee', status='inactive')
+        self.client = APIClient()
+        self.client.force_authenticate(self.employees[0])
+
+    def test_summary_for_a_past_date(self):
+        for user, status, late_minutes in zip(self.employees, ('present', 'present', 'on_leave', 'absent'), (5, 0, 0, 0)):
+            DailyAttendance.objects.create(user_id=user.id, date=DAY, status=status, late_minutes=late_minutes)
+
+        response = self.client.get('/api/attendance/summary/', {'date': '2026-03-02'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            {key: response.data[key] for key in ('present', 'late', 'on_time', 'leave', 'absent', 'total_employees')},
+            {'present': 2, 'late': 1, 'on_time': 1, 'leave': 1, 'absent': 1, 'total_employees': 4},
+        )
+
+    def test_absent_until_materialized(self):
+        DailyAttendance.objects.create(user_id=self.employees[0].id, date=date.today(), status='present')
+        response = self.client.get('/api/attendance/summary/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.data['present'], response.data['absent']), (1, 3))
+
+    def test_bad_date(self):
+        self.assertEqual(self.client.get('/api/attendance/summary/', {'date': '02/03/2026'}).status_code, 400)
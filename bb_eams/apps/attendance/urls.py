@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CheckInView, CheckOutView, AttendanceHistoryView,
-    DailyAttendanceView, AttendanceSummaryView, ShiftViewSet
+    DailyAttendanceView, MonthlyAttendanceView, AttendanceSummaryView,
+    AttendanceStreamView, DeviceHealthView, ShiftViewSet
 )
 
 router = DefaultRouter()
@@ -14,5 +15,8 @@ urlpatterns = [
     path('check-out/', CheckOutView.as_view(), name='check-out'),
     path('history/', AttendanceHistoryView.as_view(), name='attendance-history'),
     path('daily/', DailyAttendanceView.as_view(), name='daily-attendance'),
+    path('monthly/', MonthlyAttendanceView.as_view(), name='monthly-attendance'),
     path('summary/', AttendanceSummaryView.as_view(), name='attendance-summary'),
+    path('stream/', AttendanceStreamView.as_view(), name='attendance-stream'),
+    path('devices/health/', DeviceHealthView.as_view(), name='device-health'),
 ]
\ No newline at end of file
@@ -1,71 +1,103 @@
-from django.utils import timezone
 from django.db.models import Q
-from datetime import datetime
-from .models import AttendanceRecord, DailyAttendance, Assignment, Shift
+from apps.core.cache import get_reference
+from apps.core.policy_engine import rules_for_roster
+from .models import Assignment
+from . import roster
+from .repositories import attendance_records, daily_attendance, day_bounds, monthly_attendance, month_start
+
+def active_assignments(on_date):
+    return Assignment.objects.filter(
+        Q(to_date__gte=on_date) | Q(to_date__isnull=True),
+        from_date__lte=on_date
+    )
+
+def get_assigned_shift(user_id, on_date):
+    """Return the shift assigned to a user on a date, or None"""
+    shift_id = active_assignments(on_date).filter(
+        user_id=user_id
+    ).order_by('pk').values_list('shift_id', flat=True).first()
+    return get_reference('shift', shift_id)
+
+def first_and_last_punch(punches):
+    """Earliest check-in and latest check-out among timestamp-ordered punches"""
+    check_in = next((p for p in punches if p.attendance_type == 'check_in'), None)
+    check_out = next((p for p in reversed(punches) if p.attendance_type == 'check_out'), None)
+    return check_in, check_out
+
+def compute_daily_values(check_in, check_out, row):
+    """Daily attendance fields for a shift (roster row, or None) with both a check-in and a check-out"""
+    total_seconds = (check_out.timestamp - check_in.timestamp).total_seconds()
+    total_hours = max(0, total_seconds / 3600)
+
+    overtime_hours = 0
+    late_minutes = 0
+    early_exit_minutes = 0
+
+    if row:
+        if check_out.timestamp > row.window_end:
+            overtime_seconds = (check_out.timestamp - row.window_end).total_seconds()
+            overtime_hours = rules_for_roster('overtime', row).overtime_hours(overtime_seconds)
+        elif check_out.status == 'early_exit':
+            early_exit_minutes = max(0, int((row.window_end - check_out.timestamp).total_seconds() / 60))
+
+        # Determine late minutes
+        if check_in.status == 'late':
+            late_seconds = (check_in.timestamp - row.window_start).total_seconds()
+            late_minutes = max(0, int(late_seconds / 60))
+
+    regular_hours = max(0, total_hours - overtime_hours)
+
+    return {
+        'first_check_in': check_in.timestamp,
+        'last_check_out': check_out.timestamp,
+        'total_hours': total_hours,
+        'regular_hours': regular_hours,
+        'overtime_hours': overtime_hours,
+        'late_minutes': late_minutes,
+        'early_exit_minutes': early_exit_minutes,
+        'status': 'present'
+    }
 
 def update_daily_attendance(user_id, attendance_date):
-    """Update or create daily attendance record for a specific user and date"""
-    check_in = AttendanceRecord.objects.filter(
-        user_id=user_id,
-        attendance_type='check_in',
-        timestamp__date=attendance_date
-    ).order_by('timestamp').first()
-    
-    check_out = AttendanceRecord.objects.filter(
-        user_id=user_id,
-        attendance_type='check_out',
-        timestamp__date=attendance_date
-    ).order_by('-timestamp').first()
-    
+    """
+    Update or create daily attendance record for a specific user and work
+    date. Punches are taken from the user's shift window, so a night
+    shift's check-out after midnight counts for the day it started.
+    """
+    row = roster.row_for_date(user_id, attendance_date)
+    punches = attendance_records.punches_for_user(user_id, *roster.punch_range(row, attendance_date))
+    check_in, check_out = first_and_last_punch(punches)
+
     if check_in and check_out:
-        total_seconds = (check_out.timestamp - check_in.timestamp).total_seconds()
-        total_hours = max(0, total_seconds / 3600)
-        
-        # Calculate overtime (if any)
-        assignment = Assignment.objects.filter(
-            Q(to_date__gte=attendance_date) | Q(to_date__isnull=True),
-            user_id=user_id,
-            from_date__lte=attendance_date
-        ).first()
-        
-        overtime_hours = 0
-        late_minutes = 0
-        
-        if assignment:
-            try:
-                shift = Shift.objects.get(id=assignment.shift_id)
-                shift_end_dt = datetime.combine(attendance_date, shift.end_time)
-                if timezone.is_aware(check_out.timestamp):
-                    shift_end_dt = timezone.make_aware(shift_end_dt)
-                
-                if check_out.timestamp > shift_end_dt:
-                    overtime_seconds = (check_out.timestamp - shift_end_dt).total_seconds()
-                    overtime_hours = max(0, overtime_seconds / 3600)
+        values = compute_daily_values(check_in, check_out, row)
+        daily_attendance.upsert(user_id, attendance_date, values)
+        monthly_attendance.refresh(user_id, attendance_date)
+
+def rebuild_daily_attendance(attendance_date):
+    """
+    update_daily_attendance() for every user who punched on a work date,
+    with one roster read, one punch query and batched upserts.
+    Returns the number of users processed.
+    """
+    rows = roster.rows_for_date(attendance_date)
+    day_start, day_end = day_bounds(attendance_date)
+    windows = [roster.punch_window(row) for row in rows.values()]
+    start = min([day_start] + [window[0] for window in windows])
+    end = max([day_end] + [window[1] for window in windows])
+
+    punches_by_user = {}
+    for punch in attendance_records.punches_between(start, end):
+        window_start, window_end = roster.punch_range(rows.get(punch.user_id), attendance_date)
+        if window_start <= punch.timestamp < window_end:
+            punches_by_user.setdefault(punch.user_id, []).append(punch)
 
-                # Determine late minutes
-                if check_in.status == 'late':
-                    shift_start_dt = datetime.combine(attendance_date, shift.start_time)
-                    if timezone.is_aware(check_in.timestamp):
-                        shift_start_dt = timezone.make_aware(shift_start_dt)
-                    late_seconds = (check_in.timestamp - shift_start_dt).total_seconds()
-                    late_minutes = max(0, int(late_seconds / 60))
+    values = []
+    for user_id, punches in punches_by_user.items():
+        check_in, check_out = first_and_last_punch(punches)
+        if check_in and check_out:
+            values.append((user_id, attendance_date, compute_daily_values(check_in, check_out, rows.get(user_id))))
 
-            except Shift.DoesNotExist:
-                pass
-        
-        regular_hours = max(0, total_hours - overtime_hours)
-        
-        # Update or create daily attendance
-        DailyAttendance.objects.update_or_create(
-            user_id=user_id,
-            date=attendance_date,
-            defaults={
-                'first_check_in': check_in.timestamp,
-                'last_check_out': check_out.timestamp,
-                'total_hours': total_hours,
-                'regular_hours': regular_hours,
-                'overtime_hours': overtime_hours,
-                'late_minutes': late_minutes,
-                'status': 'present'
-            }
-        )
\ No newline at end of file
+    daily_attendance.upsert_many(values)
+    if values:
+        monthly_attendance.refresh_many(month_start(attendance_date), [user_id for user_id, _, _ in values])
+    return len(punches_by_user)
@@ -1,21 +1,40 @@
 from rest_framework import generics, permissions, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Count, Q, Sum
-from datetime import datetime, timedelta, date
-from .models import Shift, Assignment, AttendanceRecord, DailyAttendance
+from datetime import datetime, date
+from .models import Shift, AttendanceRecord, DailyAttendance, MonthlyAttendance
 from .serializers import (
-    ShiftSerializer, AssignmentSerializer, AttendanceRecordSerializer,
+    ShiftSerializer, AttendanceRecordSerializer,
     CheckInSerializer, CheckOutSerializer, DailyAttendanceSerializer,
-    AttendanceSummarySerializer
+    MonthlyAttendanceSerializer, AttendanceSummarySerializer, DeviceHealthSummarySerializer,
+    compiled_attendance_records, compiled_daily_attendance
 )
-from apps.core.models import AuditLog, Device
+from apps.core.models import AuditLog, Notification
+from apps.accounts.hierarchy import requested_team
 from apps.accounts.models import User
-import uuid
+from apps.accounts.permissions import IsHROfficer
+from apps.core.cache import get_reference, get_reference_list
+from apps.core.idempotency import IdempotencyMixin
+from apps.core.mixins import CompiledListMixin, ConditionalGetMixin, ReferenceDataListMixin
+from apps.core.mongo import insert_instances
+from apps.core.routing import record_writes, reporting_view
+import asyncio
+import json
+import time
+from .health import health_summary
+from .events import events_after, get_counters, latest_event_id, publish_punch
+from .repositories import attendance_records, daily_attendance, devices
+from . import roster
 from .utils import update_daily_attendance
 
-class CheckInView(APIView):
+class CheckInView(IdempotencyMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
@@ -27,88 +46,65 @@ class CheckInView(APIView):
         location_data = serializer.validated_data.get('location_data', {})
         
         # Verify device exists
-        try:
-            device = Device.objects.get(id=device_id)
-        except Device.DoesNotExist:
+        device = get_reference('device', device_id)
+        if device is None:
             return Response(
                 {'error': 'Device not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get user's shift for today
-        today = date.today()
-        assignment = Assignment.objects.filter(
-            Q(to_date__gte=today) | Q(to_date__isnull=True),
-            user_id=user_id,
-            from_date__lte=today
-        ).first()
-        
-        if not assignment:
+        # Get the shift this check-in starts
+        row = serializer.validated_data['roster']
+        if row is None:
             return Response(
                 {'error': 'No shift assigned for today'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            shift = Shift.objects.get(id=assignment.shift_id)
-        except Shift.DoesNotExist:
-            return Response(
-                {'error': 'Assigned shift not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        # Determine if late
-        check_in_datetime = timezone.now()
-        status_type = 'on_time'
-        
-        shift_start_dt = datetime.combine(today, shift.start_time)
-        if timezone.is_aware(check_in_datetime):
-            shift_start_dt = timezone.make_aware(shift_start_dt)
-        grace_end = shift_start_dt + timedelta(minutes=shift.grace_period_minutes)
-        
-        if check_in_datetime > grace_end:
-            status_type = 'late'
+        check_in_datetime = serializer.validated_data['timestamp']
+        status_type = roster.classify_punch('check_in', check_in_datetime, row)
         
         # Create attendance record
-        attendance = AttendanceRecord.objects.create(
+        attendance = attendance_records.create(
             user_id=user_id,
             device_id=device_id,
+            timestamp=check_in_datetime,
             attendance_type='check_in',
             status=status_type,
             location_data=location_data
         )
         
+        publish_punch(attendance)
+        # Their own history and daily views read the primary for a while
+        record_writes([user_id, request.user.id])
+        
         # Update device last communication
-        device.last_communication = timezone.now()
-        device.save()
+        devices.touch(device_id)
         
-        # Audit log
-        AuditLog.objects.create(
+        # Audit log and notification
+        insert_instances(AuditLog, [AuditLog(
             user_id=request.user.id,
             action='check_in',
             resource_type='attendance',
             resource_id=attendance.id,
             description=f"User checked in at {device.name}",
             ip_address=request.META.get('REMOTE_ADDR')
-        )
-        
-        # Create notification
-        from apps.core.models import Notification
-        Notification.objects.create(
+        )])
+        insert_instances(Notification, [Notification(
             user_id=user_id,
             notification_type='success',
             title='Check-In Successful',
             message=f'You checked in at {check_in_datetime.strftime("%H:%M:%S")}',
             status='sent',
             sent_at=timezone.now()
-        )
+        )])
         
         return Response(
             AttendanceRecordSerializer(attendance).data,
             status=status.HTTP_201_CREATED
         )
 
-class CheckOutView(APIView):
+class CheckOutView(IdempotencyMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
@@ -120,85 +116,68 @@ class CheckOutView(APIView):
         location_data = serializer.validated_data.get('location_data', {})
         
         # Verify device exists
-        try:
-            device = Device.objects.get(id=device_id)
-        except Device.DoesNotExist:
+        device = get_reference('device', device_id)
+        if device is None:
             return Response(
                 {'error': 'Device not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        today = date.today()
-        
-        # Get today's check-in
-        check_in = AttendanceRecord.objects.filter(
-            user_id=user_id,
-            attendance_type='check_in',
-            timestamp__date=today
-        ).first()
-        
-        # Determine if early exit
-        now = timezone.now()
-        status_type = 'on_time'
-        
-        # Get shift end time
-        assignment = Assignment.objects.filter(
-            Q(to_date__gte=today) | Q(to_date__isnull=True),
-            user_id=user_id,
-            from_date__lte=today
-        ).first()
-        
-        if assignment:
-            try:
-                shift = Shift.objects.get(id=assignment.shift_id)
-                shift_end_dt = datetime.combine(today, shift.end_time)
-                if timezone.is_aware(now):
-                    shift_end_dt = timezone.make_aware(shift_end_dt)
-                if now < shift_end_dt - timedelta(minutes=30):  # More than 30 min early
-                    status_type = 'early_exit'
-                elif now > shift_end_dt:
-                    status_type = 'overtime'
-            except Shift.DoesNotExist:
-                pass
+        # Classify against the shift being checked out of, which may have
+        # started yesterday
+        row = serializer.validated_data['roster']
+        now = serializer.validated_data['timestamp']
+        status_type = roster.classify_punch('check_out', now, row)
         
         # Create checkout record
-        checkout = AttendanceRecord.objects.create(
+        checkout = attendance_records.create(
             user_id=user_id,
             device_id=device_id,
+            timestamp=now,
             attendance_type='check_out',
             status=status_type,
             location_data=location_data
         )
         
+        publish_punch(checkout)
+        record_writes([user_id, request.user.id])
+        
         # Calculate and update daily attendance
-        update_daily_attendance(user_id, today)
+        update_daily_attendance(user_id, row.work_date if row else timezone.localtime(now).date())
         
         # Update device
-        device.last_communication = timezone.now()
-        device.save()
+        devices.touch(device_id)
         
         # Audit log
-        AuditLog.objects.create(
+        insert_instances(AuditLog, [AuditLog(
             user_id=request.user.id,
             action='check_out',
             resource_type='attendance',
             resource_id=checkout.id,
             description=f"User checked out at {device.name}",
             ip_address=request.META.get('REMOTE_ADDR')
-        )
+        )])
         
         return Response(
             AttendanceRecordSerializer(checkout).data,
             status=status.HTTP_201_CREATED
         )
 
-class AttendanceHistoryView(generics.ListAPIView):
+@reporting_view
+class AttendanceHistoryView(ConditionalGetMixin, CompiledListMixin, generics.ListAPIView):
+    validator_references = ('device',)
     serializer_class = AttendanceRecordSerializer
+    compiled_serializer = compiled_attendance_records
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        user_id = self.kwargs.get('user_id', self.request.user.id)
-        queryset = AttendanceRecord.objects.filter(user_id=user_id)
+        team = requested_team(self.request)
+        if team is not None:
+            # ?scope=team: everyone reporting to the requesting user
+            queryset = AttendanceRecord.objects.filter(user_id__in=team)
+        else:
+            user_id = self.kwargs.get('user_id', self.request.user.id)
+            queryset = AttendanceRecord.objects.filter(user_id=user_id)
         
         # Filter by date range
         start_date = self.request.query_params.get('start_date')
@@ -216,8 +195,10 @@ class AttendanceHistoryView(generics.ListAPIView):
         
         return queryset
 
-class DailyAttendanceView(generics.ListAPIView):
+@reporting_view
+class DailyAttendanceView(ConditionalGetMixin, CompiledListMixin, generics.ListAPIView):
     serializer_class = DailyAttendanceSerializer
+    compiled_serializer = compiled_daily_attendance
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
@@ -236,55 +217,229 @@ class DailyAttendanceView(generics.ListAPIView):
             user_ids = User.objects.filter(department_id=department_id).values_list('id', flat=True)
             queryset = queryset.filter(user_id__in=user_ids)
         
+        # Filter to the requesting manager's reports
+        team = requested_team(self.request)
+        if team is not None:
+            queryset = queryset.filter(user_id__in=team)
+        
         return queryset
 
-class AttendanceSummaryView(APIView):
+@reporting_view
+class MonthlyAttendanceView(ConditionalGetMixin, generics.ListAPIView):
+    """
+    Monthly totals for payroll: one row per employee and month.
+    ?month=YYYY-MM (default: current month), ?department_id=, ?user_id=
+    """
+    serializer_class = MonthlyAttendanceSerializer
     permission_classes = [permissions.IsAuthenticated]
     
-    def get(self, request):
-        date_param = request.query_params.get('date', timezone.now().date())
-        department_id = request.query_params.get('department_id')
+    def get_queryset(self):
+        month_param = self.request.query_params.get('month')
+        try:
+            month = datetime.strptime(month_param, '%Y-%m').date() if month_param else timezone.localdate().replace(day=1)
+        except ValueError:
+            raise ValidationError({'month': 'Expected YYYY-MM'})
+        queryset = MonthlyAttendance.objects.filter(month=month)
         
-        # Get all employees
-        employees = User.objects.filter(is_active=True, user_type='employee')
-        if department_id:
-            employees = employees.filter(department_id=department_id)
+        # Employees only see their own totals
+        if self.request.user.user_type not in ['admin', 'hr_officer']:
+            return queryset.filter(user_id=self.request.user.id)
         
-        total_employees = employees.count()
+        user_id = self.request.query_params.get('user_id')
+        if user_id:
+            queryset = queryset.filter(user_id=user_id)
         
-        # Get attendance for the date
-        attendance = DailyAttendance.objects.filter(date=date_param)
+        department_id = self.request.query_params.get('department_id')
         if department_id:
-            attendance = attendance.filter(user_id__in=employees.values_list('id', flat=True))
-        
-        present = attendance.filter(status='present').count()
-        absent = total_employees - present
+            user_ids = User.objects.filter(department_id=department_id).values_list('id', flat=True)
+            queryset = queryset.filter(user_id__in=user_ids)
         
-        # Get leave count
-        from apps.leave.models import LeaveRequest
-        leave_count = LeaveRequest.objects.filter(
-            status='approved',
-            start_date__lte=date_param,
-            end_date__gte=date_param,
-            user_id__in=employees.values_list('id', flat=True)
-        ).count()
+        return queryset.order_by('user_id')
+
+@reporting_view
+class AttendanceSummaryView(APIView):
+    """
+    Headcounts for a date from one grouped count over DailyAttendance.
+    Absent, on-leave and holiday rows are materialized nightly (see
+    apps.attendance.absences); until then today's absentees are the
+    employees with no row yet.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        date_param = request.query_params.get('date')
+        try:
+            day = datetime.strptime(date_param, '%Y-%m-%d').date() if date_param else timezone.localdate()
+        except ValueError:
+            raise ValidationError({'date': 'Expected YYYY-MM-DD'})
+        department_id = request.query_params.get('department_id')
         
-        # Late arrivals
-        late = attendance.filter(late_minutes__gt=0).count()
+        employees = User.objects.filter(status='active', user_type='employee')
+        user_ids = None
+        if department_id:
+            user_ids = list(employees.filter(department_id=department_id).values_list('id', flat=True))
+            total_employees = len(user_ids)
+        else:
+            total_employees = employees.count()
+        
+        counts = daily_attendance.status_counts(day, user_ids)
+        present = counts.get('present', 0)
+        late = counts.get('late', 0)
+        leave = counts.get('on_leave', 0)
+        holiday = counts.get('holiday', 0)
+        if day < date.today():
+            absent = counts.get('absent', 0)
+        else:
+            absent = max(0, total_employees - present - leave - holiday)
         
         summary = {
-            'date': date_param,
+            'date': day,
             'present': present,
             'absent': absent,
             'late': late,
             'on_time': present - late,
-            'leave': leave_count,
+            'leave': leave,
+            'holiday': holiday,
             'total_employees': total_employees
         }
         
         return Response(AttendanceSummarySerializer(summary).data)
 
-class ShiftViewSet(viewsets.ModelViewSet):
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error responses are rendered; the stream itself is raw
+        return json.dumps(data).encode()
+
+class AttendanceStreamView(APIView):
+    """
+    Server-Sent Events for live dashboards. Sends a ``counters`` snapshot
+    of today's present/late/on-leave counts per department, then a
+    ``punch`` or ``leave`` event, carrying that department's updated
+    counters, for each change. Reconnects resume from Last-Event-ID.
+    ?department_id= limits the stream to one department.
+
+    Under bb_eams.asgi the stream waits between polls on the event loop;
+    under WSGI each open stream holds a worker for up to
+    ATTENDANCE_STREAM_MAX_SECONDS, so serve /api/attendance/stream/ from
+    bb_eams.asgi like /punch/.
+    """
+    permission_classes = [IsHROfficer]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+    
+    def get(self, request):
+        department_id = request.query_params.get('department_id')
+        last_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+        try:
+            last_id = int(last_id) if last_id else None
+        except ValueError:
+            last_id = None
+        
+        steps = self.steps(department_id, last_id)
+        stream = self.astream(steps) if isinstance(request._request, ASGIRequest) else self.stream(steps)
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    def message(self, event_type, data, event_id):
+        return f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+    
+    def snapshot(self, department_id, cursor):
+        day = timezone.localdate()
+        counters = get_counters(day, [department_id] if department_id else None)
+        return self.message('counters', {'date': str(day), 'departments': counters}, cursor)
+    
+    def stream(self, steps):
+        poll_interval = getattr(settings, 'ATTENDANCE_STREAM_POLL_INTERVAL', 1.0)
+        for chunk in steps:
+            if chunk:
+                yield chunk
+            else:
+                time.sleep(poll_interval)
+    
+    async def astream(self, steps):
+        poll_interval = getattr(settings, 'ATTENDANCE_STREAM_POLL_INTERVAL', 1.0)
+        # Each step reads the cache, and maybe the database, off the loop
+        step = sync_to_async(next, thread_sensitive=False)
+        while True:
+            chunk = await step(steps, None)
+            if chunk is None:
+                return
+            if chunk:
+                yield chunk
+            else:
+                await asyncio.sleep(poll_interval)
+    
+    def steps(self, department_id, last_id):
+        """
+        The messages of the stream, with an empty string wherever it
+        should wait a poll interval.
+        """
+        max_seconds = getattr(settings, 'ATTENDANCE_STREAM_MAX_SECONDS', 300)
+        
+        latest = latest_event_id()
+        cursor = latest if last_id is None or last_id > latest else last_id
+        yield 'retry: 3000\n\n'
+        if cursor == latest:
+            yield self.snapshot(department_id, cursor)
+        
+        started = last_write = time.monotonic()
+        day = timezone.localdate()
+        missing = missing_since = None
+        
+        while time.monotonic() - started < max_seconds:
+            events, missing_id = events_after(cursor)
+            if events and events[0]['id'] > cursor + 1:
+                # Fell behind the ring; resynchronise the counters
+                yield self.snapshot(department_id, events[0]['id'] - 1)
+                last_write = time.monotonic()
+            for event in events:
+                cursor = event['id']
+                if department_id and event['department_id'] != department_id:
+                    continue
+                yield self.message(event['type'], event, cursor)
+                last_write = time.monotonic()
+            
+            if missing_id is None:
+                missing = None
+            elif missing_id != missing:
+                # Probably still being written; give it a moment
+                missing, missing_since = missing_id, time.monotonic()
+            elif time.monotonic() - missing_since > 2:
+                cursor, missing = missing_id, None
+                yield self.snapshot(department_id, cursor)
+                last_write = time.monotonic()
+            
+            if timezone.localdate() != day:
+                day = timezone.localdate()
+                yield self.snapshot(department_id, cursor)
+                last_write = time.monotonic()
+            elif time.monotonic() - last_write >= 15:
+                yield ': keepalive\n\n'
+                last_write = time.monotonic()
+            yield ''
+
+class DeviceHealthView(APIView):
+    """
+    Health of every polled device with counts by state. Filter with
+    ?state=online|degraded|offline.
+    """
+    permission_classes = [IsHROfficer]
+
+    def get(self, request):
+        polled = [device for device in get_reference_list('device') if device.ip_address]
+        summary = health_summary(polled)
+        state = request.query_params.get('state')
+        if state:
+            summary['devices'] = [row for row in summary['devices'] if row['state'] == state]
+        return Response(DeviceHealthSummarySerializer(summary).data)
+
+class ShiftViewSet(ReferenceDataListMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    reference_name = 'shift'
+    reference_filter_fields = ('department_id',)
     queryset = Shift.objects.all()
     serializer_class = ShiftSerializer
     permission_classes = [permissions.IsAuthenticated]
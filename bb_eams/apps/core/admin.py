@@ -0,0 +1,30 @@
+from django.contrib.admin.views.main import ChangeList
+from .paginators import EstimatedCountPaginator
+
+
+class PageLookupChangeList(ChangeList):
+    """
+    ChangeList that hands the current page to ModelAdmin.annotate_page()
+    so related names can be resolved in one batch instead of per row.
+    """
+
+    def get_results(self, request):
+        super().get_results(request)
+        # Iterating fills the queryset's result cache, so the template
+        # renders the same annotated instances.
+        self.model_admin.annotate_page(self.result_list)
+
+
+class LargeCollectionAdminMixin:
+    """
+    Changelist defaults for collections with tens of thousands of rows:
+    estimated counts, no second full COUNT, and per-page batched lookups.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return PageLookupChangeList
+
+    def annotate_page(self, objects):
+        pass
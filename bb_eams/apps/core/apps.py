@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'apps.core'
+
+    def ready(self):
+        from . import celery_metrics
+        from .cache import connect_signals
+        from .instrumentation import install_serializer_timing
+        connect_signals()
+        celery_metrics.connect_signals()
+        install_serializer_timing()
@@ -0,0 +1,256 @@
+"""
+Micro-benchmarks for the attendance and leave hot paths.
+
+Every case runs against a throwaway database seeded at a fixed size.
+Each iteration records wall time and the number of queries issued, so a
+run can be compared with a stored baseline. See the run_benchmarks
+management command.
+"""
+import asyncio
+import json
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from .instrumentation import end_request, start_request
+
+# 'smoke' only checks that every case runs
+SIZES = {'smoke': 40, '1k': 1000, '10k': 10000, '100k': 100000}
+
+
+def use_database(name, mongomock=False):
+    """
+    Point the default connection at ``name``, optionally through mongomock.
+    """
+    if mongomock:
+        import mongomock
+        import djongo.database
+        # Separate mongomock clients do not share data, so every
+        # connection, on any alias or thread, gets this one
+        client = mongomock.MongoClient()
+        djongo.database.MongoClient = lambda *args, **kwargs: client
+        # djongo keeps a client per database name; a name used before
+        # would otherwise get back the previous mongomock client
+        djongo.database.clients.clear()
+
+    from .mongo import get_database, reset_clients
+    from .routing import REPORTING_ALIAS, reporting_configured
+
+    aliases = ['default', REPORTING_ALIAS] if reporting_configured() else ['default']
+    for alias in aliases:
+        connections[alias].close()
+        connections[alias].settings_dict['NAME'] = name
+    reset_clients()
+    database = get_database()
+    database.client.drop_database(name)
+
+
+class Fixtures:
+    """
+    Seeds the benchmark database with the deterministic seed_data
+    generator: punch history for ``days`` days ending yesterday, so every
+    employee is still free to check in today.
+    """
+
+    def __init__(self, employees, days, seed=0):
+        self.employees = employees
+        self.days = days
+        self.seed_value = seed
+        self.today = timezone.localdate()
+
+    def seed(self):
+        from apps.accounts import hierarchy, search
+        from apps.attendance import roster
+        from apps.attendance.scripts.seed_data import DatabaseSink, SeedGenerator
+
+        generator = SeedGenerator(
+            seed=self.seed_value, employees=self.employees, days=self.days,
+            end_date=self.today - timedelta(days=1),
+        )
+        DatabaseSink().consume(generator.generate())
+        # Native inserts skip the signals that maintain these
+        roster.extend(self.today)
+        hierarchy.rebuild()
+        search.rebuild()
+
+        self.users = [user for user in generator.users if user.user_type == 'employee']
+        self.hr_user = generator.hr_users[0] if generator.hr_users else generator.users[0]
+        self.device = generator.devices[0]
+        return self
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(func, iterations, batch=1):
+    timings, queries = [], []
+    for i in range(iterations):
+        # Reporting views read through their own alias; repository
+        # commands are counted by the pymongo command listener (not
+        # under mongomock, which has no command monitoring)
+        stats, token = start_request()
+        try:
+            with ExitStack() as stack:
+                contexts = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+                start = time.perf_counter()
+                func(i)
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            end_request(token)
+        queries.append(sum(len(ctx.captured_queries) for ctx in contexts) + stats.queries)
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p50_ms': round(_percentile(timings, 0.5), 3),
+        'p95_ms': round(_percentile(timings, 0.95), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': max(queries),
+        # Operations per second; a case may do ``batch`` of them per iteration
+        'per_second': round(batch * iterations / (sum(timings) / 1000), 1),
+    }
+
+
+PUNCH_BURST = 10
+
+
+class BenchmarkSuite:
+    # Work units per iteration of cases that do more than one
+    batch_sizes = {'punch_app_burst': PUNCH_BURST}
+
+    def __init__(self, fixtures, iterations):
+        self.fixtures = fixtures
+        # Each third of the employees checks in once: through the views,
+        # the punch app, and the punch app in bursts
+        self.iterations = max(1, min(iterations, len(fixtures.users) // 3))
+        self.factory = APIRequestFactory()
+        self.loop = None
+
+    def _call(self, view, method, path, user, data=None, expected=(200, 201)):
+        request = getattr(self.factory, method)(path, data, format='json')
+        force_authenticate(request, user=user)
+        response = view(request)
+        response.render()
+        if response.status_code not in expected:
+            raise AssertionError(f'{path} returned {response.status_code}: {response.content[:200]}')
+        return response
+
+    async def _punch(self, app, attendance_type, user):
+        """
+        One signed request to the ASGI punch app, as a device would send it.
+        """
+        from apps.attendance.punch_app import device_key, sign
+
+        serial = self.fixtures.device.device_serial
+        body = json.dumps({'user_id': str(user.id)}).encode()
+        timestamp = str(int(time.time()))
+        path = f"/punch/{attendance_type.replace('_', '-')}/"
+        scope = {
+            'type': 'http', 'method': 'POST', 'path': path,
+            'client': ('127.0.0.1', 0),
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'x-device-serial', serial.encode()),
+                (b'x-timestamp', timestamp.encode()),
+                (b'x-signature', sign(device_key(serial, app.secret), 'POST', path, timestamp, body).encode()),
+            ],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await app(scope, receive, send)
+        if messages[0]['status'] != 201:
+            raise AssertionError(f"{scope['path']} returned {messages[0]['status']}: {messages[1]['body'][:200]}")
+
+    async def _burst(self, app, users):
+        # Gathered inside the loop; a gather built outside binds to another
+        await asyncio.gather(*(self._punch(app, 'check_in', user) for user in users))
+
+    def _run_async(self, coroutine):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+        return self.loop.run_until_complete(coroutine)
+
+    def cases(self):
+        from apps.accounts.views import UserViewSet
+        from apps.attendance.utils import update_daily_attendance
+        from apps.attendance.views import (
+            AttendanceHistoryView, AttendanceSummaryView, CheckInView, CheckOutView,
+            DailyAttendanceView
+        )
+        from apps.attendance.punch_app import PunchApplication
+        from apps.core.utils import generate_attendance_report
+        from apps.leave.views import LeaveRequestListView
+
+        f = self.fixtures
+        users = f.users
+        hr = f.hr_user
+        yesterday = f.today - timedelta(days=1)
+        week_start = f.today - timedelta(days=min(7, f.days))
+        check_in, check_out = CheckInView.as_view(), CheckOutView.as_view()
+        history, daily = AttendanceHistoryView.as_view(), DailyAttendanceView.as_view()
+        summary, leave_list = AttendanceSummaryView.as_view(), LeaveRequestListView.as_view()
+        user_search = UserViewSet.as_view({'get': 'search'})
+        punch = lambda i: {'user_id': str(users[i].id), 'device_id': str(f.device.id)}
+        punch_app = PunchApplication(secret='benchmark')
+        n = self.iterations
+        app_punch = lambda attendance_type, i: self._run_async(self._punch(punch_app, attendance_type, users[n + i]))
+        burst = lambda i: self._run_async(self._burst(punch_app, users[2 * n + i * PUNCH_BURST:][:PUNCH_BURST]))
+
+        return [
+            ('check_in', lambda i: self._call(check_in, 'post', '/api/attendance/check-in/', hr, punch(i)), self.iterations),
+            ('check_out', lambda i: self._call(check_out, 'post', '/api/attendance/check-out/', hr, punch(i)), self.iterations),
+            # The same punches through the slim ASGI app; query counts
+            # miss its worker threads, compare the timings
+            ('punch_app_check_in', lambda i: app_punch('check_in', i), self.iterations),
+            ('punch_app_check_out', lambda i: app_punch('check_out', i), self.iterations),
+            ('punch_app_burst', burst, max(1, self.iterations // PUNCH_BURST)),
+            ('history_page', lambda i: self._call(history, 'get', '/api/attendance/history/', users[i]), self.iterations),
+            ('daily_computation', lambda i: update_daily_attendance(users[i].id, yesterday), self.iterations),
+            ('daily_list', lambda i: self._call(daily, 'get', f'/api/attendance/daily/?date={yesterday}', hr), self.iterations),
+            ('summary', lambda i: self._call(summary, 'get', f'/api/attendance/summary/?date={yesterday}', hr), self.iterations),
+            ('leave_list', lambda i: self._call(leave_list, 'get', '/api/leave/requests/', hr), self.iterations),
+            ('user_search', lambda i: self._call(
+                user_search, 'get', f'/api/accounts/users/search/?q={users[i].last_name[:3]}', hr
+            ), self.iterations),
+            ('report', lambda i: generate_attendance_report(str(week_start), str(yesterday)), max(1, self.iterations // 25)),
+        ]
+
+    def run(self, only=None, progress=None):
+        results = {}
+        for name, func, iterations in self.cases():
+            if only and name not in only:
+                continue
+            results[name] = measure(func, iterations, self.batch_sizes.get(name, 1))
+            if progress:
+                progress(name, results[name])
+        return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Return human-readable regressions: any case issuing more queries than
+    its baseline, or whose p95 exceeds the baseline by more than
+    ``tolerance`` (a fraction).
+    """
+    regressions = []
+    for name, expected in baseline.get('results', {}).items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+        if actual['queries'] > expected['queries']:
+            regressions.append(f"{name}: {actual['queries']} queries (baseline {expected['queries']})")
+        limit = expected['p95_ms'] * (1 + tolerance)
+        if actual['p95_ms'] > limit:
+            regressions.append(f"{name}: p95 {actual['p95_ms']}ms (baseline {expected['p95_ms']}ms, limit {limit:.3f}ms)")
+    return regressions
@@ -0,0 +1,156 @@
+"""
+Versioned cache for rarely-changing reference collections.
+
+Each collection has a version counter in the Django cache; save/delete
+signals bump it, which orphans every key built from the old version.
+Decoded lists are also memoised per process against that version, and the
+version itself is re-read at most every REFERENCE_VERSION_CHECK_INTERVAL
+seconds, so per-row lookups in a list or changelist stay in memory.
+"""
+import threading
+import time
+from collections import Counter
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from .instrumentation import record_cache_access
+
+REFERENCE_MODELS = {
+    'shift': 'attendance.Shift',
+    'department': 'accounts.Department',
+    'policy': 'core.Policy',
+    'device': 'core.Device',
+    'role': 'accounts.Role',
+}
+
+_stats = Counter()
+_local = {}
+_lock = threading.Lock()
+
+
+def _timeout():
+    return getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 3600)
+
+
+def _check_interval():
+    return getattr(settings, 'REFERENCE_VERSION_CHECK_INTERVAL', 1.0)
+
+
+def _version_key(name):
+    return f'refdata:{name}:version'
+
+
+def _initial_version():
+    # Seed from the clock so an evicted counter never restarts at a
+    # version whose payload might still be cached.
+    return int(time.time() * 1000)
+
+
+def get_reference_version(name):
+    return cache.get_or_set(_version_key(name), _initial_version, None)
+
+
+def bump_reference_version(name):
+    """
+    Invalidate every cached view of a reference collection.
+    """
+    key = _version_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
+    with _lock:
+        _local.pop(name, None)
+
+
+def _load(name):
+    now = time.monotonic()
+    local = _local.get(name)
+    if local and now - local[3] < _check_interval():
+        _stats[f'{name}.hit'] += 1
+        return local
+
+    version = get_reference_version(name)
+    if local and local[0] == version:
+        _stats[f'{name}.hit'] += 1
+        local = local[:3] + (now,)
+        with _lock:
+            _local[name] = local
+        return local
+
+    key = f'refdata:{name}:v{version}:all'
+    objects = cache.get(key)
+    record_cache_access('reference', objects is not None)
+    if objects is None:
+        _stats[f'{name}.miss'] += 1
+        model = apps.get_model(REFERENCE_MODELS[name])
+        # Always the primary: a lagging secondary would cache the old rows
+        # under the version the save just bumped
+        objects = list(model.objects.using('default').all())
+        cache.set(key, objects, _timeout())
+    else:
+        _stats[f'{name}.hit'] += 1
+
+    local = (version, objects, {obj.pk: obj for obj in objects}, now)
+    with _lock:
+        _local[name] = local
+    return local
+
+
+def get_reference_list(name):
+    """
+    Return every row of a reference collection as model instances.
+    """
+    return _load(name)[1]
+
+
+def get_reference_map(name):
+    """
+    Return a reference collection as a dict keyed by primary key.
+    """
+    return _load(name)[2]
+
+
+def get_loaded_version(name):
+    """
+    Version of this process's copy of a reference collection, re-checked
+    as often as the copy itself; for caches derived from the collection.
+    """
+    return _load(name)[0]
+
+
+def get_reference(name, pk):
+    if not pk:
+        return None
+    return get_reference_map(name).get(pk)
+
+
+def reference_cache_stats():
+    """
+    Hit/miss counters for this process, keyed by collection.
+    """
+    return {
+        name: {
+            'version': get_reference_version(name),
+            'hits': _stats[f'{name}.hit'],
+            'misses': _stats[f'{name}.miss'],
+        }
+        for name in REFERENCE_MODELS
+    }
+
+
+def _invalidate(name):
+    def receiver(sender, **kwargs):
+        bump_reference_version(name)
+    return receiver
+
+
+_receivers = {name: _invalidate(name) for name in REFERENCE_MODELS}
+
+
+def connect_signals():
+    for name, label in REFERENCE_MODELS.items():
+        model = apps.get_model(label)
+        post_save.connect(_receivers[name], sender=model, dispatch_uid=f'refdata-save-{name}')
+        post_delete.connect(_receivers[name], sender=model, dispatch_uid=f'refdata-delete-{name}')
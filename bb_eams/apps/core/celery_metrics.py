@@ -0,0 +1,115 @@
+"""
+Celery task instrumentation, published through apps.core.metrics so that
+task and web-tier series share the /metrics endpoint.
+
+The publisher stamps each message with a ``sent_at`` header, which gives
+the queue wait once a worker picks the task up. A task reports its
+throughput by calling records_processed() while it runs.
+"""
+import logging
+import threading
+import time
+from celery import signals
+from . import metrics
+
+logger = logging.getLogger('apps.tasks')
+
+_state = threading.local()
+
+
+def records_processed(count):
+    """
+    Add ``count`` to the records handled by the task running in this thread.
+    """
+    _state.records = getattr(_state, 'records', 0) + count
+
+
+def _task_name(sender=None, task=None, headers=None):
+    if task is not None:
+        return task.name
+    if headers and headers.get('task'):
+        return headers['task']
+    return getattr(sender, 'name', sender) or 'unknown'
+
+
+def on_before_publish(sender=None, headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault('sent_at', time.time())
+
+
+def on_prerun(task_id=None, task=None, **kwargs):
+    _state.started = time.perf_counter()
+    _state.records = 0
+    _state.queue_wait = None
+
+    request = task.request
+    sent_at = getattr(request, 'sent_at', None) or (request.headers or {}).get('sent_at')
+    if sent_at and not request.eta:
+        _state.queue_wait = max(0.0, time.time() - float(sent_at))
+        metrics.observe('celery_task_queue_wait_seconds', _state.queue_wait, {'task': task.name})
+
+
+def on_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = getattr(_state, 'started', None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    records = _state.records
+    name = task.name
+    _state.started = None
+
+    metrics.observe('celery_task_duration_seconds', duration, {'task': name, 'state': state})
+    if records:
+        metrics.inc('celery_task_records_total', {'task': name}, records)
+        metrics.set_gauge('celery_task_records_per_second', round(records / duration, 3) if duration else 0, {'task': name})
+    if state == 'SUCCESS':
+        metrics.set_gauge('celery_task_last_success_timestamp_seconds', int(time.time()), {'task': name})
+
+    queue_wait = _state.queue_wait
+    logger.info(
+        'task=%s id=%s state=%s duration=%.3f queue_wait=%s records=%d',
+        name, task_id, state, duration,
+        f'{queue_wait:.3f}' if queue_wait is not None else '-', records,
+    )
+    # Tasks are rare next to requests; without forcing, a worker that
+    # goes idle would sit on this run's series until its next task
+    metrics.registry.flush(force=True)
+
+
+def on_failure(sender=None, task_id=None, exception=None, **kwargs):
+    name = _task_name(sender)
+    metrics.inc('celery_task_failures_total', {'task': name, 'exception': type(exception).__name__})
+    logger.error('task=%s id=%s event=failure exception=%s error="%s"',
+                 name, task_id, type(exception).__name__, exception)
+
+
+def on_retry(sender=None, request=None, reason=None, **kwargs):
+    name = _task_name(sender)
+    metrics.inc('celery_task_retries_total', {'task': name})
+    logger.warning('task=%s id=%s event=retry reason="%s"', name, getattr(request, 'id', None), reason)
+
+
+def on_process_shutdown(**kwargs):
+    metrics.registry.flush(force=True)
+
+
+def connect_signals():
+    signals.before_task_publish.connect(on_before_publish, dispatch_uid='metrics-publish')
+    signals.task_prerun.connect(on_prerun, dispatch_uid='metrics-prerun')
+    signals.task_postrun.connect(on_postrun, dispatch_uid='metrics-postrun')
+    signals.task_failure.connect(on_failure, dispatch_uid='metrics-failure')
+    signals.task_retry.connect(on_retry, dispatch_uid='metrics-retry')
+    signals.worker_process_shutdown.connect(on_process_shutdown, dispatch_uid='metrics-shutdown')
+
+
+metrics.define('celery_task_duration_seconds', 'histogram', 'Task run time by task and final state.', metrics.TASK_BUCKETS)
+metrics.define('celery_task_queue_wait_seconds', 'histogram', 'Time between publish and start of a task.', metrics.TASK_BUCKETS)
+metrics.define('celery_task_records_total', 'counter', 'Records processed by task.')
+metrics.define('celery_task_records_per_second', 'gauge', 'Throughput of the last run of each task.')
+metrics.define('celery_task_last_success_timestamp_seconds', 'gauge', 'Unix time of the last successful run of each task.')
+metrics.define('celery_task_failures_total', 'counter', 'Task failures by task and exception type.')
+metrics.define('celery_task_retries_total', 'counter', 'Task retries by task.')
+metrics.define('device_sync_lag_seconds', 'gauge', 'Seconds since the device was last synced, measured at each sync attempt.')
+metrics.define('device_last_sync_timestamp_seconds', 'gauge', 'Unix time of the last successful sync of each device.')
+metrics.define('device_sync_failures_total', 'counter', 'Failed sync attempts by device.')
+metrics.define('device_health_state', 'gauge', 'Current health state of each polled device (1 for the active state).')
@@ -0,0 +1,179 @@
+"""
+Idempotency keys for write endpoints that clients retry.
+
+A client sends ``Idempotency-Key: <unique value>`` with a POST. The
+first request with a key runs normally and its response is kept in the
+cache for IDEMPOTENCY_KEY_TTL seconds; a retry with the same key and
+body gets that response back from one cache read, marked with
+``Idempotent-Replayed: true``, without running the view. A retry while
+the first attempt is still running gets 409, and reusing a key with a
+different body gets 422. Server errors are not stored, so they can be
+retried.
+
+Keys are scoped to the view and the authenticated user.
+IdempotencyMixin applies this to DRF views; begin() and finish() are
+the same steps for code outside DRF, such as the device punch endpoint.
+"""
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.http.request import RawPostDataException
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from . import metrics
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Responses that depend on timing rather than the request, so a retry
+# should run again
+UNSTORED_STATUSES = (status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed.'
+    default_code = 'idempotency_conflict'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used with a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+class _Replay(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+def _ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400)
+
+
+def _lock_ttl():
+    return getattr(settings, 'IDEMPOTENCY_LOCK_TTL', 60)
+
+
+def valid_key(key):
+    return len(key) <= MAX_KEY_LENGTH and key.isprintable()
+
+
+def cache_key(scope, key):
+    return 'idempotency:' + hashlib.sha256(f'{scope}:{key}'.encode()).hexdigest()
+
+
+def fingerprint(method, path, body):
+    return hashlib.sha256(method.encode() + b' ' + path.encode() + b'\n' + body).hexdigest()
+
+
+def _record(view, result):
+    metrics.inc('idempotency_requests_total', {'view': view, 'result': result})
+
+
+def begin(key, request_fingerprint, view):
+    """
+    Claim ``key`` for a request. Returns None when the request should
+    run, or the stored ``{'status', 'data'}`` to replay. Raises
+    IdempotencyConflict or IdempotencyKeyReused.
+    """
+    entry = cache.get(key)
+    if entry is None and cache.add(key, {'fingerprint': request_fingerprint, 'pending': True}, _lock_ttl()):
+        _record(view, 'new')
+        return None
+    entry = entry or cache.get(key)
+    if entry is None:
+        # Expired between add() and get(); let the client retry
+        _record(view, 'conflict')
+        raise IdempotencyConflict()
+    if entry['fingerprint'] != request_fingerprint:
+        _record(view, 'mismatch')
+        raise IdempotencyKeyReused()
+    if entry.get('pending'):
+        _record(view, 'conflict')
+        raise IdempotencyConflict()
+    _record(view, 'replayed')
+    return entry
+
+
+def finish(key, request_fingerprint, status_code, data):
+    """
+    Store the response of a request begin() let run, or free the key
+    when it should not be replayed.
+    """
+    if status_code >= 500 or status_code in UNSTORED_STATUSES:
+        cache.delete(key)
+    else:
+        cache.set(key, {'fingerprint': request_fingerprint, 'status': status_code, 'data': data}, _ttl())
+
+
+class IdempotencyMixin:
+    """
+    Honour Idempotency-Key on ``idempotent_methods``. Requests without the
+    header are processed as before.
+    """
+    idempotent_methods = ('POST',)
+
+    def get_idempotency_scope(self, request):
+        return f'{type(self).__name__}:{getattr(request.user, "pk", None) or "anonymous"}'
+
+    def _idempotency_state(self, request):
+        key = request.headers.get(HEADER)
+        if not key or request.method not in self.idempotent_methods:
+            return None
+        if not valid_key(key):
+            raise ValidationError({HEADER: f'Must be at most {MAX_KEY_LENGTH} printable characters.'})
+        try:
+            # Hashing the raw body does not parse the request
+            body = request._request.body
+        except RawPostDataException:
+            body = json.dumps(request.data, sort_keys=True, default=str).encode()
+        return (
+            cache_key(self.get_idempotency_scope(request), key),
+            fingerprint(request.method, request.get_full_path(), body),
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._idempotency = None
+        state = self._idempotency_state(request)
+        if state is None:
+            return
+
+        entry = begin(*state, type(self).__name__)
+        if entry is None:
+            self._idempotency = state
+            return
+        response = Response(entry['data'], status=entry['status'])
+        response[REPLAYED_HEADER] = 'true'
+        raise _Replay(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _Replay):
+            return exc.response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            # Unhandled errors never reach finalize_response; free the key
+            state, self._idempotency = getattr(self, '_idempotency', None), None
+            if state:
+                cache.delete(state[0])
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        state = getattr(self, '_idempotency', None)
+        if state is None:
+            return response
+        self._idempotency = None
+        if not hasattr(response, 'data'):
+            cache.delete(state[0])
+        else:
+            finish(*state, response.status_code, response.data)
+        return response
+
+
+metrics.define('idempotency_requests_total', 'counter', 'Requests carrying an Idempotency-Key by view and outcome.')
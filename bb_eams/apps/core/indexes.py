@@ -0,0 +1,292 @@
+"""
+Index reconciliation for the MongoDB collections.
+
+djongo has no migrations here, so nothing creates the indexes the models
+declare. declared_indexes() derives them from the models (primary key,
+unique fields, unique_together, Meta.indexes) plus EXTRA_INDEXES for
+access paths the models cannot express, such as TTL expiry.
+reconcile() diffs them against the live indexes, and explain_catalog()
+runs the hot queries through explain() to flag collection scans.
+"""
+import uuid
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from .mongo import get_collection, get_pooled_database
+
+APP_LABELS = ('accounts', 'attendance', 'leave', 'core')
+
+
+class IndexSpec:
+    def __init__(self, collection, keys, unique=False, ttl_days=None, source=''):
+        self.collection = collection
+        self.keys = [(field, direction) for field, direction in keys]
+        self.unique = unique
+        self.ttl_days = ttl_days
+        self.source = source
+
+    @property
+    def name(self):
+        name = '_'.join(f'{field}_{direction}' for field, direction in self.keys)
+        return f'{name}_uniq' if self.unique else name
+
+    @property
+    def options(self):
+        options = {'name': self.name, 'background': True}
+        if self.unique:
+            options['unique'] = True
+        if self.ttl_days:
+            options['expireAfterSeconds'] = int(timedelta(days=self.ttl_days).total_seconds())
+        return options
+
+    def __repr__(self):
+        flags = ' unique' if self.unique else ''
+        flags += f' ttl={self.ttl_days}d' if self.ttl_days else ''
+        return f'{self.collection}{self.keys}{flags}'
+
+
+def _ttl_days(collection):
+    return getattr(settings, 'MONGO_TTL_DAYS', {}).get(collection) or None
+
+
+# Access paths not declared on the models
+EXTRA_INDEXES = (
+    ('audit_logs', [('user_id', ASCENDING), ('created_at', DESCENDING)]),
+    ('audit_logs', [('resource_type', ASCENDING), ('resource_id', ASCENDING)]),
+    ('audit_logs', [('created_at', ASCENDING)]),
+    ('notifications', [('user_id', ASCENDING), ('status', ASCENDING), ('created_at', DESCENDING)]),
+    ('notifications', [('created_at', ASCENDING)]),
+    ('biometric_templates', [('template_hash', ASCENDING)]),
+)
+# Collections whose created_at index expires documents (see MONGO_TTL_DAYS)
+TTL_COLLECTIONS = ('audit_logs', 'notifications')
+
+
+def _model_indexes(model):
+    meta = model._meta
+    table = meta.db_table
+    columns = {field.name: field.column for field in meta.concrete_fields}
+    specs = [IndexSpec(table, [(meta.pk.column, ASCENDING)], unique=True, source='primary key')]
+
+    for field in meta.concrete_fields:
+        if field.unique and not field.primary_key:
+            specs.append(IndexSpec(table, [(field.column, ASCENDING)], unique=True, source=f'{field.name} unique'))
+    for fields in meta.unique_together:
+        specs.append(IndexSpec(
+            table, [(columns[name], ASCENDING) for name in fields], unique=True, source='unique_together',
+        ))
+    for index in meta.indexes:
+        specs.append(IndexSpec(table, [
+            (columns[name.lstrip('-')], DESCENDING if name.startswith('-') else ASCENDING)
+            for name in index.fields
+        ], source='Meta.indexes'))
+    return specs
+
+
+def declared_indexes():
+    specs = []
+    for model in apps.get_models():
+        if model._meta.app_label in APP_LABELS and model._meta.managed:
+            specs.extend(_model_indexes(model))
+    for collection, keys in EXTRA_INDEXES:
+        ttl = _ttl_days(collection) if collection in TTL_COLLECTIONS and keys == [('created_at', ASCENDING)] else None
+        specs.append(IndexSpec(collection, keys, ttl_days=ttl, source='EXTRA_INDEXES'))
+
+    # A unique or TTL index on the same keys also serves plain lookups
+    unique = {(spec.collection, tuple(spec.keys)) for spec in specs if spec.unique}
+    seen = set()
+    result = []
+    for spec in specs:
+        key = (spec.collection, tuple(spec.keys))
+        if key in seen or (not spec.unique and key in unique):
+            continue
+        seen.add(key)
+        result.append(spec)
+    return result
+
+
+def live_indexes(collection, using='default'):
+    """
+    ``{key tuple: index info}`` for every index on ``collection``.
+    """
+    info = get_pooled_database(using)[collection].index_information()
+    return {
+        tuple((field, int(direction)) for field, direction in index['key']): {'name': name, **index}
+        for name, index in info.items()
+    }
+
+
+def duplicate_keys(collection, keys, using='default', limit=5):
+    """
+    Up to ``limit`` key values shared by several documents of
+    ``collection``, i.e. what would make a unique index on ``keys`` fail.
+    """
+    pipeline = [
+        {'$group': {'_id': {field: f'${field}' for field, _ in keys}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+        {'$limit': limit},
+    ]
+    return list(get_pooled_database(using)[collection].aggregate(pipeline, allowDiskUse=True))
+
+
+def _replace_index(database, collection, current, spec, using='default'):
+    """
+    Swap ``current`` for ``spec`` on the same keys. MongoDB allows one
+    index per key pattern, so the old one has to go first; a unique
+    build that duplicates would block is refused beforehand, and a build
+    failing anyway puts the old index back.
+    """
+    if spec.unique:
+        duplicates = duplicate_keys(collection, spec.keys, using)
+        if duplicates:
+            raise OperationFailure(
+                f"{len(duplicates)}+ duplicate keys, e.g. {duplicates[0]['_id']}; left {current['name']} in place"
+            )
+    database[collection].drop_index(current['name'])
+    try:
+        database[collection].create_index(spec.keys, **spec.options)
+    except OperationFailure:
+        restore = {name: current[name] for name in ('unique', 'expireAfterSeconds', 'sparse') if name in current}
+        database[collection].create_index(current['key'], name=current['name'], **restore)
+        raise
+
+
+def reconcile(apply=False, drop_unknown=False, using='default'):
+    """
+    Compare declared and live indexes collection by collection. Returns a
+    list of ``(action, collection, detail)`` rows; with ``apply`` the
+    missing indexes are created, TTLs adjusted and, with
+    ``drop_unknown``, undeclared indexes dropped.
+    """
+    database = get_pooled_database(using)
+    by_collection = {}
+    for spec in declared_indexes():
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    report = []
+    for collection, specs in sorted(by_collection.items()):
+        live = live_indexes(collection, using)
+        declared_keys = set()
+        for spec in specs:
+            keys = tuple(spec.keys)
+            declared_keys.add(keys)
+            current = live.get(keys)
+            expire = spec.options.get('expireAfterSeconds')
+
+            if current is None:
+                action = 'create'
+            elif bool(current.get('unique')) != spec.unique:
+                action = 'conflict'
+            elif current.get('expireAfterSeconds') != expire:
+                action = 'ttl'
+            else:
+                report.append(('ok', collection, repr(spec)))
+                continue
+
+            detail = repr(spec)
+            if apply:
+                try:
+                    if action == 'create':
+                        database[collection].create_index(spec.keys, **spec.options)
+                    elif action == 'ttl' and expire is not None and 'expireAfterSeconds' in current:
+                        database.command('collMod', collection, index={
+                            'keyPattern': dict(spec.keys), 'expireAfterSeconds': expire,
+                        })
+                    else:
+                        _replace_index(database, collection, current, spec, using)
+                    action = f'{action}d' if action.endswith('e') else f'{action} fixed'
+                except OperationFailure as e:
+                    # Typically duplicate keys blocking a unique index
+                    action = 'failed'
+                    detail = f'{detail}: {e}'
+            report.append((action, collection, detail))
+
+        for keys, index in live.items():
+            if keys in declared_keys or index['name'] == '_id_':
+                continue
+            action = 'unknown'
+            if apply and drop_unknown:
+                database[collection].drop_index(index['name'])
+                action = 'dropped'
+            report.append((action, collection, f"{index['name']} {list(keys)}"))
+    return report
+
+
+def _prep(model, name, value, using='default'):
+    return model._meta.get_field(name).get_db_prep_value(value, connections[using], prepared=False)
+
+
+def query_catalog():
+    """
+    The hot queries as ``(name, model, filter, sort)``, with placeholder
+    values converted the way the ORM stores them.
+    """
+    from apps.accounts.models import BiometricTemplate, EmployeeDetail, ReportingLine, User, UserSearchEntry
+    from apps.attendance.models import Assignment, AttendanceRecord, DailyAttendance
+    from apps.core.models import AuditLog, Notification
+    from apps.leave.models import LeaveRequest
+
+    user_id, now, today = uuid.uuid4(), timezone.now(), timezone.localdate()
+    p = _prep
+    day = {'$gte': p(AttendanceRecord, 'timestamp', now - timedelta(days=1)), '$lt': p(AttendanceRecord, 'timestamp', now)}
+    return [
+        ('punches for user/day', AttendanceRecord,
+         {'user_id': p(AttendanceRecord, 'user_id', user_id), 'timestamp': day}, [('timestamp', ASCENDING)]),
+        ('attendance history', AttendanceRecord,
+         {'user_id': p(AttendanceRecord, 'user_id', user_id)}, [('timestamp', DESCENDING)]),
+        ('punches for day (rollup)', AttendanceRecord, {'timestamp': day}, None),
+        ('device re-delivery check', AttendanceRecord,
+         {'device_id': p(AttendanceRecord, 'device_id', user_id), 'timestamp': {'$in': [day['$gte']]}}, None),
+        ('daily row for user/date', DailyAttendance,
+         {'user_id': p(DailyAttendance, 'user_id', user_id), 'date': p(DailyAttendance, 'date', today)}, None),
+        ('daily list for date', DailyAttendance, {'date': p(DailyAttendance, 'date', today)}, None),
+        ('active assignment', Assignment,
+         {'user_id': p(Assignment, 'user_id', user_id), 'from_date': {'$lte': p(Assignment, 'from_date', today)}}, None),
+        ('users by department', User, {'department_id': p(User, 'department_id', user_id)}, None),
+        ('user by employee id', User, {'employee_id': 'EMP0000001'}, None),
+        ('user search prefix', UserSearchEntry,
+         {'token': {'$gte': 'abe', '$lt': 'abe\uffff'}, 'active': True}, [('token', ASCENDING)]),
+        ('team members', EmployeeDetail, {'manager_id': p(EmployeeDetail, 'manager_id', user_id)}, None),
+        ('team subtree', ReportingLine,
+         {'ancestor_id': p(ReportingLine, 'ancestor_id', user_id), 'depth': {'$gte': 1}}, None),
+        ('leave for user', LeaveRequest,
+         {'user_id': p(LeaveRequest, 'user_id', user_id), 'status': 'pending'}, None),
+        ('approved leave on date', LeaveRequest,
+         {'start_date': {'$lte': p(LeaveRequest, 'start_date', today)},
+          'end_date': {'$gte': p(LeaveRequest, 'end_date', today)}, 'status': 'approved'}, None),
+        ('audit trail for user', AuditLog,
+         {'user_id': p(AuditLog, 'user_id', user_id)}, [('created_at', DESCENDING)]),
+        ('unread notifications', Notification,
+         {'user_id': p(Notification, 'user_id', user_id), 'status': 'sent'}, [('created_at', DESCENDING)]),
+        ('templates for user', BiometricTemplate, {'user_id': p(BiometricTemplate, 'user_id', user_id)}, None),
+    ]
+
+
+def _stages(plan):
+    stages = [plan.get('stage')]
+    for child in ('inputStage', 'outerStage', 'innerStage'):
+        if child in plan:
+            stages.extend(_stages(plan[child]))
+    for child in plan.get('inputStages', ()):
+        stages.extend(_stages(child))
+    return stages
+
+
+def explain_catalog(using='default'):
+    """
+    explain() every catalog query. Returns ``(name, collection, stages,
+    collection_scan)`` rows.
+    """
+    rows = []
+    for name, model, query, sort in query_catalog():
+        cursor = get_collection(model, using).find(query).limit(100)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+        stages = [stage for stage in _stages(plan) if stage]
+        rows.append((name, model._meta.db_table, stages, 'COLLSCAN' in stages))
+    return rows
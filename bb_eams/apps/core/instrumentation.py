@@ -0,0 +1,163 @@
+"""
+Per-request timing state shared by RequestMetricsMiddleware, the DRF
+serializer hook, the pymongo command listener and the application
+caches.
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pymongo import monitoring
+from . import metrics
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.query_shapes = Counter()
+
+    def wrap_query(self, execute, sql, params, many, context):
+        """
+        connection.execute_wrapper() hook. Placeholders are kept in ``sql``,
+        so the string itself identifies the query shape.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.query_shapes[sql] += 1
+
+    def record_command(self, shape, duration):
+        """
+        A MongoDB command sent by the shared pymongo client.
+        """
+        self.db_time += duration
+        self.queries += 1
+        self.query_shapes[shape] += 1
+
+
+def current_stats():
+    return _current.get()
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+# Connection upkeep rather than queries
+IGNORED_COMMANDS = frozenset({'endSessions', 'hello', 'isMaster', 'ismaster', 'ping', 'saslStart', 'saslContinue'})
+
+
+def command_shape(event):
+    """
+    ``"<command> <collection> <filter keys>"``, which like the SQL of a
+    djongo query identifies a query without its values.
+    """
+    command = event.command
+    # getMore names the cursor; the collection is a separate field
+    collection = command.get('collection') if event.command_name == 'getMore' else command.get(event.command_name)
+    filter = command.get('filter') or command.get('q') or {}
+    if event.command_name in ('update', 'delete'):
+        statements = command.get('updates') or command.get('deletes') or [{}]
+        filter = statements[0].get('q', {})
+    elif event.command_name == 'aggregate':
+        filter = next((stage['$match'] for stage in command.get('pipeline', ()) if '$match' in stage), {})
+    return f"mongo {event.command_name} {collection} {sorted(filter) if isinstance(filter, dict) else ''}".rstrip()
+
+
+class CommandListener(monitoring.CommandListener):
+    """
+    Counts the commands of the shared pymongo client (apps.core.mongo)
+    into the RequestStats of the request or benchmark in progress, the
+    way execute_wrapper() counts djongo's queries. Events are delivered
+    on the thread that sent the command, so the context variable is the
+    caller's.
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        stats = _current.get()
+        if stats is not None and event.command_name not in IGNORED_COMMANDS:
+            self._pending[(event.connection_id, event.request_id)] = (stats, command_shape(event))
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is not None:
+            stats, shape = pending
+            stats.record_command(shape, event.duration_micros / 1e6)
+
+
+command_listener = CommandListener()
+
+
+def record_cache_access(cache_name, hit):
+    stats = _current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+    metrics.inc('cache_requests_total', {'cache': cache_name, 'result': 'hit' if hit else 'miss'})
+
+
+@contextmanager
+def serializing():
+    """
+    Count the block as serializer time of the request in progress; for
+    code that turns rows into primitives without Serializer.data.
+    """
+    stats = _current.get()
+    if stats is None or stats.serializer_depth:
+        yield
+        return
+    stats.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_depth -= 1
+        stats.serializer_time += time.perf_counter() - start
+
+
+def _timed(fget):
+    def data(self):
+        with serializing():
+            return fget(self)
+    data.timed = True
+    return data
+
+
+def install_serializer_timing():
+    """
+    Time Serializer.data / ListSerializer.data, where DRF turns instances
+    into primitives, for the request in progress. Nested serializers only
+    count once.
+    """
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        prop = cls.__dict__['data']
+        if not getattr(prop.fget, 'timed', False):
+            cls.data = property(_timed(prop.fget))
@@ -0,0 +1,79 @@
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router
+from apps.attendance.models import AttendanceRecord
+from apps.attendance.repositories import attendance_records
+from apps.core import routing
+from apps.core.mongo import get_pooled_database
+
+PROBE_COLLECTION = 'routing_probe'
+
+
+class Command(BaseCommand):
+    help = ('Check that reporting reads go to the secondary-preferred alias, that recent writers stay '
+            'on the primary, and measure how long a write takes to become readable there. Run it '
+            'against a local replica set (mongod --replSet) to exercise the secondaries.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=10.0,
+                            help='Seconds to wait for the probe write to reach the reporting alias')
+
+    def handle(self, *args, **options):
+        if not routing.reporting_configured():
+            raise CommandError(f'No {routing.REPORTING_ALIAS!r} database is configured')
+        failures = []
+
+        for alias in (routing.DEFAULT_ALIAS, routing.REPORTING_ALIAS):
+            client = get_pooled_database(alias).client
+            self.stdout.write(f'{alias:<10} read preference {client.read_preference.name}, '
+                              f'topology {client.topology_description.topology_type_name}')
+
+        self.stdout.write('\nRouting:')
+        failures += self.expect('ORM reads outside a block', router.db_for_read(AttendanceRecord), routing.DEFAULT_ALIAS)
+        with routing.reporting_reads():
+            failures += self.expect('ORM reads in reporting_reads()', router.db_for_read(AttendanceRecord),
+                                    routing.REPORTING_ALIAS)
+            failures += self.expect('ORM writes in reporting_reads()', router.db_for_write(AttendanceRecord),
+                                    routing.DEFAULT_ALIAS)
+            failures += self.expect('Repository reads in reporting_reads()',
+                                    attendance_records.collection.read_preference.name,
+                                    get_pooled_database(routing.REPORTING_ALIAS).client.read_preference.name)
+
+        writer = uuid.uuid4()
+        routing.record_writes([writer])
+        with routing.reporting_reads(writer) as alias:
+            failures += self.expect('Reads right after a punch', alias, routing.DEFAULT_ALIAS)
+
+        lag = self.replication_lag(options['timeout'])
+        if lag is None:
+            failures.append('probe')
+            self.stdout.write(self.style.ERROR(f'\nProbe write not readable on {routing.REPORTING_ALIAS} '
+                                               f'after {options["timeout"]}s'))
+        else:
+            self.stdout.write(f'\nProbe write readable on {routing.REPORTING_ALIAS} after {lag * 1000:.1f}ms')
+
+        if failures:
+            raise CommandError(f'{len(failures)} routing checks failed')
+        self.stdout.write(self.style.SUCCESS('Read routing works'))
+
+    def expect(self, label, actual, expected):
+        ok = actual == expected
+        style = self.style.SUCCESS if ok else self.style.ERROR
+        self.stdout.write(style(f'  {"ok" if ok else "FAIL":<5} {label}: {actual}'))
+        return [] if ok else [label]
+
+    def replication_lag(self, timeout):
+        primary = get_pooled_database(routing.DEFAULT_ALIAS)[PROBE_COLLECTION]
+        reporting = get_pooled_database(routing.REPORTING_ALIAS)[PROBE_COLLECTION]
+        probe = {'_id': uuid.uuid4().hex}
+        primary.insert_one(probe)
+        started = time.monotonic()
+        try:
+            while time.monotonic() - started < timeout:
+                if reporting.find_one(probe) is not None:
+                    return time.monotonic() - started
+                time.sleep(0.01)
+            return None
+        finally:
+            primary.delete_one(probe)
@@ -0,0 +1,77 @@
+import json
+import platform
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.core.benchmarks import SIZES, BenchmarkSuite, Fixtures, compare_with_baseline, use_database
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database and time the attendance and leave hot paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(SIZES), default='1k', help='Number of seeded employees')
+        parser.add_argument('--days', type=int, default=5, help='Days of punch history to seed')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--case', action='append', dest='cases', help='Only run the named case (repeatable)')
+        parser.add_argument('--database-name', default='bb_eams_bench', help='Database to (re)create for the run')
+        parser.add_argument('--mongomock', action='store_true', help='Run against an in-memory mongomock stand-in')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', help='Fail when results regress against this JSON file')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 slowdown over the baseline')
+
+    def handle(self, *args, **options):
+        if options['database_name'] == settings.DATABASES['default']['NAME']:
+            raise CommandError('Refusing to benchmark against the configured application database')
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        use_database(options['database_name'], mongomock=options['mongomock'])
+
+        employees = SIZES[options['size']]
+        self.stdout.write(f"Seeding {employees} employees x {options['days']} days into {options['database_name']}...")
+        fixtures = Fixtures(employees, options['days'], seed=options['seed']).seed()
+
+        def progress(name, result):
+            self.stdout.write(
+                f"{name:<20} p50={result['p50_ms']:>9.3f}ms p95={result['p95_ms']:>9.3f}ms "
+                f"{result['per_second']:>9.1f}/s queries={result['queries']}"
+            )
+
+        results = BenchmarkSuite(fixtures, options['iterations']).run(only=options['cases'], progress=progress)
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'size': options['size'],
+                'days': options['days'],
+                'iterations': options['iterations'],
+                'seed': options['seed'],
+                'backend': 'mongomock' if options['mongomock'] else 'mongodb',
+                'python': platform.python_version(),
+                'commit': self.git_commit(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        if baseline:
+            regressions = compare_with_baseline(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Benchmark regressions:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+
+    def git_commit(self):
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, cwd=settings.BASE_DIR
+            ).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
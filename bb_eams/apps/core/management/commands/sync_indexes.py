@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.core.indexes import explain_catalog, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Create missing MongoDB indexes declared by the models and flag hot queries that scan collections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report differences without changing anything')
+        parser.add_argument('--check', action='store_true',
+                            help='Dry run that fails on any missing index or collection scan (for CI)')
+        parser.add_argument('--drop-unknown', action='store_true', help='Drop live indexes no model declares')
+        parser.add_argument('--skip-explain', action='store_true')
+        parser.add_argument('--verbose-ok', action='store_true', help='Also list indexes that are already in place')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        apply = not (options['dry_run'] or options['check'])
+        problems = 0
+
+        for action, collection, detail in reconcile(apply, options['drop_unknown'], options['database']):
+            if action == 'ok' and not options['verbose_ok']:
+                continue
+            if action in ('create', 'conflict', 'ttl', 'failed'):
+                problems += 1
+                style = self.style.ERROR if action == 'failed' else self.style.WARNING
+            else:
+                style = self.style.SUCCESS if action != 'ok' else str
+            self.stdout.write(style(f'{action:<15} {collection:<22} {detail}'))
+
+        if not options['skip_explain']:
+            self.stdout.write('\nQuery plans:')
+            for name, collection, stages, collection_scan in explain_catalog(options['database']):
+                if collection_scan:
+                    problems += 1
+                style = self.style.ERROR if collection_scan else self.style.SUCCESS
+                label = 'COLLSCAN' if collection_scan else 'indexed'
+                self.stdout.write(style(f'{label:<15} {collection:<22} {name}: {" <- ".join(stages)}'))
+
+        if problems and options['check']:
+            raise CommandError(f'{problems} index problems found')
+        if problems:
+            self.stdout.write(self.style.WARNING(f'\n{problems} problems remain'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\nIndexes match the models'))
@@ -0,0 +1,194 @@
+"""
+Counters, gauges and histograms shared by the web and Celery tiers.
+
+Each process aggregates observations in memory and flushes the deltas to
+the Django cache at most every METRICS_FLUSH_INTERVAL seconds, using
+atomic increments. The /metrics endpoint renders the merged totals in the
+Prometheus text format, so a scrape sees every gunicorn and Celery worker
+rather than whichever process answered it.
+
+The series names live in an append-only index that processes extend
+concurrently: each new name takes the next slot from an atomic counter,
+and a per-series marker keeps it from being registered again.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+TASK_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+# Histogram sums are stored as integers so they can be incremented
+# atomically; this is their fixed-point scale.
+SUM_SCALE = 1000000
+INDEX_KEY = 'metrics:index'
+INDEX_SIZE_KEY = INDEX_KEY + ':size'
+
+_definitions = {}
+
+
+def define(name, kind, help, buckets=None):
+    _definitions[name] = (kind, help, buckets)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in sorted(labels.items())
+    )
+    return '{' + pairs + '}'
+
+
+def _key(series):
+    return 'metrics:series:' + hashlib.md5(series.encode()).hexdigest()
+
+
+def _marker(series):
+    return 'metrics:indexed:' + hashlib.md5(series.encode()).hexdigest()
+
+
+def _slot(number):
+    return f'{INDEX_KEY}:{number}'
+
+
+def _incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def _register(series):
+    """
+    Add the names in ``series`` that are not indexed yet. Two processes
+    registering the same new name at once both append it, which
+    index() tolerates; neither can drop a name the other added.
+    """
+    markers = {_marker(name): name for name in series}
+    indexed = cache.get_many(list(markers))
+    for marker, name in markers.items():
+        if marker not in indexed:
+            cache.set(_slot(_incr(INDEX_SIZE_KEY)), name, None)
+            cache.set(marker, True, None)
+
+
+def index():
+    """
+    Every series name flushed by any process.
+    """
+    size = cache.get(INDEX_SIZE_KEY) or 0
+    return set(cache.get_many([_slot(number) for number in range(1, size + 1)]).values())
+
+
+def _format(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._gauges = {}
+        self._last_flush = time.monotonic()
+
+    def inc(self, name, labels=None, amount=1):
+        with self._lock:
+            self._counters[name + _labels(labels)] += int(amount)
+
+    def set(self, name, value, labels=None):
+        with self._lock:
+            self._gauges[name + _labels(labels)] = value
+
+    def observe(self, name, value, labels=None):
+        buckets = _definitions[name][2] or LATENCY_BUCKETS
+        labels = dict(labels or {})
+        with self._lock:
+            for bound in buckets:
+                if value <= bound:
+                    self._counters[f'{name}_bucket' + _labels({**labels, 'le': _format(float(bound))})] += 1
+            self._counters[f'{name}_bucket' + _labels({**labels, 'le': '+Inf'})] += 1
+            self._counters[f'{name}_sum' + _labels(labels)] += int(value * SUM_SCALE)
+            self._counters[f'{name}_count' + _labels(labels)] += 1
+
+    def flush(self, force=False):
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if not force and time.monotonic() - self._last_flush < interval:
+            return
+        with self._lock:
+            counters, self._counters = self._counters, defaultdict(int)
+            gauges, self._gauges = self._gauges, {}
+            self._last_flush = time.monotonic()
+        if not counters and not gauges:
+            return
+
+        try:
+            _register(set(counters) | set(gauges))
+            for name, delta in counters.items():
+                _incr(_key(name), delta)
+            if gauges:
+                cache.set_many({_key(name): value for name, value in gauges.items()}, None)
+        except Exception:
+            # Metrics must never take a request or task down with them
+            logger.warning('Failed to flush metrics', exc_info=True)
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+set_gauge = registry.set
+
+
+def _family(series):
+    sample = series.split('{', 1)[0]
+    for suffix in ('_bucket', '_sum', '_count'):
+        if sample.endswith(suffix) and sample[:-len(suffix)] in _definitions:
+            return sample[:-len(suffix)], sample
+    return sample, sample
+
+
+def render_prometheus():
+    """
+    Render every flushed series in the Prometheus text exposition format.
+    """
+    registry.flush(force=True)
+    names = index()
+    values = cache.get_many([_key(series) for series in names])
+
+    families = defaultdict(list)
+    for series in sorted(names):
+        value = values.get(_key(series))
+        if value is None:
+            continue
+        family, sample = _family(series)
+        if sample.endswith('_sum') and family != sample:
+            value = value / SUM_SCALE
+        families[family].append(f'{series} {_format(value)}')
+
+    lines = []
+    for family in sorted(families):
+        kind, help, _ = _definitions.get(family, ('untyped', '', None))
+        lines.append(f'# HELP {family} {help}')
+        lines.append(f'# TYPE {family} {kind}')
+        lines.extend(families[family])
+    return '\n'.join(lines) + '\n'
+
+
+define('http_request_duration_seconds', 'histogram', 'Wall time per request by view.')
+define('http_request_db_seconds', 'histogram', 'Database time per request by view.')
+define('http_request_serializer_seconds', 'histogram', 'DRF serializer time per request by view.')
+define('http_request_queries', 'histogram', 'Database queries per request by view.', COUNT_BUCKETS)
+define('http_repeated_query_total', 'counter', 'Requests that repeated one query shape past the N+1 threshold.')
+define('cache_requests_total', 'counter', 'Application cache lookups by cache and result.')
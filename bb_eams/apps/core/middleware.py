@@ -1,7 +1,75 @@
 import json
+import logging
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
+from . import metrics
+from .instrumentation import end_request, start_request
 from .models import AuditLog
 
+logger = logging.getLogger(__name__)
+
+class RequestMetricsMiddleware:
+    """
+    Records wall, database and serializer time, query count and cache hits
+    per view. Returns them in a Server-Timing header, feeds the /metrics
+    histograms, and warns when one query shape repeats past
+    REQUEST_REPEATED_QUERY_THRESHOLD (usually an N+1).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats, token = start_request()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.wrap_query))
+                response = self.get_response(request)
+        finally:
+            end_request(token)
+        total = time.perf_counter() - start
+
+        view = self.get_view_name(request)
+        metrics.observe('http_request_duration_seconds', total, {
+            'view': view, 'method': request.method, 'status': response.status_code,
+        })
+        metrics.observe('http_request_db_seconds', stats.db_time, {'view': view})
+        metrics.observe('http_request_serializer_seconds', stats.serializer_time, {'view': view})
+        metrics.observe('http_request_queries', stats.queries, {'view': view})
+        self.check_repeated_queries(request, view, stats)
+        metrics.registry.flush()
+
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+            f'serializer;dur={stats.serializer_time * 1000:.1f}',
+            f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+        ])
+        return response
+
+    def get_view_name(self, request):
+        match = request.resolver_match
+        if match is None:
+            return 'unresolved'
+        return match.view_name or match.route
+
+    def check_repeated_queries(self, request, view, stats):
+        threshold = getattr(settings, 'REQUEST_REPEATED_QUERY_THRESHOLD', 10)
+        repeated = [(sql, count) for sql, count in stats.query_shapes.items() if count > threshold]
+        if not repeated:
+            return
+        metrics.inc('http_repeated_query_total', {'view': view})
+        for sql, count in repeated:
+            logger.warning(
+                'Repeated query: view=%s path=%s count=%d sql=%.300s',
+                view, request.path, count, sql,
+            )
+
 class AuditLogMiddleware(MiddlewareMixin):
     """
     Middleware to log all requests for auditing
@@ -0,0 +1,164 @@
+import hashlib
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from .cache import get_reference_list, get_reference_version
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value else None
+
+
+def queryset_validator(queryset, variant=''):
+    """
+    Compute an (etag, last_modified) pair for a queryset from the newest
+    updated_at and the row count, in a single aggregate query.
+
+    ``variant`` should capture anything else that shapes the response body
+    (filters, page number), so different pages never share an ETag.
+
+    last_modified is always None: deleting any row but the newest leaves
+    the newest updated_at as it was, so If-Modified-Since would answer 304
+    for a list that lost a row. The row count in the ETag does catch it.
+    """
+    stats = queryset.order_by().aggregate(
+        last_modified=Max('updated_at'),
+        count=Count('id')
+    )
+    last_modified = stats['last_modified']
+    raw = f"{queryset.model._meta.label}:{stats['count']}:{last_modified.isoformat() if last_modified else ''}:{variant}"
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest()), None
+
+
+def instance_validator(instance, variant=''):
+    """
+    Compute an (etag, last_modified) pair for a single model instance.
+    """
+    updated_at = getattr(instance, 'updated_at', None)
+    raw = f"{instance._meta.label}:{instance.pk}:{updated_at.isoformat() if updated_at else ''}:{variant}"
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest()), _timestamp(updated_at)
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Attach ETag/Last-Modified to a response and require revalidation.
+    """
+    if etag and not response.has_header('ETag'):
+        response['ETag'] = etag
+    if last_modified and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match on list and retrieve actions, and
+    If-Modified-Since on retrieve, with 304 Not Modified before any
+    serializer runs.
+
+    Validators cover the view's own model plus the reference collections
+    named in ``validator_references``, for serializers that embed e.g.
+    department or device names. Other cross-collection fields (employee
+    names) do not bump the ETag.
+    """
+    validator_references = ()
+
+    def get_validator_variant(self):
+        versions = ':'.join(str(get_reference_version(name)) for name in self.validator_references)
+        return f"{self.request.get_full_path()}:{versions}"
+
+    def get_list_validator(self, queryset):
+        return queryset_validator(queryset, self.get_validator_variant())
+
+    def get_object_validator(self, instance):
+        return instance_validator(instance, self.get_validator_variant())
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = self.get_list_validator(queryset)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return set_validators(not_modified, etag, last_modified)
+
+        response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_object_validator(instance)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return set_validators(not_modified, etag, last_modified)
+
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), etag, last_modified)
+
+
+class ReferenceDataListMixin:
+    """
+    Serve the list action of a reference-data viewset from the versioned
+    reference cache (apps.core.cache) instead of the database.
+
+    Only ``page`` and the fields named in ``reference_filter_fields`` are
+    handled in memory; any other query parameter (search, ordering) falls
+    back to the regular queryset path.
+    """
+    reference_name = None
+    reference_filter_fields = ()
+
+    def can_use_reference_cache(self):
+        allowed = {'page', *self.reference_filter_fields}
+        return self.action == 'list' and not (set(self.request.query_params) - allowed)
+
+    def get_reference_objects(self):
+        objects = get_reference_list(self.reference_name)
+        for name in self.reference_filter_fields:
+            value = self.request.query_params.get(name)
+            if not value:
+                continue
+            try:
+                value = self.queryset.model._meta.get_field(name).to_python(value)
+            except ValidationError:
+                return []
+            objects = [obj for obj in objects if getattr(obj, name) == value]
+        return objects
+
+    def filter_queryset(self, queryset):
+        if self.can_use_reference_cache():
+            return self.get_reference_objects()
+        return super().filter_queryset(queryset)
+
+    def get_list_validator(self, queryset):
+        if not self.can_use_reference_cache():
+            return super().get_list_validator(queryset)
+        # The collection version changes on every save/delete, so it is a
+        # complete validator without touching the database.
+        version = get_reference_version(self.reference_name)
+        raw = f"{self.reference_name}:{version}:{self.request.get_full_path()}"
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest()), None
+
+
+class CompiledListMixin:
+    """
+    Serve the list action through ``compiled_serializer``, a
+    CompiledSerializer (apps.core.compiled): the page is read with
+    ``.values()`` and turned into dicts without model or serializer
+    instances. The response body is the same as serializer_class's.
+    """
+    compiled_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.compiled_serializer
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*compiled.projection)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.represent(page))
+        return Response(compiled.represent(queryset))
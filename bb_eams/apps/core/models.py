@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 import uuid
 from django.utils import timezone
@@ -69,5 +70,14 @@ class Policy(BaseModel):
     department_id = models.UUIDField(null=True, blank=True)
     effective_from = models.DateField()
     
+    def clean(self):
+        from .policy_engine import RULE_CLASSES, compile_rules
+        
+        if self.policy_type in RULE_CLASSES:
+            try:
+                compile_rules(self.policy_type, self.rules)
+            except ValueError as e:
+                raise ValidationError({'rules': str(e)})
+    
     class Meta:
         db_table = 'policies'
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""
+Direct access to the MongoDB collections behind djongo models.
+"""
+import os
+import threading
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from pymongo import UpdateOne
+from .instrumentation import command_listener
+from .routing import read_alias
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_database(using='default'):
+    connection = connections[using]
+    connection.ensure_connection()
+    # djongo's DatabaseWrapper.connection is the pymongo Database
+    return connection.connection
+
+
+def get_client(using='default'):
+    """
+    Process-wide pymongo client for ``using``.
+
+    djongo opens a client per Django connection, i.e. per thread and, with
+    CONN_MAX_AGE=0, per request. This one is shared so its socket pool is
+    reused. A client must not cross a fork, so children build their own.
+    Its commands are counted per request by instrumentation.command_listener.
+    """
+    pid = os.getpid()
+    entry = _clients.get(using)
+    if entry is None or entry[0] != pid:
+        with _clients_lock:
+            entry = _clients.get(using)
+            if entry is None or entry[0] != pid:
+                from djongo import database
+                options = dict(connections[using].settings_dict.get('CLIENT', {}))
+                options.setdefault('maxPoolSize', getattr(settings, 'MONGO_MAX_POOL_SIZE', 100))
+                options.setdefault('connect', False)
+                options.setdefault('event_listeners', [command_listener])
+                entry = (pid, database.MongoClient(**options))
+                _clients[using] = entry
+    return entry[1]
+
+
+def use_client(client, using='default'):
+    """
+    Install ``client`` as the shared client for ``using`` (e.g. the
+    mongomock client a benchmark run created).
+    """
+    with _clients_lock:
+        _clients[using] = (os.getpid(), client)
+
+
+def reset_clients():
+    with _clients_lock:
+        for pid, client in _clients.values():
+            if pid == os.getpid():
+                client.close()
+        _clients.clear()
+
+
+def get_pooled_database(using='default'):
+    return get_client(using)[connections[using].settings_dict['NAME']]
+
+
+def get_collection(model, using='default'):
+    return get_pooled_database(using)[model._meta.db_table]
+
+
+def to_document(instance, using='default', add=True):
+    """
+    Build the document djongo would insert for ``instance``: auto fields
+    are filled by pre_save and every value goes through the same
+    get_db_prep_save conversion as the ORM path.
+    """
+    connection = connections[using]
+    return {
+        field.column: field.get_db_prep_save(field.pre_save(instance, add), connection)
+        for field in instance._meta.concrete_fields
+    }
+
+
+def insert_instances(model, instances, using='default'):
+    """
+    insert_many() model instances without the SQL translation step.
+    Signals are not sent.
+    """
+    if not instances:
+        return 0
+    documents = [to_document(instance, using) for instance in instances]
+    get_collection(model, using).insert_many(documents, ordered=False)
+    return len(documents)
+
+
+class Repository:
+    """
+    Native reads and writes for one model, bypassing djongo's SQL
+    translation. Values are converted with the model fields' own
+    get_db_prep_value and database converters, so documents and instances
+    match what the ORM reads and writes. Signals are not sent.
+    Reads follow apps.core.routing like the ORM's do.
+    """
+    model = None
+    using = 'default'
+
+    def __init__(self, using=None):
+        if using:
+            self.using = using
+        self.fields = {field.attname: field for field in self.model._meta.concrete_fields}
+        self._converters = {}
+
+    @property
+    def connection(self):
+        # Only used for ops/features, never for queries
+        return connections[self.using]
+
+    @property
+    def collection(self):
+        # Inside reporting_reads() this is the reporting client's
+        # collection; its reads prefer secondaries, writes still go to
+        # the primary
+        return get_collection(self.model, read_alias(self.using))
+
+    def prep(self, name, value):
+        """
+        Convert a Python value for ``name`` to its stored form.
+        """
+        if value is None:
+            return None
+        return self.fields[name].get_db_prep_value(value, self.connection, prepared=False)
+
+    def projection(self, fields):
+        if not fields:
+            return {'_id': 0}
+        return {**{self.fields[name].column: 1 for name in fields}, '_id': 0}
+
+    def converters(self, field):
+        entry = self._converters.get(field.attname)
+        if entry is None:
+            col = field.get_col(self.model._meta.db_table)
+            converters = self.connection.ops.get_db_converters(col) + field.get_db_converters(self.connection)
+            entry = self._converters[field.attname] = (converters, col)
+        return entry
+
+    def from_document(self, document, fields=None):
+        # Model.from_db() takes the values of a subset in model field order
+        names = [name for name in self.fields if name in fields] if fields else list(self.fields)
+        values = []
+        for name in names:
+            field = self.fields[name]
+            value = document.get(field.column)
+            converters, col = self.converters(field)
+            for converter in converters:
+                value = converter(value, col, self.connection)
+            values.append(value)
+        return self.model.from_db(self.using, names, values)
+
+    def find(self, filter, fields=None, sort=None, limit=0):
+        cursor = self.collection.find(filter, self.projection(fields), sort=sort, limit=limit)
+        return [self.from_document(document, fields) for document in cursor]
+
+    def find_one(self, filter, fields=None, sort=None):
+        document = self.collection.find_one(filter, self.projection(fields), sort=sort)
+        return self.from_document(document, fields) if document is not None else None
+
+    def exists(self, filter):
+        return self.collection.find_one(filter, {'_id': 1}) is not None
+
+    def insert(self, instance):
+        self.collection.insert_one(to_document(instance, self.using))
+        return instance
+
+    def insert_many(self, instances):
+        return insert_instances(self.model, instances, self.using)
+
+    def key_filter(self, keys):
+        return {self.fields[name].column: self.prep(name, value) for name, value in keys.items()}
+
+    def upsert_spec(self, keys, values):
+        """
+        Filter and update document equivalent to
+        update_or_create(**keys, defaults=values).
+        """
+        now = timezone.now()
+        changes = dict(values)
+        inserted = {}
+        for name, field in self.fields.items():
+            if name in keys or name in changes:
+                continue
+            if getattr(field, 'auto_now', False):
+                changes[name] = now
+            elif getattr(field, 'auto_now_add', False):
+                inserted[name] = now
+            else:
+                inserted[name] = field.get_default()
+        update = {'$set': {self.fields[name].column: self.prep(name, value) for name, value in changes.items()}}
+        if inserted:
+            update['$setOnInsert'] = {self.fields[name].column: self.prep(name, value) for name, value in inserted.items()}
+        return self.key_filter(keys), update
+
+    def upsert_by(self, keys, values):
+        self.collection.update_one(*self.upsert_spec(keys, values), upsert=True)
+
+    def bulk_upsert(self, rows, chunk_size=1000):
+        """
+        Upsert ``(keys, values)`` rows with unordered bulk_write batches.
+        Returns the number of rows written.
+        """
+        operations = [UpdateOne(*self.upsert_spec(keys, values), upsert=True) for keys, values in rows]
+        for i in range(0, len(operations), chunk_size):
+            self.collection.bulk_write(operations[i:i + chunk_size], ordered=False)
+        return len(operations)
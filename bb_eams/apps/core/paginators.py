@@ -0,0 +1,24 @@
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from pymongo.errors import PyMongoError
+from .mongo import get_collection
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large collections. An unfiltered queryset is counted
+    from MongoDB's collection metadata (estimated_document_count) instead
+    of an exact COUNT over every document; filtered querysets still get
+    an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            try:
+                return get_collection(queryset.model, queryset.db).estimated_document_count()
+            except PyMongoError:
+                pass
+        return super().count
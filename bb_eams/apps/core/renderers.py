@@ -0,0 +1,81 @@
+"""
+JSON renderer and parser backed by orjson when it is installed.
+
+Both produce exactly what DRF's JSONRenderer/JSONParser do under the
+default settings (compact, non-ASCII kept, \\u2028/\\u2029 escaped), and
+hand anything orjson renders differently or refuses to the stdlib
+implementation: datetimes and other non-JSON types go through DRF's
+encoder, and an orjson error falls back to the parent class, so errors
+read the same too. orjson writes floats below 1e-4 out in full
+(0.00002777777777777778 for 2.777777777777778e-05) and exponents
+without padding (1e-7 for 1e-07), so output holding a number in either
+form is rendered again by the stdlib. One difference remains: NaN and
+infinities become null instead of an error. The parser leaves bodies
+with integers orjson would read as floats (19 digits or more) to the
+stdlib as well.
+"""
+import io
+import re
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+_LINE_SEPARATOR = '\u2028'.encode()
+_PARAGRAPH_SEPARATOR = '\u2029'.encode()
+# A number token, which compact output starts after ':', ',' or '[', in
+# exponent form or below 1e-4; a string that looks like one only costs
+# the fallback
+_DIVERGENT_FLOAT = re.compile(rb'(?:^|[:,\[])-?(?:\d+(?:\.\d+)?e|0\.0000)')
+# Past 64 bits orjson reads an integer as a float
+_LONG_NUMBER = re.compile(rb'\d{19}')
+
+
+def _options():
+    if orjson is None:
+        return 0
+    return orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+_OPTIONS = _options()
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or not self.compact or self.ensure_ascii or not self.strict
+                or self.encoder_class is not JSONEncoder
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if _DIVERGENT_FLOAT.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # A strict javascript subset, as JSONRenderer guarantees
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(_LINE_SEPARATOR, b'\\u2028').replace(_PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if _LONG_NUMBER.search(body):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Big integers, bad input: the stdlib decides and words the error
+            return super().parse(io.BytesIO(body), media_type, parser_context)
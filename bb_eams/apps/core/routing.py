@@ -0,0 +1,155 @@
+"""
+Read routing for reporting workloads.
+
+Reports, summaries, history listings and the nightly scans read a lot
+and can live with data a few seconds old, so they opt in to reading from
+the ``reporting`` alias, whose client prefers replica set secondaries:
+views with @reporting_view, tasks and commands with ``with
+reporting_reads():``. Inside, ReportingRouter sends ORM reads to that
+alias and Repository reads use its client too; writes always go to the
+primary. The choice lives in a context variable, so it covers exactly
+the request or block that asked for it.
+
+Check-ins record the punching user in the cache for
+READ_YOUR_WRITES_SECONDS; a view request from such a user stays on the
+primary, so their own new punch never goes missing from what they read
+back. Code that reads rows in order to write something derived from
+them (monthly totals, the rows a sync deletes) wraps that read in
+``primary_reads()`` so it never acts on a lagging secondary.
+"""
+import contextvars
+import functools
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+DEFAULT_ALIAS = 'default'
+REPORTING_ALIAS = 'reporting'
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+def reporting_configured():
+    return REPORTING_ALIAS in settings.DATABASES
+
+
+def read_alias(using=DEFAULT_ALIAS):
+    """
+    The alias reads meant for ``using`` go to in the current context.
+    """
+    alias = _read_alias.get()
+    return alias if alias and using == DEFAULT_ALIAS else using
+
+
+def _write_key(user_id):
+    return f'routing:wrote:{user_id}'
+
+
+def record_writes(user_ids):
+    """
+    Keep reads of these users' own data on the primary for a while.
+    """
+    seconds = getattr(settings, 'READ_YOUR_WRITES_SECONDS', 0)
+    keys = {_write_key(user_id): 1 for user_id in user_ids if user_id}
+    if seconds and keys:
+        cache.set_many(keys, seconds)
+
+
+def wrote_recently(user_id):
+    return bool(user_id) and cache.get(_write_key(user_id)) is not None
+
+
+@contextmanager
+def reporting_reads(user_id=None):
+    """
+    Route reads in the block to the reporting alias, unless ``user_id``
+    wrote within READ_YOUR_WRITES_SECONDS. Yields the alias used.
+    """
+    if not reporting_configured() or wrote_recently(user_id):
+        yield DEFAULT_ALIAS
+        return
+    token = _read_alias.set(REPORTING_ALIAS)
+    try:
+        yield REPORTING_ALIAS
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Route reads in the block to the primary, even inside reporting_reads().
+    """
+    token = _read_alias.set(None)
+    try:
+        yield DEFAULT_ALIAS
+    finally:
+        _read_alias.reset(token)
+
+
+def _request_user_id(request):
+    user = getattr(request, 'user', None)
+    return user.id if user is not None and user.is_authenticated else None
+
+
+def reporting_view(view):
+    """
+    Opt a read-only view in to the reporting alias for GET/HEAD/OPTIONS.
+
+    Works on APIView subclasses, where reads are routed once
+    authentication has run, and on plain view functions.
+    """
+    if isinstance(view, type):
+        initial = view.initial
+        dispatch = view.dispatch
+
+        @functools.wraps(initial)
+        def routed_initial(self, request, *args, **kwargs):
+            initial(self, request, *args, **kwargs)
+            if request.method in SAFE_METHODS:
+                self._reporting_reads = reporting_reads(_request_user_id(request))
+                self._reporting_reads.__enter__()
+
+        @functools.wraps(dispatch)
+        def routed_dispatch(self, request, *args, **kwargs):
+            try:
+                return dispatch(self, request, *args, **kwargs)
+            finally:
+                reads = self.__dict__.pop('_reporting_reads', None)
+                if reads is not None:
+                    reads.__exit__(None, None, None)
+
+        view.initial = routed_initial
+        view.dispatch = routed_dispatch
+        return view
+
+    @functools.wraps(view)
+    def routed(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        with reporting_reads(_request_user_id(request)):
+            return view(request, *args, **kwargs)
+
+    return routed
+
+
+class ReportingRouter:
+    """
+    Sends ORM reads to the alias chosen by reporting_reads(); every write,
+    including saves of instances read through the reporting alias, goes
+    to the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_ALIAS
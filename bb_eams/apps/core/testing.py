@@ -0,0 +1,56 @@
+"""
+Test runner and base test case.
+
+The suite runs against mongomock through the same djongo stack the
+benchmarks use (benchmarks.use_database), so it needs no MongoDB server
+and never touches the configured database. Celery tasks run eagerly, so
+no broker is needed either:
+
+    python manage.py test
+"""
+from celery import current_app
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.test.runner import DiscoverRunner
+from . import cache as reference_cache
+from .mongo import get_pooled_database
+
+
+class MongomockTestRunner(DiscoverRunner):
+    def __init__(self, *args, **kwargs):
+        # bb_eams/ is the import root of the apps, not the project root
+        kwargs['top_level'] = kwargs.get('top_level') or str(settings.BASE_DIR / 'bb_eams')
+        super().__init__(*args, **kwargs)
+
+    def build_suite(self, test_labels=None, *args, **kwargs):
+        return super().build_suite(test_labels or [str(settings.BASE_DIR / 'bb_eams' / 'apps')], *args, **kwargs)
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        current_app.conf.task_always_eager = True
+
+    def setup_databases(self, **kwargs):
+        from .benchmarks import use_database
+
+        name = f"test_{settings.DATABASES['default']['NAME']}"
+        use_database(name, mongomock=True)
+        return name
+
+    def teardown_databases(self, old_config, **kwargs):
+        get_pooled_database().client.drop_database(old_config)
+
+
+class MongoTestCase(SimpleTestCase):
+    """
+    A test case on an empty mongomock database and an empty cache.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        super().setUp()
+        database = get_pooled_database()
+        for name in database.list_collection_names():
+            database.drop_collection(name)
+        cache.clear()
+        reference_cache._local.clear()
@@ -0,0 +1,29 @@
+import io
+import json
+import os
+import tempfile
+from django.core.management import call_command
+from django.db import connections
+from apps.core.benchmarks import use_database
+from apps.core.testing import MongoTestCase
+
+CASES = {
+    'check_in', 'check_out', 'punch_app_check_in', 'punch_app_check_out', 'punch_app_burst', 'history_page',
+    'daily_computation', 'daily_list', 'summary', 'leave_list', 'user_search', 'report',
+}
+
+
+class RunBenchmarksTests(MongoTestCase):
+    def test_every_case_runs(self):
+        # The command points the connection at its own mongomock database
+        self.addCleanup(use_database, connections['default'].settings_dict['NAME'], mongomock=True)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command(
+                'run_benchmarks', '--mongomock', '--size', 'smoke', '--days', '2', '--iterations', '2',
+                '--database-name', 'test_bb_eams_bench', '--output', output, stdout=io.StringIO(),
+            )
+            with open(output) as f:
+                report = json.load(f)
+        self.assertEqual(set(report['results']), CASES)
+        self.assertEqual(report['meta']['backend'], 'mongomock')
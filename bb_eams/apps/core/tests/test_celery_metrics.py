@@ -0,0 +1,22 @@
+from types import SimpleNamespace
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from apps.core import celery_metrics, metrics
+
+
+class TaskMetricsTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.flush(force=True)
+        cache.clear()
+
+    @override_settings(METRICS_FLUSH_INTERVAL=3600)
+    def test_series_are_flushed_when_a_task_ends(self):
+        task = SimpleNamespace(name='demo', request=SimpleNamespace(sent_at=None, headers={}, eta=None))
+        celery_metrics.on_prerun(task_id='1', task=task)
+        celery_metrics.records_processed(3)
+        with self.assertLogs('apps.tasks', 'INFO'):
+            celery_metrics.on_postrun(task_id='1', task=task, state='SUCCESS')
+
+        self.assertEqual(cache.get(metrics._key('celery_task_records_total{task="demo"}')), 3)
+        self.assertIn('celery_task_records_total{task="demo"} 3', metrics.render_prometheus())
@@ -0,0 +1,48 @@
+from datetime import date
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.core.testing import MongoTestCase
+from apps.leave.models import LeaveRequest
+
+
+class ConditionalGetTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='abebe', email='abebe@example.com')
+        self.requests = [
+            LeaveRequest.objects.create(user_id=self.user.id, leave_type='annual', start_date=date(2026, 3, day),
+                                        end_date=date(2026, 3, day), total_days=1, reason='Family')
+            for day in (2, 3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_revalidates_with_its_etag(self):
+        response = self.client.get('/api/leave/requests/')
+        self.assertEqual(response.status_code, 200, response.data)
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(self.client.get('/api/leave/requests/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Deleting an older row leaves the newest updated_at unchanged
+        self.requests[0].delete()
+        response = self.client.get('/api/leave/requests/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_ignores_if_modified_since(self):
+        since = http_date(self.requests[1].updated_at.timestamp() + 60)
+        self.assertEqual(self.client.get('/api/leave/requests/', HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+    def test_detail_revalidates_with_etag_and_last_modified(self):
+        path = f'/api/leave/requests/{self.requests[0].id}/'
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.data)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.requests[0].reason = 'Moved'
+        self.requests[0].save()
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,80 @@
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from apps.accounts.models import User
+from apps.core.idempotency import HEADER, REPLAYED_HEADER, IdempotencyMixin
+from apps.core.testing import MongoTestCase
+
+
+class CountingView(IdempotencyMixin, APIView):
+    """
+    Counts the requests it actually runs; ``fail`` answers 503 once and
+    ``retry`` sends the same request again while this one is running.
+    """
+    runs = []
+
+    def post(self, request):
+        self.runs.append(dict(request.data))
+        if request.data.get('fail') and len(self.runs) == 1:
+            return Response({'detail': 'Try again.'}, status=503)
+        if request.data.get('retry'):
+            retry = self.send(request.user, request.data, request.headers[HEADER])
+            return Response({'run': len(self.runs), 'retry_status': retry.status_code}, status=201)
+        return Response({'run': len(self.runs)}, status=201)
+
+    @classmethod
+    def send(cls, user, data, key):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        request = APIRequestFactory().post('/counting/', data, format='json', **headers)
+        force_authenticate(request, user=user)
+        return cls.as_view()(request)
+
+
+class IdempotencyMixinTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        CountingView.runs = []
+        self.user = User.objects.create(username='abebe', email='abebe@example.com')
+
+    def post(self, data, key='key-1', user=None):
+        return CountingView.send(user or self.user, data, key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.post({'amount': 1})
+        retry = self.post({'amount': 1})
+        self.assertEqual((first.status_code, first.data), (201, {'run': 1}))
+        self.assertEqual((retry.status_code, retry.data), (201, {'run': 1}))
+        self.assertEqual(retry[REPLAYED_HEADER], 'true')
+        self.assertFalse(first.has_header(REPLAYED_HEADER))
+        self.assertEqual(len(CountingView.runs), 1)
+
+    def test_retry_while_pending_conflicts(self):
+        response = self.post({'retry': True})
+        self.assertEqual(response.data, {'run': 1, 'retry_status': 409})
+        self.assertEqual(len(CountingView.runs), 1)
+        # The first request stored its response once it finished
+        self.assertEqual(self.post({'retry': True})[REPLAYED_HEADER], 'true')
+
+    def test_key_reused_with_another_body(self):
+        self.post({'amount': 1})
+        response = self.post({'amount': 2})
+        self.assertEqual(response.status_code, 422, response.data)
+        self.assertEqual(len(CountingView.runs), 1)
+
+    def test_server_error_frees_the_key(self):
+        self.assertEqual(self.post({'fail': True}).status_code, 503)
+        retry = self.post({'fail': True})
+        self.assertEqual((retry.status_code, retry.data), (201, {'run': 2}))
+        self.assertFalse(retry.has_header(REPLAYED_HEADER))
+
+    def test_keys_are_scoped_per_user(self):
+        almaz = User.objects.create(username='almaz', email='almaz@example.com')
+        self.post({'amount': 1})
+        response = self.post({'amount': 1}, user=almaz)
+        self.assertEqual((response.status_code, response.data), (201, {'run': 2}))
+        self.assertFalse(response.has_header(REPLAYED_HEADER))
+
+    def test_requests_without_a_key_always_run(self):
+        self.post({'amount': 1}, key=None)
+        self.post({'amount': 1}, key=None)
+        self.assertEqual(len(CountingView.runs), 2)
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from apps.core.instrumentation import CommandListener, end_request, start_request
+
+
+def event(command_name, command, request_id=1, duration_micros=2000):
+    return SimpleNamespace(
+        command_name=command_name, command=command, connection_id=('db', 27017),
+        request_id=request_id, duration_micros=duration_micros,
+    )
+
+
+class CommandListenerTests(SimpleTestCase):
+    def setUp(self):
+        self.listener = CommandListener()
+        self.stats, token = start_request()
+        self.addCleanup(end_request, token)
+
+    def run_command(self, command_name, command, request_id=1, failed=False):
+        self.listener.started(event(command_name, command, request_id))
+        finish = self.listener.failed if failed else self.listener.succeeded
+        finish(event(command_name, {}, request_id))
+
+    def test_counts_commands_into_request_stats(self):
+        self.run_command('find', {'find': 'attendance_records', 'filter': {'user_id': 1, 'timestamp': {}}}, 1)
+        self.run_command('find', {'find': 'attendance_records', 'filter': {'timestamp': {}, 'user_id': 2}}, 2)
+        self.run_command('update', {'update': 'devices', 'updates': [{'q': {'id': 3}}]}, 3, failed=True)
+
+        self.assertEqual(self.stats.queries, 3)
+        self.assertAlmostEqual(self.stats.db_time, 0.006)
+        self.assertEqual(self.stats.query_shapes, {
+            "mongo find attendance_records ['timestamp', 'user_id']": 2,
+            "mongo update devices ['id']": 1,
+        })
+
+    def test_getmore_is_shaped_by_collection(self):
+        self.run_command('getMore', {'getMore': 1234, 'collection': 'attendance_records'})
+        self.assertEqual(list(self.stats.query_shapes), ['mongo getMore attendance_records []'])
+
+    def test_ignores_connection_upkeep(self):
+        self.run_command('endSessions', {'endSessions': []})
+        self.assertEqual(self.stats.queries, 0)
@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from apps.core import metrics
+
+
+class RegistryTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.flush(force=True)
+        cache.clear()
+
+    def test_processes_extend_the_index_without_losing_series(self):
+        web, worker = metrics.Registry(), metrics.Registry()
+        web.inc('http_repeated_query_total', {'view': 'a'})
+        worker.inc('celery_task_retries_total', {'task': 'b'}, 2)
+        web.flush(force=True)
+        worker.flush(force=True)
+        worker.inc('celery_task_retries_total', {'task': 'b'})
+        worker.flush(force=True)
+
+        self.assertEqual(metrics.index(), {
+            'http_repeated_query_total{view="a"}', 'celery_task_retries_total{task="b"}',
+        })
+        self.assertEqual(cache.get(metrics.INDEX_SIZE_KEY), 2)
+        output = metrics.render_prometheus()
+        self.assertIn('http_repeated_query_total{view="a"} 1\n', output)
+        self.assertIn('celery_task_retries_total{task="b"} 3\n', output)
+
+    def test_a_name_registered_twice_is_listed_once(self):
+        # Two flushes that both found the series unregistered
+        metrics._register({'cache_requests_total{cache="user"}'})
+        cache.delete(metrics._marker('cache_requests_total{cache="user"}'))
+        metrics._register({'cache_requests_total{cache="user"}'})
+        self.assertEqual(cache.get(metrics.INDEX_SIZE_KEY), 2)
+        self.assertEqual(metrics.index(), {'cache_requests_total{cache="user"}'})
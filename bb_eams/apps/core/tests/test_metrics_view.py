@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from apps.core.views import metrics_view
+
+
+class MetricsViewTests(SimpleTestCase):
+    def get(self, user=None, **headers):
+        request = RequestFactory().get('/metrics', headers=headers)
+        request.user = user or AnonymousUser()
+        return metrics_view(request).status_code
+
+    @override_settings(METRICS_AUTH_TOKEN='')
+    def test_closed_without_a_token(self):
+        self.assertEqual(self.get(), 403)
+        self.assertEqual(self.get(Authorization='Bearer '), 403)
+
+    @override_settings(METRICS_AUTH_TOKEN='scrape-me')
+    def test_token(self):
+        self.assertEqual(self.get(Authorization='Bearer scrape-me'), 200)
+        self.assertEqual(self.get(Authorization='Bearer other'), 403)
+        self.assertEqual(self.get(), 403)
+
+    @override_settings(METRICS_AUTH_TOKEN='')
+    def test_staff(self):
+        self.assertEqual(self.get(SimpleNamespace(is_staff=True)), 200)
+        self.assertEqual(self.get(SimpleNamespace(is_staff=False)), 403)
@@ -0,0 +1,31 @@
+import uuid
+from datetime import date
+from apps.accounts.models import User
+from apps.attendance.models import ShiftRoster
+from apps.core.models import Policy
+from apps.core.policy_engine import rules_for, rules_for_roster
+from apps.core.testing import MongoTestCase
+
+DAY = date(2026, 3, 2)
+
+
+class PolicyLookupTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.department_id = uuid.uuid4()
+        Policy.objects.create(name='Company', policy_type='leave', rules={'annual_days': 20}, effective_from=date(2026, 1, 1))
+        Policy.objects.create(name='Ops', policy_type='leave', rules={'annual_days': 25},
+                              department_id=self.department_id, effective_from=date(2026, 1, 1))
+
+    def test_department_then_company_then_defaults(self):
+        self.assertEqual(rules_for('leave', self.department_id, DAY).annual_days, 25)
+        self.assertEqual(rules_for('leave', uuid.uuid4(), DAY).annual_days, 20)
+        self.assertEqual(rules_for('leave', self.department_id, date(2025, 12, 31)).annual_days, None)
+
+    def test_roster_rules_follow_the_employee(self):
+        Policy.objects.create(name='Ops hours', policy_type='attendance', rules={'late_after_minutes': 30},
+                              department_id=self.department_id, effective_from=date(2026, 1, 1))
+        user = User.objects.create(username='abebe', email='abebe@example.com', department_id=self.department_id)
+        # The shift belongs to no department, or another one
+        row = ShiftRoster(user_id=user.id, work_date=DAY, shift_id=uuid.uuid4())
+        self.assertEqual(rules_for_roster('attendance', row).late_after.total_seconds(), 30 * 60)
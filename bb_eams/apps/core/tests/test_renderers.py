@@ -0,0 +1,70 @@
+import io
+import math
+import uuid
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from django.test import SimpleTestCase
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from apps.core.renderers import FastJSONParser, FastJSONRenderer, orjson
+
+FLOATS = [
+    0.0, -0.0, 1.0, 0.1, 8.5, 1 / 3, 100 / 3600, 1 / 3600, 0.0001, 0.00009999, 1e-7, -3e-5, 5e-324,
+    1e15, 9999999999999998.0, 1e16, 1.5e16, 123456789012345678.0, 1e300,
+]
+
+
+class RendererParityTests(SimpleTestCase):
+    def assertSameBytes(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data), data)
+
+    def test_floats(self):
+        for value in FLOATS:
+            self.assertSameBytes(value)
+            self.assertSameBytes([value])
+            self.assertSameBytes({'overtime_hours': value, 'total_hours': [1.5, value]})
+
+    def test_hours_of_a_daily_page(self):
+        rows = [
+            {'id': str(uuid.uuid4()), 'date': '2026-03-02', 'total_hours': seconds / 3600,
+             'overtime_hours': max(0, seconds - 8 * 3600) / 3600, 'status': 'present'}
+            for seconds in range(0, 10 * 3600, 97)
+        ]
+        self.assertSameBytes({'count': len(rows), 'results': rows})
+
+    def test_strings_that_look_like_numbers(self):
+        self.assertSameBytes({'a': 'x:1e5', 'b': ['[0.00001', ',2e3'], '5e-06': '0.00001'})
+
+    def test_other_types(self):
+        self.assertSameBytes({
+            'id': uuid.uuid4(), 'when': datetime(2026, 3, 2, 8, 0, 0, 5000, tzinfo=timezone.utc),
+            'day': date(2026, 3, 2), 'at': time(8, 30), 'amount': Decimal('1.10'),
+            'name': 'Abebe Kébede   ', 'big': 2 ** 70, 'none': None, 'flag': True, 'keys': {1: 'a'},
+        })
+
+    def test_nan_is_null(self):
+        # The one documented difference
+        if orjson is None:
+            self.skipTest('orjson is not installed')
+        for value in (math.nan, math.inf, -math.inf):
+            self.assertEqual(FastJSONRenderer().render({'a': value}), b'{"a":null}')
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'a': value})
+
+
+class ParserParityTests(SimpleTestCase):
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), 'application/json', {})
+
+    def test_same_values(self):
+        for body in (b'{"a":[1,2.5,2.777777777777778e-05,"\\u00e9",null,true]}', b'[]',
+                     b'12345678901234567890123', b'[-9223372036854775809,18446744073709551616]'):
+            self.assertEqual(self.parse(FastJSONParser(), body), self.parse(JSONParser(), body))
+
+    def test_same_error(self):
+        errors = []
+        for parser in (FastJSONParser(), JSONParser()):
+            with self.assertRaises(Exception) as caught:
+                self.parse(parser, b'{"a":')
+            errors.append(str(caught.exception))
+        self.assertEqual(errors[0], errors[1])
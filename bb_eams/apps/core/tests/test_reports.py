@@ -0,0 +1,59 @@
+import uuid
+from datetime import date
+from apps.accounts.models import User
+from apps.attendance.models import DailyAttendance, MonthlyAttendance
+from apps.core.testing import MongoTestCase
+from apps.core.utils import generate_attendance_report
+
+FEBRUARY = date(2026, 2, 1)
+
+
+class AttendanceReportTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.department_id = uuid.uuid4()
+        self.abebe = User.objects.create(username='abebe', email='abebe@example.com', first_name='Abebe',
+                                         last_name='Kebede', department_id=self.department_id)
+        self.almaz = User.objects.create(username='almaz', email='almaz@example.com', first_name='Almaz')
+        User.objects.create(username='gone', email='gone@example.com', status='inactive')
+        # Saved through the ORM, so the rollups follow (apps.attendance.signals)
+        for day, status, late, hours in ((2, 'present', 10, 8.0), (3, 'present', 0, 7.5), (4, 'absent', 0, 0.0),
+                                         (27, 'on_leave', 0, 0.0), (28, 'present', 0, 8.25)):
+            DailyAttendance.objects.create(user_id=self.abebe.id, date=date(2026, 2, day), status=status,
+                                           late_minutes=late, total_hours=hours)
+        DailyAttendance.objects.create(user_id=self.almaz.id, date=date(2026, 2, 2), status='holiday')
+
+    def details(self, start, end, department_id=None):
+        report = generate_attendance_report(start, end, department_id)
+        return report['summary'], {row['employee_name']: row for row in report['details']}
+
+    def test_whole_month_reads_the_rollups(self):
+        summary, rows = self.details('2026-02-01', '2026-02-28')
+        self.assertEqual((summary['total_employees'], summary['total_days'], summary['total_attendance']), (2, 28, 3))
+        abebe = rows['Abebe Kebede']
+        self.assertEqual(
+            (abebe['present_days'], abebe['late_days'], abebe['absent_days'], abebe['leave_days'], abebe['total_hours']),
+            (3, 1, 1, 1, 23.75),
+        )
+        self.assertEqual(rows['Almaz']['holiday_days'], 1)
+
+        MonthlyAttendance.objects.filter(user_id=self.abebe.id, month=FEBRUARY).update(present_days=9)
+        self.assertEqual(self.details('2026-02-01', '2026-02-28')[1]['Abebe Kebede']['present_days'], 9)
+
+    def test_partial_range_reads_daily_rows(self):
+        summary, rows = self.details('2026-02-02', '2026-02-27', self.department_id)
+        self.assertEqual((summary['total_employees'], summary['total_days']), (1, 26))
+        abebe = rows['Abebe Kebede']
+        self.assertEqual((abebe['present_days'], abebe['leave_days'], abebe['total_hours']), (2, 1, 15.5))
+
+    def test_rollups_follow_daily_rows(self):
+        row = DailyAttendance.objects.get(user_id=self.abebe.id, date=date(2026, 2, 4))
+        row.status = 'present'
+        row.total_hours = 4.0
+        row.save()
+        month = MonthlyAttendance.objects.get(user_id=self.abebe.id, month=FEBRUARY)
+        self.assertEqual((month.days_recorded, month.present_days, month.absent_days, month.total_hours),
+                         (5, 4, 0, 27.75))
+
+        DailyAttendance.objects.get(user_id=self.almaz.id).delete()
+        self.assertEqual(MonthlyAttendance.objects.filter(user_id=self.almaz.id).count(), 0)
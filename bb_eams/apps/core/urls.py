@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import ReferenceCacheStatsView
+
+urlpatterns = [
+    path('cache/reference/', ReferenceCacheStatsView.as_view(), name='reference-cache-stats'),
+]
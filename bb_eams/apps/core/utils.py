@@ -5,6 +5,7 @@ from cryptography.fernet import Fernet
 from django.conf import settings
 import json
 from datetime import datetime, timedelta
+from .routing import reporting_reads
 
 def encrypt_biometric(biometric_data):
     """
@@ -51,11 +52,32 @@ def calculate_working_hours(check_in, check_out):
     hours = delta.total_seconds() / 3600
     return round(hours, 2)
 
+def _full_months(start, end):
+    """
+    First days of the months covering [start, end] when both ends fall on
+    month boundaries, else None.
+    """
+    from apps.attendance.repositories import month_start, next_month
+
+    if start.day != 1 or next_month(month_start(end)) - timedelta(days=1) != end:
+        return None
+    months = []
+    month = start
+    while month <= end:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+@reporting_reads()
 def generate_attendance_report(start_date, end_date, department_id=None):
     """
-    Generate attendance report for date range
+    Generate attendance report for date range.
+
+    Whole-month ranges read one MonthlyAttendance row per employee and
+    month; other ranges aggregate DailyAttendance in a single pass. Reads
+    go to the reporting alias (apps.core.routing).
     """
-    from apps.attendance.models import DailyAttendance
+    from apps.attendance.models import DailyAttendance, MonthlyAttendance
     from apps.accounts.models import User
     
     report_data = {
@@ -65,39 +87,69 @@ def generate_attendance_report(start_date, end_date, department_id=None):
     }
     
     # Get all employees
-    employees = User.objects.filter(is_active=True, user_type='employee')
+    employees = User.objects.filter(status='active', user_type='employee')
     if department_id:
         employees = employees.filter(department_id=department_id)
+    employees = list(employees.values('id', 'first_name', 'last_name', 'department_id'))
+    employee_ids = [employee['id'] for employee in employees]
     
-    # Get attendance records
-    attendance = DailyAttendance.objects.filter(
-        date__gte=start_date,
-        date__lte=end_date
-    )
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    months = _full_months(start, end)
     
-    if department_id:
-        attendance = attendance.filter(user_id__in=employees.values_list('id', flat=True))
+    # user_id -> [present, late, absent, leave, holiday, hours]
+    totals = {}
+    if months:
+        rows = MonthlyAttendance.objects.filter(month__in=months)
+        if department_id:
+            rows = rows.filter(user_id__in=employee_ids)
+        for user_id, *values in rows.values_list(
+            'user_id', 'present_days', 'late_days', 'absent_days', 'leave_days', 'holiday_days', 'total_hours'
+        ):
+            total = totals.setdefault(user_id, [0, 0, 0, 0, 0, 0.0])
+            for i, value in enumerate(values):
+                total[i] += value
+    else:
+        rows = DailyAttendance.objects.filter(
+            date__gte=start_date,
+            date__lte=end_date
+        )
+        if department_id:
+            rows = rows.filter(user_id__in=employee_ids)
+        for user_id, status, late_minutes, hours in rows.values_list(
+            'user_id', 'status', 'late_minutes', 'total_hours'
+        ):
+            total = totals.setdefault(user_id, [0, 0, 0, 0, 0, 0.0])
+            total[0] += status == 'present'
+            total[1] += late_minutes > 0
+            total[2] += status == 'absent'
+            total[3] += status == 'on_leave'
+            total[4] += status == 'holiday'
+            total[5] += hours
     
     # Calculate summary
-    total_days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
-    report_data['summary']['total_employees'] = employees.count()
+    total_days = (end - start).days + 1
+    report_data['summary']['total_employees'] = len(employees)
     report_data['summary']['total_days'] = total_days
-    report_data['summary']['total_attendance'] = attendance.count()
+    report_data['summary']['total_attendance'] = sum(total[0] for total in totals.values())
     
-    # Employee details
+    # Employee details; absences, leave and holidays are materialized
+    # nightly, so dates not yet closed count as neither
     for employee in employees:
-        emp_attendance = attendance.filter(user_id=employee.id)
-        total_hours = sum(a.total_hours for a in emp_attendance)
-        present_days = emp_attendance.count()
+        present_days, late_days, absent_days, leave_days, holiday_days, total_hours = totals.get(
+            employee['id'], (0, 0, 0, 0, 0, 0.0)
+        )
         
         report_data['details'].append({
-            'employee_id': str(employee.id),
-            'employee_name': employee.get_full_name(),
-            'department': employee.department_id,
+            'employee_id': str(employee['id']),
+            'employee_name': f"{employee['first_name']} {employee['last_name']}".strip(),
+            'department': employee['department_id'],
             'present_days': present_days,
-            'absent_days': total_days - present_days,
+            'absent_days': absent_days,
+            'leave_days': leave_days,
+            'holiday_days': holiday_days,
             'total_hours': round(total_hours, 2),
-            'late_days': emp_attendance.filter(late_minutes__gt=0).count()
+            'late_days': late_days
         })
     
-    return report_data
\ No newline at end of file
+    return report_data
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .cache import reference_cache_stats
+from .metrics import render_prometheus
+
+
+class ReferenceCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(reference_cache_stats())
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. A scraper sends ``Authorization: Bearer
+    <METRICS_AUTH_TOKEN>``; staff signed in to the admin may look too.
+    Anyone else, and every scraper while no token is set, is refused.
+    """
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    scraper = token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (scraper or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
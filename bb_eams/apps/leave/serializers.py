@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from apps.attendance.serializers import employee_names
+from apps.core.compiled import CompiledSerializer
 from .models import LeaveRequest, LeaveBalance
 from datetime import date
 
@@ -55,6 +57,23 @@ class LeaveRequestSerializer(serializers.ModelSerializer):
         
         return data
 
+def remaining_balances(rows):
+    """
+    Compiled remaining_balance, one LeaveBalance query per page.
+    """
+    remaining = {}
+    for user_id, year, annual, sick in LeaveBalance.objects.filter(
+        user_id__in={row['user_id'] for row in rows},
+        year__in={row['start_date'].year for row in rows},
+    ).values_list('user_id', 'year', 'annual_remaining', 'sick_remaining'):
+        remaining[(user_id, year)] = {'annual': annual, 'sick': sick}
+    return lambda row: remaining.get((row['user_id'], row['start_date'].year), {}).get(row['leave_type'])
+
+# Read-only list form for leave listings (apps.core.compiled)
+compiled_leave_requests = CompiledSerializer(
+    LeaveRequestSerializer, employee_name=employee_names, remaining_balance=remaining_balances
+)
+
 class LeaveBalanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = LeaveBalance
@@ -1,8 +1,14 @@
+import logging
+from datetime import date
 from celery import shared_task
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import LeaveRequest
+from .models import LeaveBalance, LeaveRequest
 from apps.accounts.models import User
+from apps.core.celery_metrics import records_processed
+from apps.core.policy_engine import rules_for
+
+logger = logging.getLogger('apps.tasks')
 
 @shared_task
 def send_leave_status_email(leave_request_id):
@@ -21,5 +27,37 @@ def send_leave_status_email(leave_request_id):
             message = f"Dear {user.get_full_name()},\n\nYour leave request from {leave_request.start_date} to {leave_request.end_date} has been rejected.\nReason: {leave_request.rejection_reason}\n\nRegards,\nHR Department"
         
         send_mail(subject, message, settings.EMAIL_HOST_USER, [user.email])
+        records_processed(1)
     except (LeaveRequest.DoesNotExist, User.DoesNotExist):
-        pass # Or log the error
\ No newline at end of file
+        logger.warning('task=send_leave_status_email leave_request=%s event=missing', leave_request_id)
+
+
+@shared_task
+def roll_over_leave_balances(year=None):
+    """
+    Start a new leave year: reset every older balance to the entitlement
+    of its department's leave policy plus the unused annual days the
+    policy carries forward.
+    """
+    year = year or date.today().year
+    new_year = date(year, 1, 1)
+    departments = dict(User.objects.values_list('id', 'department_id'))
+    default_annual = LeaveBalance._meta.get_field('annual_total').default
+    default_sick = LeaveBalance._meta.get_field('sick_total').default
+
+    rolled = 0
+    for balance in LeaveBalance.objects.filter(year__lt=year):
+        rules = rules_for('leave', departments.get(balance.user_id), new_year)
+        carried = rules.carry_forward(balance.annual_remaining)
+        balance.year = year
+        balance.carried_forward = carried
+        annual = rules.annual_days if rules.annual_days is not None else default_annual
+        balance.annual_total = balance.annual_remaining = annual + carried
+        balance.annual_used = 0
+        balance.sick_total = balance.sick_remaining = rules.sick_days if rules.sick_days is not None else default_sick
+        balance.sick_used = 0
+        balance.save()
+        rolled += 1
+    records_processed(rolled)
+    
+    return f"Rolled {rolled} leave balances into {year}"
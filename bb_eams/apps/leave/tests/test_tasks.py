@@ -0,0 +1,29 @@
+import uuid
+from datetime import date
+from apps.accounts.models import User
+from apps.core.models import Policy
+from apps.core.testing import MongoTestCase
+from apps.leave.models import LeaveBalance
+from apps.leave.tasks import roll_over_leave_balances
+
+
+class RollOverTests(MongoTestCase):
+    def balance(self, department_id, annual_remaining):
+        user = User.objects.create(username=f'u{annual_remaining}', email=f'u{annual_remaining}@example.com',
+                                   department_id=department_id)
+        return LeaveBalance.objects.create(user_id=user.id, year=2025, annual_remaining=annual_remaining)
+
+    def test_entitlements_and_carry_forward(self):
+        none_department = uuid.uuid4()
+        Policy.objects.create(name='No paid leave', policy_type='leave', department_id=none_department,
+                              rules={'annual_days': 0, 'sick_days': 0, 'carry_forward_max_days': 5},
+                              effective_from=date(2026, 1, 1))
+        zero = self.balance(none_department, 8)
+        default = self.balance(uuid.uuid4(), 3)
+
+        roll_over_leave_balances(2026)
+        zero.refresh_from_db()
+        default.refresh_from_db()
+        # An explicit 0 is kept, not replaced by the model default
+        self.assertEqual((zero.year, zero.annual_total, zero.carried_forward, zero.sick_total), (2026, 5, 5, 0))
+        self.assertEqual((default.annual_total, default.carried_forward, default.sick_total), (20, 0, 12))
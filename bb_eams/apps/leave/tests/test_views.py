@@ -0,0 +1,22 @@
+from apps.accounts.models import User
+from apps.core.models import Notification
+from apps.core.testing import MongoTestCase
+from apps.leave.models import LeaveRequest
+from apps.leave.views import LeaveRequestListView
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+class LeaveRequestCreateTests(MongoTestCase):
+    def test_create_notifies_active_hr_officers(self):
+        employee = User.objects.create(username='abebe', email='abebe@example.com', first_name='Abebe')
+        officer = User.objects.create(username='hr', email='hr@example.com', user_type='hr_officer')
+        User.objects.create(username='former', email='former@example.com', user_type='hr_officer', status='inactive')
+        request = APIRequestFactory().post('/api/leave/requests/', {
+            'user_id': str(employee.id), 'leave_type': 'annual', 'start_date': '2026-03-02',
+            'end_date': '2026-03-04', 'total_days': 3, 'reason': 'Family',
+        }, format='json')
+        force_authenticate(request, employee)
+        response = LeaveRequestListView.as_view()(request)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(LeaveRequest.objects.get(user_id=employee.id).total_days, 3)
+        self.assertEqual([n.user_id for n in Notification.objects.all()], [officer.id])
@@ -6,7 +6,7 @@ from .views import (
 
 urlpatterns = [
     path('requests/', LeaveRequestListView.as_view(), name='leave-request-list'),
-    path('requests/<int:pk>/', LeaveRequestDetailView.as_view(), name='leave-request-detail'),
-    path('requests/<int:pk>/approve/', LeaveApprovalView.as_view(), name='leave-request-approve'),
+    path('requests/<uuid:pk>/', LeaveRequestDetailView.as_view(), name='leave-request-detail'),
+    path('requests/<uuid:pk>/approve/', LeaveApprovalView.as_view(), name='leave-request-approve'),
     path('balance/', LeaveBalanceView.as_view(), name='leave-balance'),
 ]
\ No newline at end of file
@@ -5,20 +5,30 @@ from django.utils import timezone
 from .models import LeaveRequest, LeaveBalance
 from .serializers import (
     LeaveRequestSerializer, LeaveBalanceSerializer,
-    LeaveApprovalSerializer
+    LeaveApprovalSerializer, compiled_leave_requests
 )
+from apps.accounts.hierarchy import requested_team
 from apps.core.models import AuditLog, Notification
+from apps.attendance.events import publish_leave_approved
+from apps.attendance.tasks import materialize_absences
+from apps.core.mixins import CompiledListMixin, ConditionalGetMixin
 from .tasks import send_leave_status_email
 import uuid
+from datetime import date
 
-class LeaveRequestListView(generics.ListCreateAPIView):
+class LeaveRequestListView(ConditionalGetMixin, CompiledListMixin, generics.ListCreateAPIView):
     serializer_class = LeaveRequestSerializer
+    compiled_serializer = compiled_leave_requests
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         user_id = self.request.query_params.get('user_id')
+        team = requested_team(self.request)
         
-        if user_id:
+        if team is not None:
+            # ?scope=team: leave of everyone reporting to the requesting user
+            queryset = LeaveRequest.objects.filter(user_id__in=team)
+        elif user_id:
             queryset = LeaveRequest.objects.filter(user_id=user_id)
         else:
             # HR and admin can see all
@@ -58,7 +68,7 @@ class LeaveRequestListView(generics.ListCreateAPIView):
         
         # Notify HR officers
         from apps.accounts.models import User
-        hr_officers = User.objects.filter(user_type='hr_officer', is_active=True)
+        hr_officers = User.objects.filter(user_type='hr_officer', status='active')
         for hr in hr_officers:
             Notification.objects.create(
                 user_id=hr.id,
@@ -68,7 +78,7 @@ class LeaveRequestListView(generics.ListCreateAPIView):
                 status='pending'
             )
 
-class LeaveRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
+class LeaveRequestDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = LeaveRequest.objects.all()
     serializer_class = LeaveRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -159,6 +169,13 @@ class LeaveApprovalView(APIView):
             notification_message = f"Your {leave_request.leave_type} leave request has been rejected: {rejection_reason}"
         
         leave_request.save()
+        if approved:
+            publish_leave_approved(leave_request)
+            if leave_request.start_date < date.today():
+                # Turn already materialized absences into leave
+                materialize_absences.delay(
+                    str(leave_request.start_date), str(min(leave_request.end_date, date.today()))
+                )
         
         # Trigger email notification task
         send_leave_status_email.delay(leave_request.id)
@@ -184,7 +201,7 @@ class LeaveApprovalView(APIView):
         
         return Response(LeaveRequestSerializer(leave_request).data)
 
-class LeaveBalanceView(generics.RetrieveAPIView):
+class LeaveBalanceView(ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = LeaveBalanceSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -0,0 +1,34 @@
+"""
+ASGI config for bb_eams project.
+
+It exposes the ASGI callable as a module-level variable named ``application``:
+device punches under /punch/ go to the slim apps.attendance.punch_app,
+everything else to Django, where the live attendance stream waits on the
+event loop instead of holding a worker.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bb_eams.settings')
+
+django_application = get_asgi_application()
+
+# Needs the app registry get_asgi_application() just set up
+from apps.attendance.punch_app import PUNCH_PATH, PunchApplication  # noqa: E402
+
+punch_application = PunchApplication()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        # Django does not speak lifespan; the punch app shuts its pool down
+        await punch_application(scope, receive, send)
+    elif scope['type'] == 'http' and scope['path'].startswith(PUNCH_PATH):
+        await punch_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
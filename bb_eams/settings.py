@@ -1,8 +1,10 @@
 import os
+import sys
 from pathlib import Path
 from decouple import config
 from datetime import timedelta
 from celery.schedules import crontab
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +40,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -70,6 +73,7 @@ TEMPLATES = [
 
 
 WSGI_APPLICATION = 'bb_eams.wsgi.application'
+ASGI_APPLICATION = 'bb_eams.asgi.application'
 
 # --- MongoDB Configuration ---
 
@@ -95,15 +99,80 @@ if MONGO_USER and MONGO_PASSWORD:
     DATABASES['default']['CLIENT']['authSource'] = config('MONGO_AUTH_SOURCE', default='admin')
     DATABASES['default']['CLIENT']['authMechanism'] = 'SCRAM-SHA-1'
 
+# Read-only reporting views and nightly scans (apps.core.routing) read
+# through this alias, which prefers replica set secondaries. It defaults
+# to the primary's host; against a single-node replica set or a
+# standalone server secondaryPreferred simply reads from the primary.
+DATABASES['reporting'] = {
+    **DATABASES['default'],
+    'CLIENT': {
+        **DATABASES['default']['CLIENT'],
+        'host': config('MONGO_REPORTING_HOST', default=DATABASES['default']['CLIENT']['host']),
+        'readPreference': config('MONGO_REPORTING_READ_PREFERENCE', default='secondaryPreferred'),
+    },
+    'TEST': {'MIRROR': 'default'},
+}
+if DATABASES['reporting']['CLIENT']['readPreference'] != 'primary':
+    # Secondaries further behind than this are not read from (90 at least)
+    DATABASES['reporting']['CLIENT']['maxStalenessSeconds'] = config('MONGO_REPORTING_MAX_STALENESS', default=120, cast=int)
+DATABASE_ROUTERS = ['apps.core.routing.ReportingRouter']
+
+# A user who punched this recently reads their own data from the primary
+READ_YOUR_WRITES_SECONDS = config('READ_YOUR_WRITES_SECONDS', default=120, cast=int)
+
+# Socket pool of the shared pymongo client used by the native repositories
+MONGO_MAX_POOL_SIZE = config('MONGO_MAX_POOL_SIZE', default=100, cast=int)
+
+# manage.py test runs on mongomock (see apps.core.testing)
+TEST_RUNNER = 'apps.core.testing.MongomockTestRunner'
+
+# TTL indexes created by sync_indexes, in days; 0 keeps documents forever
+MONGO_TTL_DAYS = {
+    'notifications': config('NOTIFICATION_RETENTION_DAYS', default=180, cast=int),
+    'audit_logs': config('AUDIT_LOG_RETENTION_DAYS', default=0, cast=int),
+}
+
+# Cache: Redis in production, local memory for tests and offline development
+if config('USE_LOCMEM_CACHE', default=False, cast=bool) or 'test' in sys.argv:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('CACHE_REDIS_URL', default=config('REDIS_URL', default='redis://localhost:6379')),
+            'KEY_PREFIX': 'bb_eams',
+        }
+    }
+
+# Shift, department, policy, device and role lists; invalidated on save/delete
+REFERENCE_CACHE_TIMEOUT = config('REFERENCE_CACHE_TIMEOUT', default=3600, cast=int)
+# How long a process trusts its in-memory copy before re-reading the version
+REFERENCE_VERSION_CHECK_INTERVAL = 1.0
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.accounts.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed when installed, else the stdlib; same bytes except
+    # NaN and infinities (see apps.core.renderers)
+    'DEFAULT_RENDERER_CLASSES': (
+        'apps.core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'apps.core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
@@ -142,9 +211,30 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Seconds a slim user projection is trusted by CachedJWTAuthentication
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+
+# Idempotency-Key support on punch endpoints (apps.core.idempotency)
+IDEMPOTENCY_KEY_TTL = 86400  # seconds a stored response is replayed
+IDEMPOTENCY_LOCK_TTL = 60  # seconds a key stays locked while its first request runs
+
+# Live attendance stream (/api/attendance/stream/). Serve it from bb_eams.asgi;
+# under WSGI each open stream holds a worker for ATTENDANCE_STREAM_MAX_SECONDS
+ATTENDANCE_EVENT_TTL = 600  # seconds a punch event stays replayable
+ATTENDANCE_STREAM_POLL_INTERVAL = 1.0
+ATTENDANCE_STREAM_MAX_SECONDS = 300  # clients reconnect with Last-Event-ID
+
+# Request instrumentation and the /metrics endpoint
+METRICS_FLUSH_INTERVAL = 5  # seconds between flushes of per-process metrics to the cache
+# Bearer token for Prometheus; /metrics is staff-only without one
+METRICS_AUTH_TOKEN = config('METRICS_AUTH_TOKEN', default='')
+REQUEST_REPEATED_QUERY_THRESHOLD = config('REQUEST_REPEATED_QUERY_THRESHOLD', default=10, cast=int)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='http://localhost:3000').split(',')
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -198,9 +288,23 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.attendance.tasks.calculate_daily_attendance',
         'schedule': crontab(hour=1, minute=30),  # Runs daily at 1:30 AM
     },
-    'sync-offline-attendance-every-5-minutes': {
+    'materialize-absences-every-night': {
+        # After calculate_daily_attendance has written yesterday's present rows
+        'task': 'apps.attendance.tasks.materialize_absences',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    'extend-shift-roster-every-night': {
+        'task': 'apps.attendance.tasks.extend_shift_roster',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'sync-offline-attendance-every-minute': {
+        # Each device is only polled when due; see DEVICE_POLL_* below
         'task': 'apps.attendance.tasks.sync_offline_attendance',
-        'schedule': timedelta(minutes=5),
+        'schedule': timedelta(minutes=1),
+    },
+    'roll-over-leave-balances-yearly': {
+        'task': 'apps.leave.tasks.roll_over_leave_balances',
+        'schedule': crontab(hour=0, minute=30, day_of_month=1, month_of_year=1),
     },
     'cleanup-old-records-weekly': {
         'task': 'apps.attendance.tasks.cleanup_old_records',
@@ -212,6 +316,40 @@ CELERY_BEAT_SCHEDULE = {
 BIOMETRIC_TEMPLATE_ENCRYPTION_KEY = config('BIOMETRIC_ENCRYPTION_KEY', default='')
 MAX_BIOMETRIC_RETRIES = 3
 ATTENDANCE_SYNC_INTERVAL = 300  # 5 minutes
+ATTENDANCE_REST_DAYS = (5, 6)  # weekdays off unless an attendance Policy sets rest_days (Monday is 0)
+
+# Materialized shift roster (apps.attendance.roster), kept generated this
+# many days back and ahead by extend_shift_roster
+ROSTER_HISTORY_DAYS = 35
+ROSTER_HORIZON_DAYS = 35
+
+# Device health and adaptive polling (apps.attendance.health)
+DEVICE_POLL_MIN_INTERVAL = 60  # seconds between polls of a device that returned punches
+DEVICE_POLL_MAX_INTERVAL = 900  # idle devices back off to this
+DEVICE_OFFLINE_BACKOFF_MAX = 1800  # failing devices back off to this
+DEVICE_OFFLINE_AFTER_FAILURES = 3
+DEVICE_DEGRADED_LATENCY_MS = 2000
+DEVICE_CONNECT_TIMEOUT = 5
+DEVICE_CONNECTION_IDLE_TIMEOUT = 300  # pooled connections idle longer are reopened
+
+# Push-mode device gateway (manage.py run_device_gateway)
+DEVICE_GATEWAY_HOST = config('DEVICE_GATEWAY_HOST', default='0.0.0.0')
+DEVICE_GATEWAY_PORT = config('DEVICE_GATEWAY_PORT', default=4380, cast=int)
+# Terminals authenticate with a token derived from this secret and their
+# serial; print one with manage.py device_punch_key --gateway SERIAL.
+# run_device_gateway refuses to start without it.
+DEVICE_GATEWAY_SECRET = config('DEVICE_GATEWAY_SECRET', default='')
+DEVICE_GATEWAY_BATCH_SIZE = 500  # punches per database write
+DEVICE_GATEWAY_FLUSH_INTERVAL = 0.25  # seconds a partial batch waits for more punches
+DEVICE_GATEWAY_QUEUE_SIZE = 20000  # queued punches before terminals are throttled
+DEVICE_GATEWAY_HEARTBEAT = 30  # idle seconds before a ping; a second idle period drops the terminal
+
+# Slim ASGI punch endpoint (apps.attendance.punch_app, served by
+# bb_eams.asgi at /punch/). Each device signs with a key derived from
+# this secret; print it with manage.py device_punch_key SERIAL
+DEVICE_PUNCH_SECRET = config('DEVICE_PUNCH_SECRET', default='')
+DEVICE_PUNCH_MAX_SKEW = 300  # seconds a signed request stays valid
+DEVICE_PUNCH_WORKERS = config('DEVICE_PUNCH_WORKERS', default=16, cast=int)  # threads for database work
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
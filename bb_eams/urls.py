@@ -5,11 +5,15 @@ from django.conf import settings
 from rest_framework import permissions
 from django.views.generic import RedirectView
 from django.conf.urls.static import static
+from apps.core.views import metrics_view
 
 urlpatterns = [
     path('', RedirectView.as_view(url='/swagger/', permanent=False)),
     path('api/leave/', include('apps.leave.urls')),
     path('api/accounts/', include('apps.accounts.urls')),
+    path('api/attendance/', include('apps.attendance.urls')),
+    path('api/core/', include('apps.core.urls')),
+    path('metrics', metrics_view, name='metrics'),
 
     # Auth views for the browsable API and Swagger
     path('accounts/', include('rest_framework.urls')),